@@ -0,0 +1,180 @@
+import json
+import threading
+from collections import OrderedDict, Counter, namedtuple
+from functools import partial
+
+
+# an action of the receiver: the iotee methods with their arguments, the text for the display and the message 
+# that is printed
+Action = namedtuple('Action', ('steps', 'text', 'message'))
+
+
+def load_actions(path: str):
+    '''Loads the actions of the receiver from a json file that maps each state to the states of the actuators,
+    e.g. {"lights_on": {"led": [0, 255, 255], "display": "Lights \\nare on", "message": "Lights are on"}}.
+    "display" and "message" are special, any other key is the name of an actuator and is set by calling the iotee
+    method set_<name> with the value as arguments, so new actuators like relays only need a new key
+
+    Parameters:
+        path (str): path of the json file
+
+    Returns:
+        actions (dict): the Action of each state
+    '''
+    with open(path, 'r') as f:
+        config = json.load(f)
+    actions = {}
+    for state, entry in config.items():
+        steps = []
+        for key, value in entry.items():
+            if key in ('display', 'message'):
+                continue
+            args = tuple(value) if isinstance(value, list) else (value,)
+            steps.append((f'set_{key}', args))
+        actions[state] = Action(tuple(steps), entry.get('display'), entry.get('message', state))
+    return actions
+
+
+class ActuatorCache:
+    '''Remembers the last state written to each actuator of an iotee device and skips commands that would write
+    the same state again, e.g. after a redelivered message or a repeated event of a detector model. It has the same
+    set_led and set_display methods as the Iotee class, so it can be used in its place.
+    '''
+
+    def __init__(self, iotee: object):
+        '''
+        Parameters:
+            iotee (Iotee): iotee object the changed states are written to
+        '''
+        self.iotee = iotee
+        self.state = {}
+        self.written = Counter()
+        self.suppressed = Counter()
+
+    def apply(self, actuator: str, method: str, *args):
+        '''Writes the state of an actuator if it differs from the last written state
+
+        Parameters:
+            actuator (str): name of the actuator, e.g. 'led'
+            method (str): name of the iotee method that is called
+            *args: arguments of the method
+
+        Returns:
+            written (bool): True if the state was written
+        '''
+        if self.state.get(actuator) == args:
+            self.suppressed[actuator] += 1
+            return False
+        getattr(self.iotee, method)(*args)
+        # only remembered after a successful write, so a failed write is tried again by the next command
+        self.state[actuator] = args
+        self.written[actuator] += 1
+        return True
+
+    def set_led(self, red: int, green: int, blue: int):
+        self.apply('led', 'set_led', red, green, blue)
+
+    def set_display(self, text: str):
+        self.apply('display', 'set_display', text)
+
+    def __getattr__(self, name: str):
+        # any other actuator, e.g. set_relay
+        if name.startswith('set_'):
+            return partial(self.apply, name[4:], name)
+        raise AttributeError(name)
+
+    def invalidate(self):
+        '''Forgets all states, e.g. after the device was restarted'''
+        self.state.clear()
+
+
+class ActuationWorker:
+    '''Applies actuator commands to an iotee device on its own thread, so the network thread of paho doesn't wait
+    for the serial port. Only the latest command of each actuator is kept: if several commands for the led arrive
+    before the first one was written, only the last one is written. It has the same set_led and set_display
+    methods as the Iotee class, so it can be used in its place.
+    '''
+
+    def __init__(self, iotee: object, max_pending: int = 16):
+        '''
+        Parameters:
+            iotee (Iotee | ActuatorCache): iotee object the commands are applied to
+            max_pending (int): maximum number of actuators with a pending command, commands for further
+                               actuators are dropped
+        '''
+        self.iotee = iotee
+        self.max_pending = max_pending
+        self.pending = OrderedDict()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.running = False
+        self.applied = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def submit(self, actuator: str, method: str, *args):
+        '''Queues a command, a pending command of the same actuator is replaced
+
+        Parameters:
+            actuator (str): name of the actuator, e.g. 'led'
+            method (str): name of the iotee method that is called
+            *args: arguments of the method
+
+        Returns:
+            queued (bool): False if the command was dropped because the queue is full
+        '''
+        with self.condition:
+            if actuator in self.pending:
+                self.coalesced += 1
+            elif len(self.pending) >= self.max_pending:
+                self.dropped += 1
+                return False
+            # a replaced command keeps its place in the queue
+            self.pending[actuator] = (method, args)
+            self.condition.notify()
+            return True
+
+    def set_led(self, red: int, green: int, blue: int):
+        self.submit('led', 'set_led', red, green, blue)
+
+    def set_display(self, text: str):
+        self.submit('display', 'set_display', text)
+
+    def __getattr__(self, name: str):
+        # any other actuator, e.g. set_relay
+        if name.startswith('set_'):
+            return partial(self.submit, name[4:], name)
+        raise AttributeError(name)
+
+    def run(self):
+        '''Applies the queued commands in order until the worker is stopped and the queue is empty'''
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or not self.running)
+                if not self.pending:
+                    return
+                actuator, (method, args) = self.pending.popitem(last=False)
+            try:
+                if isinstance(self.iotee, ActuatorCache):
+                    self.iotee.apply(actuator, method, *args)
+                else:
+                    getattr(self.iotee, method)(*args)
+                self.applied += 1
+            except Exception as e:
+                self.failed += 1
+                print('Failed to set the {0}: {1}'.format(actuator, e))
+
+    def start(self):
+        '''Starts the worker thread'''
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        '''Stops the worker thread after the pending commands were applied'''
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join()
@@ -0,0 +1,143 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+from unittest.mock import Mock
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from actuation import ActuationWorker, ActuatorCache, load_actions
+except ModuleNotFoundError:
+    from client.actuation import ActuationWorker, ActuatorCache, load_actions
+
+
+class LoadActionsTest(unittest.TestCase):
+    def test_actions(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'actuators.json')
+            with open(path, 'w') as f:
+                json.dump({'vents_open': {'led': [255, 255, 0], 'relay': True, 'display': 'Vents \nare open'},
+                           'idle': {}}, f)
+            actions = load_actions(path)
+        self.assertEqual(actions['vents_open'].steps, (('set_led', (255, 255, 0)), ('set_relay', (True,))))
+        self.assertEqual(actions['vents_open'].text, 'Vents \nare open')
+        self.assertEqual(actions['vents_open'].message, 'vents_open')
+        self.assertEqual(actions['idle'].steps, ())
+        self.assertIsNone(actions['idle'].text)
+
+    def test_new_actuators_go_through_worker_and_cache(self):
+        iotee = Mock()
+        cache = ActuatorCache(iotee)
+        worker = ActuationWorker(cache)
+        worker.set_relay(True)
+        worker.set_relay(True)
+        worker.start()
+        worker.stop()
+        cache.set_relay(True)
+        iotee.set_relay.assert_called_once_with(True)
+        self.assertEqual(worker.coalesced, 1)
+        self.assertEqual(cache.suppressed['relay'], 1)
+
+
+class ActuatorCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.iotee = Mock()
+        self.cache = ActuatorCache(self.iotee)
+
+    def test_same_state_is_suppressed(self):
+        self.cache.set_led(255, 0, 0)
+        self.cache.set_led(255, 0, 0)
+        self.cache.set_display('Lights \nare on')
+        self.cache.set_display('Lights \nare on')
+        self.iotee.set_led.assert_called_once_with(255, 0, 0)
+        self.iotee.set_display.assert_called_once_with('Lights \nare on')
+        self.assertEqual(self.cache.suppressed, {'led': 1, 'display': 1})
+
+    def test_changed_state_is_written(self):
+        self.cache.set_led(255, 0, 0)
+        self.cache.set_led(0, 255, 0)
+        self.cache.set_led(255, 0, 0)
+        self.assertEqual(self.iotee.set_led.call_count, 3)
+        self.assertEqual(self.cache.written['led'], 3)
+
+    def test_failed_write_is_retried(self):
+        self.iotee.set_led.side_effect = [OSError('serial port closed'), None]
+        with self.assertRaises(OSError):
+            self.cache.set_led(255, 0, 0)
+        self.cache.set_led(255, 0, 0)
+        self.assertEqual(self.iotee.set_led.call_count, 2)
+
+    def test_invalidate(self):
+        self.cache.set_led(255, 0, 0)
+        self.cache.invalidate()
+        self.cache.set_led(255, 0, 0)
+        self.assertEqual(self.iotee.set_led.call_count, 2)
+
+
+class ActuationWorkerTest(unittest.TestCase):
+    def setUp(self):
+        self.iotee = Mock()
+        self.worker = ActuationWorker(self.iotee, max_pending=2)
+
+    def test_commands_are_applied_on_worker_thread(self):
+        threads = []
+        self.iotee.set_led.side_effect = lambda *args: threads.append(threading.current_thread())
+        self.worker.start()
+        self.worker.set_led(255, 0, 0)
+        self.worker.stop()
+        self.iotee.set_led.assert_called_once_with(255, 0, 0)
+        self.assertIsNot(threads[0], threading.current_thread())
+
+    def test_latest_command_wins(self):
+        self.worker.set_led(255, 0, 0)
+        self.worker.set_display('Windows \nare open')
+        self.worker.set_led(0, 255, 0)
+        self.worker.set_led(0, 0, 255)
+        self.worker.start()
+        self.worker.stop()
+        self.iotee.set_led.assert_called_once_with(0, 0, 255)
+        self.iotee.set_display.assert_called_once_with('Windows \nare open')
+        self.assertEqual(self.worker.coalesced, 2)
+        self.assertEqual(self.worker.applied, 2)
+
+    def test_commands_keep_their_order(self):
+        self.worker.set_display('text')
+        self.worker.set_led(1, 2, 3)
+        self.worker.set_display('newer text')
+        self.worker.start()
+        self.worker.stop()
+        names = [call[0] for call in self.iotee.method_calls]
+        self.assertEqual(names, ['set_display', 'set_led'])
+
+    def test_queue_is_bounded(self):
+        self.worker.set_led(1, 2, 3)
+        self.worker.set_display('text')
+        self.assertFalse(self.worker.submit('relay', 'set_relay', True))
+        self.assertEqual(self.worker.dropped, 1)
+
+    def test_failed_write_does_not_stop_worker(self):
+        self.iotee.set_led.side_effect = OSError('serial port closed')
+        self.worker.set_led(1, 2, 3)
+        self.worker.set_display('text')
+        self.worker.start()
+        self.worker.stop()
+        self.assertEqual(self.worker.failed, 1)
+        self.iotee.set_display.assert_called_once_with('text')
+
+    def test_worker_writes_through_cache(self):
+        cache = ActuatorCache(self.iotee)
+        worker = ActuationWorker(cache)
+        worker.start()
+        worker.set_led(1, 2, 3)
+        worker.stop()
+        worker = ActuationWorker(cache)
+        worker.set_led(1, 2, 3)
+        worker.start()
+        worker.stop()
+        self.iotee.set_led.assert_called_once_with(1, 2, 3)
+        self.assertEqual(cache.suppressed['led'], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
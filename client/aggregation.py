@@ -0,0 +1,112 @@
+class FieldStats:
+    '''Running min, max, mean, last value and count of one field within a window'''
+    __slots__ = ('minimum', 'maximum', 'total', 'last', 'count')
+
+    def __init__(self):
+        self.minimum = None
+        self.maximum = None
+        self.total = 0.0
+        self.last = None
+        self.count = 0
+
+    def add(self, value: float):
+        self.minimum = value if self.minimum is None else min(self.minimum, value)
+        self.maximum = value if self.maximum is None else max(self.maximum, value)
+        self.total += value
+        self.last = value
+        self.count += 1
+
+
+class WindowAggregator:
+    '''Summarizes the samples of a device in windows of a fixed length that are aligned to the clock, e.g. one
+    summary per full minute. A summary has the mean of each field under the name of the field, so the rules and
+    detector models keep working, together with the min, max, last value and count of the field, e.g.
+    {"device_id": "002", "inputName": "sensorSummary", "timestamp": 1689500040, "window": 60, "temperature": 21.4,
+    "temperature_min": 21.1, "temperature_max": 21.8, "temperature_last": 21.6, "temperature_count": 12, ...}
+    '''
+
+    def __init__(self, window: float, fields: tuple, anomaly_bands: dict = None):
+        '''
+        Parameters:
+            window (float): length of a window in seconds
+            fields (tuple): names of the fields that are summarized
+            anomaly_bands (dict): allowed range of fields as (low, high), samples outside are anomalies
+        '''
+        self.window = window
+        self.fields = fields
+        self.anomaly_bands = anomaly_bands or {}
+        self.start = None
+        self.common = {}
+        self.stats = {}
+
+    def window_start(self, timestamp: float):
+        '''Returns the start of the window a timestamp belongs to'''
+        return int(timestamp - timestamp % self.window)
+
+    def add(self, sample: dict):
+        '''Adds a sample to its window and closes the current window if the sample belongs to a later one
+
+        Parameters:
+            sample (dict): sample in the format of the publisher data template
+
+        Returns:
+            summaries (list): summaries of the windows that were closed, usually empty or one
+        '''
+        summaries = []
+        start = self.window_start(sample['timestamp'])
+        if self.start is not None and start != self.start:
+            summaries.append(self.close())
+        if self.start is None:
+            self.start = start
+            self.stats = {field: FieldStats() for field in self.fields}
+        self.common = {key: sample[key] for key in ('device_id', 'pressure') if key in sample}
+        for field in self.fields:
+            if field in sample:
+                self.stats[field].add(sample[field])
+        return summaries
+
+    def due(self, now: float):
+        '''Checks if the current window is over, used to close it when no more samples arrive
+
+        Parameters:
+            now (float): current unix timestamp
+
+        Returns:
+            due (bool): True if the current window has ended
+        '''
+        return self.start is not None and now >= self.start + self.window
+
+    def close(self):
+        '''Closes the current window
+
+        Returns:
+            summary (dict): summary of the window, or None if there is no open window
+        '''
+        if self.start is None:
+            return None
+        summary = dict(self.common, inputName='sensorSummary', timestamp=self.start, window=self.window)
+        for field, stats in self.stats.items():
+            if stats.count == 0:
+                continue
+            summary[field] = stats.total / stats.count
+            summary[f'{field}_min'] = stats.minimum
+            summary[f'{field}_max'] = stats.maximum
+            summary[f'{field}_last'] = stats.last
+            summary[f'{field}_count'] = stats.count
+        self.start = None
+        self.stats = {}
+        return summary
+
+    def is_anomaly(self, sample: dict):
+        '''Checks if a field of the sample is outside of its anomaly band
+
+        Parameters:
+            sample (dict): sample in the format of the publisher data template
+
+        Returns:
+            anomaly (bool): True if the raw sample should be forwarded
+        '''
+        for field, (low, high) in self.anomaly_bands.items():
+            if field in sample and not low <= sample[field] <= high:
+                return True
+        return False
@@ -0,0 +1,63 @@
+import unittest
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from aggregation import WindowAggregator
+except ModuleNotFoundError:
+    from client.aggregation import WindowAggregator
+
+
+def make_sample(timestamp, temperature, light=None):
+    sample = {"device_id": "002", "timestamp": timestamp, "inputName": "sensorData", "pressure": 0.0,
+              "temperature": temperature}
+    if light is not None:
+        sample["light"] = light
+    return sample
+
+
+class WindowAggregatorTest(unittest.TestCase):
+    def setUp(self):
+        self.aggregator = WindowAggregator(60, ("temperature", "light"), {"temperature": (5.0, 35.0)})
+
+    def test_summary_at_window_boundary(self):
+        self.assertEqual(self.aggregator.add(make_sample(1020, 20.0, 50.0)), [])
+        self.assertEqual(self.aggregator.add(make_sample(1030, 22.0)), [])
+        self.assertEqual(self.aggregator.add(make_sample(1075, 21.0, 70.0)), [])
+
+        summaries = self.aggregator.add(make_sample(1080, 25.0))
+        self.assertEqual(len(summaries), 1)
+        summary = summaries[0]
+        self.assertEqual(summary["timestamp"], 1020)
+        self.assertEqual(summary["window"], 60)
+        self.assertEqual(summary["inputName"], "sensorSummary")
+        self.assertEqual(summary["device_id"], "002")
+        self.assertEqual(summary["temperature"], 21.0)
+        self.assertEqual(summary["temperature_min"], 20.0)
+        self.assertEqual(summary["temperature_max"], 22.0)
+        self.assertEqual(summary["temperature_last"], 21.0)
+        self.assertEqual(summary["temperature_count"], 3)
+        self.assertEqual(summary["light"], 60.0)
+        self.assertEqual(summary["light_count"], 2)
+
+        # the sample of the new window starts the next summary
+        self.assertEqual(self.aggregator.close()["temperature"], 25.0)
+
+    def test_due(self):
+        self.assertFalse(self.aggregator.due(2000))
+        self.aggregator.add(make_sample(1030, 20.0))
+        self.assertFalse(self.aggregator.due(1079))
+        self.assertTrue(self.aggregator.due(1080))
+        self.aggregator.close()
+        self.assertIsNone(self.aggregator.close())
+
+    def test_field_without_values_is_left_out(self):
+        self.aggregator.add(make_sample(1030, 20.0))
+        self.assertNotIn("light", self.aggregator.close())
+
+    def test_anomaly(self):
+        self.assertFalse(self.aggregator.is_anomaly(make_sample(1030, 20.0)))
+        self.assertTrue(self.aggregator.is_anomaly(make_sample(1030, 40.0)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,98 @@
+import threading
+import time
+
+
+class SampleAssembler:
+    '''Collects the sensor values of one request cycle into a sample and wakes up the waiting thread as soon as
+    all requested values have arrived.
+
+    The iotee answers requests in order but without telling which request an answer belongs to. A field whose
+    answer did not arrive in time is therefore marked as overdue and is not requested again until the late answer
+    has arrived, or until `expire` seconds have passed in case it got lost. Late answers are dropped, so a sample
+    never contains values of different cycles.
+    '''
+
+    def __init__(self, expire: float = 10.0, clock=time.monotonic):
+        '''
+        Parameters:
+            expire (float): seconds after which an overdue answer is considered lost
+            clock (callable): monotonic clock, can be replaced in tests
+        '''
+        self.expire = expire
+        self.clock = clock
+        self.condition = threading.Condition()
+        self.timestamp = None
+        self.requested = []
+        self.skipped = []
+        self.values = {}
+        self.overdue = {}
+        self.late = 0
+
+    def begin(self, timestamp: float, fields: list):
+        '''Starts a new cycle, any value of the previous cycle that did not arrive yet becomes overdue
+
+        Parameters:
+            timestamp (float): timestamp of the new sample
+            fields (list): names of the fields that should be part of the sample
+
+        Returns:
+            fields (list): names of the fields that have to be requested from the device
+        '''
+        now = self.clock()
+        with self.condition:
+            for field in self.requested:
+                if field not in self.values:
+                    self.overdue.setdefault(field, now)
+            for field, since in list(self.overdue.items()):
+                if now - since >= self.expire:
+                    del self.overdue[field]
+            self.timestamp = timestamp
+            self.requested = [field for field in fields if field not in self.overdue]
+            self.skipped = [field for field in fields if field in self.overdue]
+            self.values = {}
+            return list(self.requested)
+
+    def put(self, field: str, value: float):
+        '''Adds a value that was received from the device to the current cycle
+
+        Parameters:
+            field (str): name of the field
+            value (float): received value
+
+        Returns:
+            accepted (bool): False if the value was late or not requested
+        '''
+        with self.condition:
+            if field in self.overdue:
+                del self.overdue[field]
+                self.late += 1
+                return False
+            if field not in self.requested or field in self.values:
+                return False
+            self.values[field] = value
+            if self.complete():
+                self.condition.notify_all()
+            return True
+
+    def complete(self):
+        '''Checks if all requested values of the current cycle have arrived
+
+        Returns:
+            complete (bool): True if the sample is complete
+        '''
+        return len(self.values) == len(self.requested)
+
+    def wait(self, timeout: float):
+        '''Waits until all requested values have arrived or the timeout has passed
+
+        Parameters:
+            timeout (float): maximum number of seconds to wait
+
+        Returns:
+            values (dict): the values of the current cycle including the timestamp
+            missing (list): names of the fields that are missing in the sample
+        '''
+        with self.condition:
+            self.condition.wait_for(self.complete, timeout)
+            missing = [field for field in self.requested if field not in self.values] + self.skipped
+            return dict(self.values, timestamp=self.timestamp), missing
@@ -0,0 +1,81 @@
+import threading
+import unittest
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from assembly import SampleAssembler
+    from testing_utils import FakeClock
+except ModuleNotFoundError:
+    from client.assembly import SampleAssembler
+    from client.testing_utils import FakeClock
+
+
+FIELDS = ('temperature', 'humidity', 'light', 'proximity')
+
+
+class SampleAssemblerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.assembler = SampleAssembler(expire=10, clock=self.clock)
+
+    def test_complete_sample(self):
+        self.assertEqual(self.assembler.begin(100, FIELDS), list(FIELDS))
+        for i, field in enumerate(FIELDS):
+            self.assertTrue(self.assembler.put(field, float(i)))
+
+        values, missing = self.assembler.wait(0)
+        self.assertEqual(values, {'timestamp': 100, 'temperature': 0.0, 'humidity': 1.0, 'light': 2.0,
+                                  'proximity': 3.0})
+        self.assertEqual(missing, [])
+
+    def test_wait_returns_when_last_value_arrives(self):
+        self.assembler.begin(100, FIELDS)
+        for field in FIELDS[:-1]:
+            self.assembler.put(field, 1.0)
+        timer = threading.Timer(0.05, self.assembler.put, ('proximity', 1.0))
+        timer.start()
+        values, missing = self.assembler.wait(5)
+        timer.join()
+        self.assertEqual(missing, [])
+        self.assertIn('proximity', values)
+
+    def test_late_value_is_not_mixed_into_next_cycle(self):
+        self.assembler.begin(100, FIELDS)
+        for field in FIELDS[:-1]:
+            self.assembler.put(field, 1.0)
+        values, missing = self.assembler.wait(0)
+        self.assertEqual(missing, ['proximity'])
+        self.assertNotIn('proximity', values)
+
+        # the overdue field is not requested again and its late answer is dropped
+        self.assertEqual(self.assembler.begin(105, FIELDS), list(FIELDS[:-1]))
+        self.assertFalse(self.assembler.put('proximity', 1.0))
+        self.assertEqual(self.assembler.late, 1)
+        for field in FIELDS[:-1]:
+            self.assembler.put(field, 2.0)
+        values, missing = self.assembler.wait(0)
+        self.assertEqual(missing, ['proximity'])
+
+        self.assertEqual(self.assembler.begin(110, FIELDS), list(FIELDS))
+
+    def test_lost_value_expires(self):
+        self.assembler.begin(100, ['light'])
+        self.assembler.wait(0)
+        # the value is overdue from the start of the next cycle on
+        self.clock.now = 5
+        self.assertEqual(self.assembler.begin(105, ['light']), [])
+        self.clock.now = 10
+        self.assertEqual(self.assembler.begin(110, ['light']), [])
+        self.clock.now = 15
+        self.assertEqual(self.assembler.begin(115, ['light']), ['light'])
+
+    def test_unrequested_value_is_ignored(self):
+        self.assembler.begin(100, ['light'])
+        self.assertFalse(self.assembler.put('temperature', 1.0))
+        self.assertTrue(self.assembler.put('light', 1.0))
+        self.assertFalse(self.assembler.put('light', 2.0))
+        self.assertEqual(self.assembler.wait(0)[0]['light'], 1.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
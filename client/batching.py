@@ -0,0 +1,108 @@
+import struct
+import time
+import zlib
+
+#the try is needed to have both the scripts and tests working
+try:
+    from payload_codec import get_codec, codec_for_topic, sensor_topic
+except ModuleNotFoundError:
+    from client.payload_codec import get_codec, codec_for_topic, sensor_topic
+
+
+class SampleBatcher:
+    '''Collects sensor samples and hands them out as one batched payload, either when a fixed number of samples
+    has been collected or when the flush interval has passed since the first sample of the batch.
+
+    The samples are encoded with the `encode_many` function of the codec, for json that is an envelope of the form
+    {"device_id": "002", "inputName": "sensorBatch", "samples": [{"timestamp": ..., "temperature": ...}, ...]}
+    and the payload is optionally zlib compressed. Compressed batches are published on a separate topic so the
+    receiving side knows how to decode them.
+    '''
+
+    def __init__(self, max_samples: int = 10, flush_interval: float = 60.0, compress: bool = False,
+                 codec: object = None, clock=time.monotonic):
+        '''
+        Parameters:
+            max_samples (int): number of samples after which a batch is flushed
+            flush_interval (float): seconds after the first sample of a batch after which the batch is flushed
+            compress (bool): compresses the payload with zlib if True
+            codec (object): codec of the payload, json if None
+            clock (callable): monotonic clock, can be replaced in tests
+        '''
+        self.max_samples = max_samples
+        self.flush_interval = flush_interval
+        self.compress = compress
+        self.codec = codec or get_codec('json')
+        self.clock = clock
+        self.samples = []
+        self.started = None
+
+    @property
+    def topic(self):
+        '''Topic the batched payloads have to be published on'''
+        return sensor_topic(self.codec, batch=True, compressed=self.compress)
+
+    def add(self, sample: dict):
+        '''Adds a copy of a sample to the current batch and returns the encoded batch if it is due. A sample the
+        codec can't encode is rejected, so it can't break the batch of the other samples
+
+        Parameters:
+            sample (dict): a sample in the format of the publisher data template
+
+        Returns:
+            payload (bytes): the encoded batch, or None if the batch is not due yet
+        '''
+        try:
+            self.codec.encode(sample)
+        except (KeyError, TypeError, ValueError, struct.error) as e:
+            raise ValueError(f'sample can not be encoded with {self.codec.name}: {e!r}') from e
+        if not self.samples:
+            self.started = self.clock()
+        self.samples.append(dict(sample))
+        if self.due():
+            return self.flush()
+        return None
+
+    def due(self):
+        '''Checks if the current batch is full or its flush interval has passed
+
+        Returns:
+            due (bool): True if the batch should be flushed
+        '''
+        if not self.samples:
+            return False
+        if len(self.samples) >= self.max_samples:
+            return True
+        return self.clock() - self.started >= self.flush_interval
+
+    def flush(self):
+        '''Encodes the current batch and starts a new one, also if the batch could not be encoded
+
+        Returns:
+            payload (bytes): the encoded batch, or None if there are no samples
+        '''
+        if not self.samples:
+            return None
+        try:
+            payload = self.codec.encode_many(self.samples)
+        finally:
+            self.samples = []
+            self.started = None
+        if self.compress:
+            payload = zlib.compress(payload)
+        return payload
+
+
+def decode_batch(payload: bytes, topic: str):
+    '''Decodes a batched payload back into single samples in the format of the publisher data template
+
+    Parameters:
+        payload (bytes): the encoded batch
+        topic (str): the topic the batch was published on, which tells the codec and compression
+
+    Returns:
+        samples (list): a list of sample dictionaries
+    '''
+    if topic.endswith('/zlib'):
+        payload = zlib.decompress(payload)
+    return codec_for_topic(topic).decode_many(payload)
@@ -0,0 +1,81 @@
+import json
+import unittest
+import zlib
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from batching import SampleBatcher, decode_batch
+    from payload_codec import get_codec
+    from testing_utils import FakeClock, make_sample
+except ModuleNotFoundError:
+    from client.batching import SampleBatcher, decode_batch
+    from client.payload_codec import get_codec
+    from client.testing_utils import FakeClock, make_sample
+
+
+class SampleBatcherTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def test_flush_on_max_samples(self):
+        batcher = SampleBatcher(max_samples=3, flush_interval=60, clock=self.clock)
+        self.assertIsNone(batcher.add(make_sample(1)))
+        self.assertIsNone(batcher.add(make_sample(2)))
+        payload = batcher.add(make_sample(3))
+
+        envelope = json.loads(payload)
+        self.assertEqual(envelope["device_id"], "002")
+        self.assertEqual(envelope["inputName"], "sensorBatch")
+        self.assertEqual([sample["timestamp"] for sample in envelope["samples"]], [1, 2, 3])
+        self.assertNotIn("device_id", envelope["samples"][0])
+        self.assertFalse(batcher.due())
+
+    def test_flush_on_interval(self):
+        batcher = SampleBatcher(max_samples=100, flush_interval=60, clock=self.clock)
+        batcher.add(make_sample(1))
+        self.clock.now = 59
+        self.assertFalse(batcher.due())
+        self.clock.now = 60
+        self.assertTrue(batcher.due())
+        self.assertEqual(len(json.loads(batcher.flush())["samples"]), 1)
+        self.assertIsNone(batcher.flush())
+
+    def test_compressed_round_trip(self):
+        batcher = SampleBatcher(max_samples=2, compress=True, clock=self.clock)
+        batcher.add(make_sample(1))
+        payload = batcher.add(make_sample(2))
+
+        self.assertEqual(batcher.topic, "iot/sensor_data/batch/zlib")
+        self.assertIsNotNone(zlib.decompress(payload))
+        self.assertEqual(decode_batch(payload, batcher.topic), [make_sample(1), make_sample(2)])
+
+    def test_binary_codec(self):
+        batcher = SampleBatcher(max_samples=2, codec=get_codec("bin"), clock=self.clock)
+        batcher.add(make_sample(1))
+        payload = batcher.add(make_sample(2))
+
+        self.assertEqual(batcher.topic, "iot/sensor_data/batch/bin")
+        self.assertEqual(len(payload), 66)
+        self.assertEqual(decode_batch(payload, batcher.topic), [make_sample(1), make_sample(2)])
+
+    def test_samples_are_copied(self):
+        batcher = SampleBatcher(max_samples=2, clock=self.clock)
+        sample = make_sample(1)
+        batcher.add(sample)
+        sample["temperature"] = 99.0
+        payload = batcher.add(make_sample(2))
+        self.assertEqual(json.loads(payload)["samples"][0]["temperature"], 21.5)
+
+    def test_rejects_sample_that_can_not_be_encoded(self):
+        batcher = SampleBatcher(max_samples=2, codec=get_codec("bin"), clock=self.clock)
+        batcher.add(make_sample(1))
+        with self.assertRaises(ValueError):
+            batcher.add(dict(make_sample(2), open_windows=True))
+
+        self.assertEqual(len(batcher.samples), 1)
+        payload = batcher.add(make_sample(3))
+        self.assertEqual([sample["timestamp"] for sample in decode_batch(payload, batcher.topic)], [1, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
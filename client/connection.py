@@ -0,0 +1,184 @@
+import random
+import ssl
+import threading
+import paho.mqtt.client as mqtt
+
+
+# states of the connection manager
+DISCONNECTED = 'disconnected'
+CONNECTING = 'connecting'
+CONNECTED = 'connected'
+BACKOFF = 'backoff'
+STOPPED = 'stopped'
+
+
+class ResumingContext(ssl.SSLContext):
+    '''SSLContext that offers the tls session of the last connection when a new connection is wrapped, so a
+    reconnect only needs an abbreviated handshake instead of a full handshake with the 4096 bit rsa key'''
+    session = None
+
+    def wrap_socket(self, sock, *args, **kwargs):
+        if self.session is not None and kwargs.get('session') is None:
+            kwargs['session'] = self.session
+        return super().wrap_socket(sock, *args, **kwargs)
+
+
+def create_tls_context(root_ca: str, certfile: str, keyfile: str):
+    '''Creates a tls context for mutual tls with the broker that reuses sessions
+
+    Parameters:
+        root_ca (str): path of the root ca certificate
+        certfile (str): path of the client certificate
+        keyfile (str): path of the private key
+
+    Returns:
+        context (ResumingContext): the tls context
+    '''
+    context = ResumingContext(ssl.PROTOCOL_TLS_CLIENT)
+    context.minimum_version = ssl.TLSVersion.TLSv1_2
+    context.load_verify_locations(root_ca)
+    context.load_cert_chain(certfile, keyfile)
+    return context
+
+
+class ConnectionManager:
+    '''Keeps a mqtt client connected to the broker. It runs the network loop of the client in its own thread and
+    goes through explicit states: connecting, connected, and after a failure backoff before the next attempt. The
+    wait between attempts grows exponentially up to `max_delay` with random jitter, so many gateways don't retry
+    in lockstep and an unreachable broker doesn't cause a busy loop.
+    '''
+
+    def __init__(self, client: mqtt.Client, host: str, port: int = 8883, keepalive: int = 120,
+                 min_delay: float = 1.0, max_delay: float = 120.0, rand: random.Random = None):
+        '''
+        Parameters:
+            client (Client): mqtt client object
+            host (str): host of the broker
+            port (int): port of the broker
+            keepalive (int): keepalive interval in seconds
+            min_delay (float): seconds to wait after the first failed attempt
+            max_delay (float): maximum seconds to wait between two attempts
+            rand (Random): random generator for the jitter, can be replaced in tests
+        '''
+        self.client = client
+        self.host = host
+        self.port = port
+        self.keepalive = keepalive
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.random = rand or random.Random()
+        self.state = DISCONNECTED
+        self.attempts = 0
+        self.connected_once = False
+        self.resumed = 0
+        self.condition = threading.Condition()
+        self.thread = None
+        self.on_connect = client.on_connect
+        self.on_disconnect = client.on_disconnect
+        client.on_connect = self.handle_connect
+        client.on_disconnect = self.handle_disconnect
+
+    def set_state(self, state: str):
+        '''Changes the state and wakes up threads waiting for a state change'''
+        with self.condition:
+            self.state = state
+            self.condition.notify_all()
+
+    def delay(self):
+        '''Returns the seconds to wait before the next attempt, half of it is random jitter
+
+        Returns:
+            delay (float): seconds to wait
+        '''
+        delay = min(self.max_delay, self.min_delay * 2 ** max(0, self.attempts - 1))
+        return self.random.uniform(delay / 2, delay)
+
+    def handle_connect(self, client: object, userdata: any, flags: dict, response_code: int):
+        '''Callback function on receiving the answer of the broker to a connection attempt'''
+        if response_code == 0:
+            self.attempts = 0
+            sock = client.socket()
+            context = getattr(client, '_ssl_context', None)
+            if isinstance(sock, ssl.SSLSocket) and isinstance(context, ResumingContext):
+                if sock.session_reused:
+                    self.resumed += 1
+                context.session = sock.session
+            self.set_state(CONNECTED)
+        else:
+            self.attempts += 1
+            self.set_state(BACKOFF)
+        if self.on_connect is not None:
+            self.on_connect(client, userdata, flags, response_code)
+
+    def handle_disconnect(self, client: object, userdata: any, response_code: int):
+        '''Callback function on losing the connection to the broker'''
+        if self.state != STOPPED:
+            self.set_state(DISCONNECTED)
+        if self.on_disconnect is not None:
+            self.on_disconnect(client, userdata, response_code)
+
+    def connect(self):
+        '''Opens the network connection to the broker and sends the connect packet
+
+        Returns:
+            connected (bool): True if the connection was opened
+        '''
+        self.set_state(CONNECTING)
+        try:
+            if self.connected_once:
+                self.client.reconnect()
+            else:
+                self.client.connect(self.host, port=self.port, keepalive=self.keepalive)
+                self.connected_once = True
+            return True
+        except (OSError, ssl.SSLError) as e:
+            print('Connection attempt failed:', e)
+            self.attempts += 1
+            self.set_state(BACKOFF)
+            return False
+
+    def wait(self, seconds: float):
+        '''Waits in the backoff state, returns early if the manager is stopped'''
+        with self.condition:
+            self.condition.wait_for(lambda: self.state == STOPPED, seconds)
+
+    def run(self):
+        '''Runs the network loop and reconnects until the manager is stopped'''
+        while self.state != STOPPED:
+            if self.state in (DISCONNECTED, BACKOFF):
+                if self.state == BACKOFF or self.attempts > 0:
+                    delay = self.delay()
+                    print('Reconnecting in {0:.1f} seconds'.format(delay))
+                    self.wait(delay)
+                    if self.state == STOPPED:
+                        break
+                if not self.connect():
+                    continue
+            rc = self.client.loop(timeout=1.0)
+            if rc != mqtt.MQTT_ERR_SUCCESS and self.state not in (STOPPED, BACKOFF):
+                self.attempts += 1
+                self.set_state(BACKOFF)
+
+    def start(self):
+        '''Starts the network loop in its own thread'''
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        '''Stops the network loop and disconnects from the broker'''
+        self.set_state(STOPPED)
+        self.client.disconnect()
+        if self.thread is not None and self.thread is not threading.current_thread():
+            self.thread.join()
+
+    def wait_connected(self, timeout: float = None):
+        '''Waits until the client is connected
+
+        Parameters:
+            timeout (float): maximum seconds to wait
+
+        Returns:
+            connected (bool): True if the client is connected
+        '''
+        with self.condition:
+            return self.condition.wait_for(lambda: self.state == CONNECTED, timeout)
@@ -0,0 +1,110 @@
+import ssl
+import unittest
+from unittest.mock import MagicMock, patch
+import paho.mqtt.client as mqtt
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from connection import ConnectionManager, ResumingContext, CONNECTED, BACKOFF, DISCONNECTED, STOPPED
+except ModuleNotFoundError:
+    from client.connection import ConnectionManager, ResumingContext, CONNECTED, BACKOFF, DISCONNECTED, STOPPED
+
+
+class MaxRandom:
+    '''Random generator without jitter that always returns the upper bound'''
+    def uniform(self, low, high):
+        return high
+
+
+class ConnectionManagerTest(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.user_on_connect = MagicMock()
+        self.client.on_connect = self.user_on_connect
+        self.manager = ConnectionManager(self.client, 'broker', min_delay=1, max_delay=8, rand=MaxRandom())
+
+    def test_delay_grows_exponentially_up_to_maximum(self):
+        delays = []
+        for attempts in range(1, 7):
+            self.manager.attempts = attempts
+            delays.append(self.manager.delay())
+        self.assertEqual(delays, [1, 2, 4, 8, 8, 8])
+
+    def test_delay_has_jitter(self):
+        self.manager.random.uniform = MagicMock(return_value=3.0)
+        self.manager.attempts = 4
+        self.assertEqual(self.manager.delay(), 3.0)
+        self.manager.random.uniform.assert_called_once_with(4.0, 8)
+
+    def test_successful_connack(self):
+        self.manager.attempts = 3
+        self.client.socket.return_value = None
+        self.client.on_connect(self.client, None, {}, 0)
+        self.assertEqual(self.manager.state, CONNECTED)
+        self.assertEqual(self.manager.attempts, 0)
+        self.user_on_connect.assert_called_once_with(self.client, None, {}, 0)
+
+    def test_refused_connack_backs_off(self):
+        self.client.on_connect(self.client, None, {}, 5)
+        self.assertEqual(self.manager.state, BACKOFF)
+        self.assertEqual(self.manager.attempts, 1)
+
+    def test_disconnect(self):
+        self.manager.state = CONNECTED
+        self.client.on_disconnect(self.client, None, 1)
+        self.assertEqual(self.manager.state, DISCONNECTED)
+
+    def test_failed_attempt_backs_off(self):
+        self.client.connect.side_effect = OSError('unreachable')
+        self.assertFalse(self.manager.connect())
+        self.assertEqual(self.manager.state, BACKOFF)
+        self.assertEqual(self.manager.attempts, 1)
+
+    def test_reconnect_after_first_connection(self):
+        self.assertTrue(self.manager.connect())
+        self.assertTrue(self.manager.connect())
+        self.client.connect.assert_called_once_with('broker', port=8883, keepalive=120)
+        self.client.reconnect.assert_called_once()
+
+    def test_run_waits_between_attempts(self):
+        self.client.connect.side_effect = OSError('unreachable')
+        waits = []
+
+        def wait(seconds):
+            waits.append(seconds)
+            if len(waits) == 3:
+                self.manager.state = STOPPED
+
+        self.manager.wait = wait
+        self.manager.run()
+        self.assertEqual(waits, [1, 2, 4])
+        self.client.loop.assert_not_called()
+
+    def test_run_loops_until_stopped(self):
+        def loop(timeout):
+            self.manager.state = STOPPED
+            return mqtt.MQTT_ERR_SUCCESS
+
+        self.client.loop.side_effect = loop
+        self.manager.run()
+        self.client.connect.assert_called_once()
+
+    def test_lost_connection_backs_off(self):
+        self.manager.state = CONNECTED
+        self.client.loop.return_value = mqtt.MQTT_ERR_CONN_LOST
+        self.manager.wait = lambda seconds: setattr(self.manager, 'state', STOPPED)
+        self.manager.run()
+        self.assertEqual(self.manager.attempts, 1)
+
+
+class ResumingContextTest(unittest.TestCase):
+    def test_session_is_offered(self):
+        context = ResumingContext(ssl.PROTOCOL_TLS_CLIENT)
+        context.session = session = object()
+        with patch.object(ssl.SSLContext, 'wrap_socket') as wrap:
+            context.wrap_socket('sock', server_hostname='broker')
+        wrap.assert_called_once_with('sock', server_hostname='broker', session=session)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import time
+
+
+class DeadbandFilter:
+    '''Decides if a sample is worth publishing. A sample is published if one of its fields left the band around
+    the value that was published last, or if nothing was published for `heartbeat` seconds, so the detector
+    models still get a sign of life when the greenhouse is stable. Fields without a band are not checked.
+    '''
+
+    def __init__(self, bands: dict, heartbeat: float = 300.0, clock=time.monotonic):
+        '''
+        Parameters:
+            bands (dict): maximum change of each checked field, e.g. {'temperature': 0.2, 'light': 2.0}
+            heartbeat (float): seconds after which a sample is published even if nothing changed
+            clock (callable): monotonic clock, can be replaced in tests
+        '''
+        self.bands = bands
+        self.heartbeat = heartbeat
+        self.clock = clock
+        self.published = {}
+        self.published_at = None
+        self.suppressed = 0
+
+    def check(self, sample: dict):
+        '''Checks if a sample should be published and remembers it as the new reference if so
+
+        Parameters:
+            sample (dict): sample in the format of the publisher data template
+
+        Returns:
+            publish (bool): True if the sample should be published
+        '''
+        now = self.clock()
+        if self.published_at is None or now - self.published_at >= self.heartbeat or self.left_band(sample):
+            # a sample may only contain some of the sensors, the others keep their reference
+            self.published.update({field: sample[field] for field in self.bands if field in sample})
+            self.published_at = now
+            return True
+        self.suppressed += 1
+        return False
+
+    def left_band(self, sample: dict):
+        '''Checks if a field of the sample left the band around the value that was published last
+
+        Parameters:
+            sample (dict): sample in the format of the publisher data template
+
+        Returns:
+            left (bool): True if at least one field left its band
+        '''
+        for field, band in self.bands.items():
+            if field not in sample:
+                continue
+            if field not in self.published or abs(sample[field] - self.published[field]) > band:
+                return True
+        return False
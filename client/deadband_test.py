@@ -0,0 +1,53 @@
+import unittest
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from deadband import DeadbandFilter
+    from testing_utils import FakeClock
+except ModuleNotFoundError:
+    from client.deadband import DeadbandFilter
+    from client.testing_utils import FakeClock
+
+
+class DeadbandFilterTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.filter = DeadbandFilter({'temperature': 0.2, 'light': 2.0}, heartbeat=300, clock=self.clock)
+
+    def test_first_sample_is_published(self):
+        self.assertTrue(self.filter.check({'temperature': 20.0, 'light': 50.0}))
+
+    def test_changes_within_band_are_suppressed(self):
+        self.filter.check({'temperature': 20.0, 'light': 50.0, 'proximity': 1.0})
+        self.assertFalse(self.filter.check({'temperature': 20.2, 'light': 48.0, 'proximity': 9.0}))
+        self.assertEqual(self.filter.suppressed, 1)
+
+    def test_change_outside_band_is_published(self):
+        self.filter.check({'temperature': 20.0, 'light': 50.0})
+        self.assertTrue(self.filter.check({'temperature': 20.0, 'light': 52.5}))
+
+    def test_slow_drift_is_compared_to_published_value(self):
+        self.filter.check({'temperature': 20.0})
+        self.assertFalse(self.filter.check({'temperature': 20.15}))
+        self.assertTrue(self.filter.check({'temperature': 20.3}))
+
+    def test_samples_of_single_sensors_keep_the_other_references(self):
+        self.filter.check({'temperature': 20.0, 'light': 50.0})
+        self.assertTrue(self.filter.check({'light': 53.0}))
+        self.assertFalse(self.filter.check({'temperature': 20.1}))
+
+    def test_heartbeat(self):
+        self.filter.check({'temperature': 20.0})
+        self.clock.now = 299
+        self.assertFalse(self.filter.check({'temperature': 20.0}))
+        self.clock.now = 300
+        self.assertTrue(self.filter.check({'temperature': 20.0}))
+
+    def test_missing_field_is_not_checked(self):
+        self.filter.check({'temperature': 20.0, 'light': 50.0})
+        self.assertFalse(self.filter.check({'temperature': 20.0}))
+        self.assertTrue(self.filter.check({'temperature': 20.0, 'light': 60.0}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import threading
+import paho.mqtt.client as mqtt
+
+
+# what happens to a message if the window is full
+BLOCK = 'block'
+DROP = 'drop'
+DOWNGRADE = 'downgrade'
+
+
+def accepted(info: mqtt.MQTTMessageInfo, qos: int = 1):
+    '''Tells if the client took over a message. Without a connection paho keeps a qos 1 message and sends it after
+    reconnecting, storing it somewhere else as well would deliver it twice
+
+    Parameters:
+        info (MQTTMessageInfo): info of the published message
+        qos (int): qos the message was published with
+
+    Returns:
+        accepted (bool): True if the message is sent or queued by the client
+    '''
+    return info.rc == mqtt.MQTT_ERR_SUCCESS or (qos > 0 and info.rc == mqtt.MQTT_ERR_NO_CONN)
+
+
+class PublishWindow:
+    '''Limits the number of qos 1 messages that are published but not acknowledged by the broker yet. paho keeps
+    every unacknowledged message in memory and queues messages beyond its own inflight limit without a bound, so
+    under a slow or throttling broker the memory would grow. If the window is full, the policy decides:
+    `block` waits until a message is acknowledged, `drop` refuses the message and `downgrade` sends it with qos 0.
+    A refused message is returned as None, so the caller can keep it, e.g. in the spool.
+    '''
+
+    def __init__(self, client: mqtt.Client, max_in_flight: int = 20, policy: str = BLOCK, timeout: float = None,
+                 tracker: object = None):
+        '''
+        Parameters:
+            client (Client): mqtt client object
+            max_in_flight (int): maximum number of unacknowledged qos 1 messages
+            policy (str): 'block', 'drop' or 'downgrade'
+            timeout (float): maximum seconds to block, the message is refused afterwards, None blocks without limit
+            tracker (PubackTracker): records the latency of the qos 1 messages, optional
+        '''
+        if policy not in (BLOCK, DROP, DOWNGRADE):
+            raise ValueError(f'unknown policy {policy}')
+        self.client = client
+        self.max_in_flight = max_in_flight
+        self.policy = policy
+        self.timeout = timeout
+        self.tracker = tracker
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.waiting = 0
+        self.mids = {}
+        # acknowledgements of unknown messages, only kept while a publish may not have stored its mid yet
+        self.early = set()
+        self.publishing = 0
+        self.dropped = 0
+        self.downgraded = 0
+        # paho doesn't need to queue anything itself
+        client.max_inflight_messages_set(max_in_flight)
+
+    def publish(self, topic: str, payload: bytes, timeout: float = None):
+        '''Publishes a message with qos 1, or according to the policy if the window is full
+
+        Parameters:
+            topic (str): topic the message is published on
+            payload (bytes): payload of the message
+            timeout (float): maximum seconds to block for this message if it is shorter than the timeout of the window
+
+        Returns:
+            info (MQTTMessageInfo): info of the published message, or None if the message was refused
+        '''
+        if timeout is None or (self.timeout is not None and self.timeout < timeout):
+            timeout = self.timeout
+        qos = 1
+        with self.condition:
+            if self.in_flight >= self.max_in_flight:
+                if self.policy == BLOCK:
+                    self.waiting += 1
+                    has_room = self.condition.wait_for(lambda: self.in_flight < self.max_in_flight, timeout)
+                    self.waiting -= 1
+                    if not has_room:
+                        self.dropped += 1
+                        return None
+                elif self.policy == DROP:
+                    self.dropped += 1
+                    return None
+                else:
+                    self.downgraded += 1
+                    qos = 0
+            if qos == 1:
+                # the slot is taken before publishing, the lock can't be held while calling paho because
+                # paho calls on_publish while holding its own lock
+                self.in_flight += 1
+            self.publishing += 1
+
+        started = self.tracker.clock() if self.tracker is not None else None
+        info = self.client.publish(topic, payload=payload, qos=qos)
+        with self.condition:
+            self.publishing -= 1
+            if not accepted(info, qos):
+                self.release(qos)
+            elif info.mid in self.early:
+                # acknowledged before publish returned
+                self.early.discard(info.mid)
+                self.release(qos)
+            else:
+                # the message is kept until it is acknowledged, so it can be stored if the publisher stops before.
+                # A message paho queued for lack of a connection keeps its slot until it is sent and acknowledged
+                self.mids[info.mid] = (qos, topic, payload)
+            if self.publishing == 0:
+                # the acknowledgements left are of messages the window doesn't know, they would match a reused mid
+                self.early.clear()
+        if qos == 1 and accepted(info, qos) and self.tracker is not None:
+            self.tracker.sent(info.mid, started)
+        return info
+
+    def release(self, qos: int):
+        '''Frees the slot of a message, the lock has to be held'''
+        if qos == 1:
+            self.in_flight -= 1
+            # wakes up a blocked publisher as well as drain
+            self.condition.notify_all()
+
+    def acked(self, mid: int):
+        '''Frees the slot of an acknowledged message, called from on_publish
+
+        Parameters:
+            mid (int): message id
+
+        Returns:
+            None
+        '''
+        with self.condition:
+            message = self.mids.pop(mid, None)
+            if message is None:
+                self.early.add(mid)
+            else:
+                self.release(message[0])
+
+    def drain(self, timeout: float = None):
+        '''Waits until all qos 1 messages are acknowledged, e.g. before the publisher disconnects
+
+        Parameters:
+            timeout (float): maximum seconds to wait, None waits without limit
+
+        Returns:
+            drained (bool): True if no message is in flight anymore
+        '''
+        with self.condition:
+            return self.condition.wait_for(lambda: self.in_flight == 0, timeout)
+
+    def unacked(self):
+        '''Returns the qos 1 messages that are not acknowledged yet
+
+        Returns:
+            messages (list): topic and payload of each message
+        '''
+        with self.condition:
+            return [(topic, payload) for qos, topic, payload in self.mids.values() if qos == 1]
+
+    def stats(self):
+        '''Returns the current state of the window
+
+        Returns:
+            stats (dict): messages in flight, publishers waiting for room, dropped and downgraded messages
+        '''
+        with self.condition:
+            return {'in_flight': self.in_flight, 'max_in_flight': self.max_in_flight, 'waiting': self.waiting,
+                    'dropped': self.dropped, 'downgraded': self.downgraded}
+
+    def report(self):
+        '''Formats the state of the window as one line
+
+        Returns:
+            report (str): the state of the window
+        '''
+        return 'Publish window: {in_flight}/{max_in_flight} in flight, {waiting} waiting, {dropped} refused, ' \
+               '{downgraded} sent with qos 0'.format(**self.stats())
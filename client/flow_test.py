@@ -0,0 +1,122 @@
+import threading
+import unittest
+from unittest.mock import MagicMock
+import paho.mqtt.client as mqtt
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from flow import PublishWindow, accepted
+except ModuleNotFoundError:
+    from client.flow import PublishWindow, accepted
+
+
+class FakeClient:
+    '''Client that accepts every message and numbers them like paho'''
+    def __init__(self):
+        self.published = []
+        self.max_inflight_messages_set = MagicMock()
+
+    def publish(self, topic, payload=None, qos=0):
+        self.published.append((topic, qos))
+        return MagicMock(rc=0, mid=len(self.published))
+
+
+class PublishWindowTest(unittest.TestCase):
+    def setUp(self):
+        self.client = FakeClient()
+
+    def test_window_limits_paho_inflight(self):
+        PublishWindow(self.client, max_in_flight=5)
+        self.client.max_inflight_messages_set.assert_called_once_with(5)
+
+    def test_acknowledgement_frees_slot(self):
+        window = PublishWindow(self.client, max_in_flight=2, policy='drop')
+        window.publish('topic', b'1')
+        window.publish('topic', b'2')
+        self.assertEqual(window.stats()['in_flight'], 2)
+        window.acked(1)
+        self.assertEqual(window.stats()['in_flight'], 1)
+
+    def test_drop(self):
+        window = PublishWindow(self.client, max_in_flight=1, policy='drop')
+        self.assertIsNotNone(window.publish('topic', b'1'))
+        self.assertIsNone(window.publish('topic', b'2'))
+        self.assertEqual(window.stats()['dropped'], 1)
+        self.assertEqual(len(self.client.published), 1)
+
+    def test_downgrade(self):
+        window = PublishWindow(self.client, max_in_flight=1, policy='downgrade')
+        window.publish('topic', b'1')
+        window.publish('topic', b'2')
+        self.assertEqual(self.client.published, [('topic', 1), ('topic', 0)])
+        # the qos 0 message doesn't take a slot
+        window.acked(2)
+        self.assertEqual(window.stats()['in_flight'], 1)
+        self.assertEqual(window.stats()['downgraded'], 1)
+
+    def test_block_times_out(self):
+        window = PublishWindow(self.client, max_in_flight=1, policy='block', timeout=0.01)
+        window.publish('topic', b'1')
+        self.assertIsNone(window.publish('topic', b'2'))
+        self.assertEqual(window.stats()['waiting'], 0)
+
+    def test_block_with_shorter_timeout(self):
+        window = PublishWindow(self.client, max_in_flight=1, policy='block', timeout=5)
+        window.publish('topic', b'1')
+        self.assertIsNone(window.publish('topic', b'2', timeout=0.01))
+        self.assertEqual(window.stats()['dropped'], 1)
+
+    def test_block_waits_for_acknowledgement(self):
+        window = PublishWindow(self.client, max_in_flight=1, policy='block', timeout=5)
+        window.publish('topic', b'1')
+        threading.Timer(0.05, window.acked, args=(1,)).start()
+        self.assertIsNotNone(window.publish('topic', b'2'))
+        self.assertEqual(len(self.client.published), 2)
+
+    def test_acknowledgement_before_publish_returns(self):
+        window = PublishWindow(self.client, max_in_flight=1, policy='drop')
+        window.acked(1)
+        window.publish('topic', b'1')
+        self.assertEqual(window.stats()['in_flight'], 0)
+
+    def test_failed_publish_frees_slot(self):
+        self.client.publish = MagicMock(return_value=MagicMock(rc=mqtt.MQTT_ERR_QUEUE_SIZE, mid=1))
+        window = PublishWindow(self.client, max_in_flight=1, policy='drop')
+        window.publish('topic', b'1')
+        self.assertEqual(window.stats()['in_flight'], 0)
+
+    def test_message_queued_without_connection_keeps_slot(self):
+        self.client.publish = MagicMock(return_value=MagicMock(rc=mqtt.MQTT_ERR_NO_CONN, mid=1))
+        window = PublishWindow(self.client, max_in_flight=1, policy='drop')
+        self.assertTrue(accepted(window.publish('topic', b'1')))
+        self.assertEqual(window.stats()['in_flight'], 1)
+        self.assertEqual(window.unacked(), [('topic', b'1')])
+        window.acked(1)
+        self.assertEqual(window.stats()['in_flight'], 0)
+
+    def test_unknown_acknowledgement_is_forgotten(self):
+        window = PublishWindow(self.client, max_in_flight=2, policy='drop')
+        window.acked(2)
+        window.publish('topic', b'1')
+        # mid 2 was acknowledged before, it must not count for the new message
+        window.publish('topic', b'2')
+        self.assertEqual(window.stats()['in_flight'], 2)
+
+    def test_drain_waits_for_acknowledgements(self):
+        window = PublishWindow(self.client, max_in_flight=2)
+        window.publish('topic', b'1')
+        window.publish('topic', b'2')
+        self.assertFalse(window.drain(0.01))
+        self.assertEqual(window.unacked(), [('topic', b'1'), ('topic', b'2')])
+        window.acked(1)
+        threading.Timer(0.05, window.acked, args=(2,)).start()
+        self.assertTrue(window.drain(5))
+        self.assertEqual(window.unacked(), [])
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            PublishWindow(self.client, policy='queue')
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,257 @@
+import asyncio
+import signal
+import ssl
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+import paho.mqtt.client as mqtt
+
+#the try is needed to have both the scripts and tests working
+try:
+    import publisher
+    import receiver
+    from utils import create_client, read_endpoint, start_iotee
+    from connection import ConnectionManager, DISCONNECTED, BACKOFF, STOPPED
+    from routing import route_message
+    from batching import SampleBatcher
+    from local_link import FanIn
+    from scheduling import SensorScheduler, AdaptiveSampler
+except ModuleNotFoundError:
+    from client import publisher
+    from client import receiver
+    from client.utils import create_client, read_endpoint, start_iotee
+    from client.connection import ConnectionManager, DISCONNECTED, BACKOFF, STOPPED
+    from client.routing import route_message
+    from client.batching import SampleBatcher
+    from client.local_link import FanIn
+    from client.scheduling import SensorScheduler, AdaptiveSampler
+
+# local publishers with `UPLINK` set can send their sensor data to the gateway over `LINK_ADDRESS`, e.g.
+# './client/gateway.sock' or 'localhost:1884' on windows. Their samples are sent in batches of up to `LINK_BATCH_SIZE`
+# samples or every `LINK_BATCH_INTERVAL` seconds, `LINK_BATCH_COMPRESS` compresses them with zlib. None disables it
+LINK_ADDRESS = None
+LINK_BATCH_SIZE = 50
+LINK_BATCH_INTERVAL = 10
+LINK_BATCH_COMPRESS = True
+
+
+class AsyncioHelper:
+    '''Drives the network loop of a paho client with an asyncio event loop instead of a thread. The event loop watches
+    the socket and paho only reads when data arrived and only writes while it has packets to send, so an idle
+    gateway doesn't wake up except for the keepalive.
+    '''
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, client: mqtt.Client):
+        '''
+        Parameters:
+            loop (AbstractEventLoop): the event loop
+            client (Client): mqtt client object
+        '''
+        self.loop = loop
+        self.client = client
+        client.on_socket_open = self.on_socket_open
+        client.on_socket_close = self.on_socket_close
+        client.on_socket_register_write = self.on_socket_register_write
+        client.on_socket_unregister_write = self.on_socket_unregister_write
+
+    # paho calls these from the thread that connects or publishes, the event loop may only be changed from its own
+    # thread
+    def on_socket_open(self, client: object, userdata: any, sock: object):
+        self.loop.call_soon_threadsafe(self.loop.add_reader, sock, self.read)
+
+    def on_socket_close(self, client: object, userdata: any, sock: object):
+        self.loop.call_soon_threadsafe(self.loop.remove_reader, sock)
+
+    def on_socket_register_write(self, client: object, userdata: any, sock: object):
+        self.loop.call_soon_threadsafe(self.loop.add_writer, sock, self.client.loop_write)
+
+    def on_socket_unregister_write(self, client: object, userdata: any, sock: object):
+        self.loop.call_soon_threadsafe(self.loop.remove_writer, sock)
+
+    def read(self):
+        '''Reads from the socket when the event loop saw that data arrived'''
+        self.client.loop_read()
+        # tls may have decrypted more data than paho read, the socket won't become readable for it again
+        sock = self.client.socket()
+        while isinstance(sock, ssl.SSLSocket) and sock.pending() > 0:
+            self.client.loop_read()
+            sock = self.client.socket()
+
+    async def wait_closed(self, timeout: float = 1.0):
+        '''Waits until paho closed the socket, it does so after the writer of the event loop sent the disconnect packet
+
+        Parameters:
+            timeout (float): maximum seconds to wait
+
+        Returns:
+            closed (bool): True if the socket was closed in time
+        '''
+        deadline = self.loop.time() + timeout
+        while self.client.socket() is not None:
+            if self.loop.time() >= deadline:
+                return False
+            await asyncio.sleep(0.01)
+        return True
+
+    async def run(self, connection: ConnectionManager):
+        '''Connects and reconnects with the backoff of the connection manager and handles the keepalive, until
+        the connection manager is stopped
+
+        Parameters:
+            connection (ConnectionManager): manages the state of the connection
+
+        Returns:
+            None
+        '''
+        while connection.state != STOPPED:
+            if connection.state in (DISCONNECTED, BACKOFF):
+                if connection.attempts > 0:
+                    await asyncio.sleep(connection.delay())
+                    if connection.state == STOPPED:
+                        break
+                # the tcp and tls handshakes block, so they run in a thread
+                await self.loop.run_in_executor(None, connection.connect)
+            self.client.loop_misc()
+            await asyncio.sleep(1)
+
+
+async def sample_periodically(client: object, devices: list, scheduler: SensorScheduler,
+                              adaptive: AdaptiveSampler = None):
+    '''Samples the sensors of the devices when the scheduler says they are due and publishes the samples, summaries 
+    and batches that are due
+
+    Parameters:
+        client (Client): mqtt client object
+        devices (list): list of SensorDevice objects
+        scheduler (SensorScheduler): decides which sensors are requested when
+        adaptive (AdaptiveSampler): adapts the intervals of the scheduler to the samples, optional
+
+    Returns:
+        None
+    '''
+    loop = asyncio.get_running_loop()
+
+    def sample(fields, timestamp):
+        # waiting for the serial answers and a full publish window blocks, so this runs in a thread
+        publisher.report_due()
+        samples = publisher.sample_devices(client, devices, fields, timestamp) if fields else []
+        for device in devices:
+            publisher.flush_due(client, device)
+        return samples
+
+    while True:
+        await asyncio.sleep(scheduler.wait_time())
+        timestamp, fields = scheduler.due()
+        try:
+            samples = await loop.run_in_executor(None, sample, fields, timestamp)
+        except Exception as e:
+            print('An error occurred:', e)
+            continue
+        # the scheduler is only used in the event loop, so it is adapted here and not in the thread
+        if adaptive is not None:
+            for values in samples:
+                adaptive.observe(values)
+
+
+async def flush_periodically(fan_in: FanIn, interval: float = 1.0):
+    '''Sends the batch of the fan-in when its flush interval has passed, even if no more samples arrive'''
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            fan_in.flush_due()
+        except Exception as e:
+            print('Dropped a batch of the local publishers:', e)
+
+
+def print_error(future: Future):
+    '''Prints the error of a message sent over the uplink, the executor would keep it in the future otherwise'''
+    if not future.cancelled() and future.exception() is not None:
+        print('Could not send a message over the uplink: {0!r}'.format(future.exception()))
+
+
+def on_connect(client: object, userdata: any, flags: dict, response_code: int):
+    '''Callback function on connecting to a broker, subscribes to the topics of the receiver and replays the spool
+    of the publisher'''
+    receiver.on_connect(client, userdata, flags, response_code)
+    if response_code == 0:
+        publisher.start_replay(client)
+
+
+async def run():
+    '''Starts the sensor and actor devices of publisher.DEVICES and receiver.DEVICES and runs them over one
+    connection to the broker until ctrl+c is pressed'''
+    loop = asyncio.get_running_loop()
+    # the receiver decides if the session is persistent, its commands are the ones that must not get lost
+    client = create_client(receiver.CLIENT_ID)
+    client.on_connect = on_connect
+    client.on_message = partial(route_message, receiver.routes)
+    client.message_callback_add(receiver.ERROR_TOPIC, receiver.on_error)
+    publisher.prepare(client)
+
+    receiver.open_journal()
+    # a device that is used for sensing and actuation is only opened once
+    iotees = {}
+    for com_port in list(publisher.DEVICES.values()) + list(receiver.DEVICES.values()):
+        if com_port not in iotees:
+            iotees[com_port] = start_iotee(com_port)
+    sensors = [publisher.start_device(device_id, com_port, iotees[com_port])
+               for device_id, com_port in publisher.DEVICES.items()]
+    actors = [receiver.start_device(device_id, com_port, iotees[com_port])
+              for device_id, com_port in receiver.DEVICES.items()]
+
+    stop = asyncio.Event()
+    try:
+        loop.add_signal_handler(signal.SIGINT, stop.set)
+    except NotImplementedError:
+        # windows has no signal handlers in the event loop
+        signal.signal(signal.SIGINT, lambda signal, frame: loop.call_soon_threadsafe(stop.set))
+
+    helper = AsyncioHelper(loop, client)
+    connection = ConnectionManager(client, read_endpoint())
+    print ('Connecting to AWS IoT Broker...')
+    tasks = [asyncio.create_task(helper.run(connection)),
+             asyncio.create_task(sample_periodically(client, sensors, *publisher.create_scheduler()))]
+
+    server = None
+    if LINK_ADDRESS is not None:
+        # the uplink publishes block while the publish window is full, one thread keeps them in order
+        uplink = ThreadPoolExecutor(max_workers=1)
+        send = lambda topic, payload: uplink.submit(publisher.send_message, client, topic, payload).add_done_callback(
+            print_error)
+        fan_in = FanIn(send, SampleBatcher(LINK_BATCH_SIZE, LINK_BATCH_INTERVAL, LINK_BATCH_COMPRESS, publisher.codec))
+        server = await fan_in.start(LINK_ADDRESS)
+        tasks.append(asyncio.create_task(flush_periodically(fan_in)))
+        print('Listening for local publishers on {0}'.format(LINK_ADDRESS))
+    await stop.wait()
+
+    print('Shutting down')
+    sampling = tasks[1]
+    sampling.cancel()
+    await asyncio.gather(sampling, return_exceptions=True)
+    if server is not None:
+        server.close()
+        fan_in.flush()
+        await loop.run_in_executor(None, partial(uplink.shutdown, wait=True))
+    # the acknowledgements are read by the event loop while the drain waits for them in a thread
+    left = await loop.run_in_executor(None, publisher.drain, client, sensors)
+    if left:
+        print('{0} messages were not acknowledged and are stored in the spool'.format(left))
+    # the disconnect packet is only written by the event loop, so the tasks are cancelled after it was sent
+    connection.stop()
+    await helper.wait_closed()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    for device in actors:
+        device.actuators.stop()
+    for iotee in iotees.values():
+        iotee.stop()
+
+
+def main():
+    '''Runs the gateway'''
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    '''Starts the gateway'''
+    main()
@@ -0,0 +1,121 @@
+import asyncio
+import unittest
+from unittest.mock import MagicMock, patch
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    import gateway
+    from connection import DISCONNECTED, CONNECTED, STOPPED
+    from scheduling import SensorScheduler
+except ModuleNotFoundError:
+    from client import gateway
+    from client.connection import DISCONNECTED, CONNECTED, STOPPED
+    from client.scheduling import SensorScheduler
+
+
+class FakeConnection:
+    '''Connection manager whose first attempt fails and second attempt succeeds'''
+    def __init__(self, helper):
+        self.helper = helper
+        self.state = DISCONNECTED
+        self.attempts = 0
+        self.calls = 0
+
+    def delay(self):
+        return 0.01
+
+    def connect(self):
+        self.calls += 1
+        if self.calls == 1:
+            self.attempts += 1
+            return False
+        self.state = CONNECTED
+        return True
+
+
+class AsyncioHelperTest(unittest.TestCase):
+    def setUp(self):
+        self.loop = MagicMock()
+        self.loop.call_soon_threadsafe.side_effect = lambda callback, *args: callback(*args)
+        self.client = MagicMock()
+        self.helper = gateway.AsyncioHelper(self.loop, self.client)
+
+    def test_socket_is_watched_by_event_loop(self):
+        self.client.on_socket_open(self.client, None, 'sock')
+        self.loop.add_reader.assert_called_once_with('sock', self.helper.read)
+        self.client.on_socket_register_write(self.client, None, 'sock')
+        self.loop.add_writer.assert_called_once_with('sock', self.client.loop_write)
+        self.client.on_socket_unregister_write(self.client, None, 'sock')
+        self.loop.remove_writer.assert_called_once_with('sock')
+        self.client.on_socket_close(self.client, None, 'sock')
+        self.loop.remove_reader.assert_called_once_with('sock')
+
+    def test_read(self):
+        self.client.socket.return_value = None
+        self.helper.read()
+        self.client.loop_read.assert_called_once()
+
+    def test_run_reconnects_after_failed_attempt(self):
+        async def run():
+            helper = gateway.AsyncioHelper(asyncio.get_running_loop(), self.client)
+            connection = FakeConnection(helper)
+            task = asyncio.create_task(helper.run(connection))
+            while connection.state != CONNECTED:
+                await asyncio.sleep(0.01)
+            connection.state = STOPPED
+            await asyncio.wait_for(task, 2)
+            return connection
+
+        connection = asyncio.run(run())
+        self.assertEqual(connection.calls, 2)
+        self.client.loop_misc.assert_called()
+
+    def test_wait_closed_until_disconnect_was_written(self):
+        # paho closes the socket after the writer sent the disconnect packet
+        self.client.socket.side_effect = ['sock', 'sock', None]
+
+        async def run():
+            helper = gateway.AsyncioHelper(asyncio.get_running_loop(), self.client)
+            return await helper.wait_closed(timeout=2)
+
+        self.assertTrue(asyncio.run(run()))
+        self.assertEqual(self.client.socket.call_count, 3)
+
+    def test_wait_closed_gives_up_after_timeout(self):
+        self.client.socket.return_value = 'sock'
+
+        async def run():
+            helper = gateway.AsyncioHelper(asyncio.get_running_loop(), self.client)
+            return await helper.wait_closed(timeout=0.05)
+
+        self.assertFalse(asyncio.run(run()))
+
+
+class GatewayTest(unittest.TestCase):
+    def test_on_connect_subscribes_and_replays(self):
+        client = MagicMock()
+        with patch.object(gateway.publisher, 'start_replay') as start_replay, patch('builtins.print'):
+            gateway.on_connect(client, None, {}, 0)
+        start_replay.assert_called_once_with(client)
+        topics = [call.args[0] for call in client.subscribe.call_args_list]
+        self.assertIn('iot/error', topics)
+
+    def test_sampling_runs_in_executor(self):
+        client = MagicMock()
+        calls = []
+
+        async def run():
+            with patch.object(gateway.publisher, 'sample_devices', side_effect=lambda *args: calls.append(args)), \
+                    patch.object(gateway.publisher, 'report_due'):
+                scheduler = SensorScheduler({'light': 0.05})
+                task = asyncio.create_task(gateway.sample_periodically(client, [], scheduler))
+                while not calls:
+                    await asyncio.sleep(0.01)
+                task.cancel()
+
+        asyncio.run(run())
+        self.assertEqual(calls[0][:3], (client, [], ['light']))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import os
+import threading
+
+
+class StateJournal:
+    '''Keeps the last state that was applied to each device of the receiver in a file, so the actuators can be set
+    again right after a restart instead of waiting for the next transition of the detector models.
+
+    The file is replaced atomically on every change, after a crash it holds either the old or the new states,
+    never a mix of both.
+    '''
+
+    def __init__(self, path: str):
+        '''Opens the journal, a missing or damaged file starts an empty journal
+
+        Parameters:
+            path (str): path of the journal file
+        '''
+        self.path = path
+        self.lock = threading.Lock()
+        self.states = {}
+        try:
+            with open(path, 'r') as f:
+                states = json.load(f)
+            if isinstance(states, dict):
+                self.states = states
+        except (OSError, ValueError):
+            pass
+
+    def get(self, device_id: str):
+        '''Returns the last state of a device
+
+        Parameters:
+            device_id (str): id of the device
+
+        Returns:
+            entry (dict): the state and the texts on the display of the device, or None if it has none
+        '''
+        with self.lock:
+            entry = self.states.get(device_id)
+            return None if entry is None else dict(entry, texts=list(entry.get('texts', [])))
+
+    def record(self, device_id: str, state: str, texts: list):
+        '''Stores the state of a device, the file is only written if it changed
+
+        Parameters:
+            device_id (str): id of the device
+            state (str): the state that was applied
+            texts (list): the texts on the display of the device
+
+        Returns:
+            None
+        '''
+        entry = {'state': state, 'texts': list(texts)}
+        with self.lock:
+            if self.states.get(device_id) == entry:
+                return
+            self.states[device_id] = entry
+            self.write()
+
+    def write(self):
+        '''Writes the states to a temporary file and replaces the journal with it'''
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.states, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
@@ -0,0 +1,50 @@
+import json
+import os
+import tempfile
+import unittest
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from journal import StateJournal
+except ModuleNotFoundError:
+    from client.journal import StateJournal
+
+
+class StateJournalTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'state.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_states_survive_a_restart(self):
+        journal = StateJournal(self.path)
+        journal.record('002', 'lights_on', ['Lights \nare on'])
+        journal.record('003', 'windows_open', [])
+        journal = StateJournal(self.path)
+        self.assertEqual(journal.get('002'), {'state': 'lights_on', 'texts': ['Lights \nare on']})
+        self.assertEqual(journal.get('003'), {'state': 'windows_open', 'texts': []})
+        self.assertIsNone(journal.get('004'))
+        self.assertFalse(os.path.exists(self.path + '.tmp'))
+
+    def test_recorded_texts_are_copied(self):
+        journal = StateJournal(self.path)
+        texts = ['Lights \nare on']
+        journal.record('002', 'lights_on', texts)
+        texts.append('Windows \nare open')
+        journal.get('002')['texts'].append('Sprinklers \nare on')
+        self.assertEqual(journal.get('002')['texts'], ['Lights \nare on'])
+
+    def test_damaged_file(self):
+        with open(self.path, 'w') as f:
+            f.write('{"002": {"state"')
+        journal = StateJournal(self.path)
+        self.assertIsNone(journal.get('002'))
+        journal.record('002', 'lights_on', [])
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {'002': {'state': 'lights_on', 'texts': []}})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,179 @@
+import bisect
+import threading
+import time
+
+
+class LatencyHistogram:
+    '''Histogram of latencies with logarithmic buckets. Each bucket is about 19% wider than the one before, from
+    1 millisecond up to about a minute, so recording a value is a binary search over 64 bounds and a percentile is
+    accurate to the width of its bucket.
+    '''
+
+    def __init__(self, smallest: float = 0.001, factor: float = 2 ** 0.25, buckets: int = 64):
+        '''
+        Parameters:
+            smallest (float): upper bound of the first bucket in seconds
+            factor (float): ratio of the upper bounds of two neighbouring buckets
+            buckets (int): number of buckets, larger values are counted in the last one
+        '''
+        self.bounds = [smallest * factor ** i for i in range(buckets)]
+        self.counts = [0] * buckets
+        self.count = 0
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, latency: float):
+        '''Records a latency
+
+        Parameters:
+            latency (float): latency in seconds
+
+        Returns:
+            None
+        '''
+        index = min(bisect.bisect_left(self.bounds, latency), len(self.bounds) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += latency
+        self.maximum = max(self.maximum, latency)
+
+    def percentile(self, percent: float):
+        '''Returns the upper bound of the bucket that contains the percentile
+
+        Parameters:
+            percent (float): percentile between 0 and 100
+
+        Returns:
+            latency (float): latency in seconds, or None if nothing was recorded
+        '''
+        if self.count == 0:
+            return None
+        rank = percent / 100 * self.count
+        seen = 0
+        # the last bucket has no upper bound, the maximum is used instead
+        for bound, count in zip(self.bounds[:-1], self.counts):
+            seen += count
+            if seen >= rank and count > 0:
+                return min(bound, self.maximum)
+        return self.maximum
+
+
+class PubackTracker:
+    '''Measures the time from publishing a qos 1 message until the broker acknowledges it with a PUBACK.
+    The publish time is stored under the message id and matched when paho calls on_publish for the same id.
+    Slowly rising percentiles or a growing number of messages in flight are a sign of throttling by the broker.
+    '''
+
+    def __init__(self, report_interval: float = 60, clock=time.monotonic, early_age: float = 10):
+        '''
+        Parameters:
+            report_interval (float): seconds between two reports
+            clock (callable): monotonic clock, can be replaced in tests
+            early_age (float): seconds an acknowledgement waits for its message to be recorded as sent
+        '''
+        self.report_interval = report_interval
+        self.early_age = early_age
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.histogram = LatencyHistogram()
+        self.pending = {}
+        self.early = {}
+        self.lost = 0
+        self.last_report = clock()
+
+    def sent(self, mid: int, started: float = None):
+        '''Records that a message was handed to the client
+
+        Parameters:
+            mid (int): message id returned by publish
+            started (float): time of the clock before publish was called, now if None
+
+        Returns:
+            None
+        '''
+        now = self.clock()
+        started = now if started is None else started
+        with self.lock:
+            self.prune(now)
+            # the PUBACK can arrive on the network thread before publish has returned the message id, an 
+            # acknowledgement from before the publish belongs to an earlier message with the same id
+            acked = self.early.pop(mid, None)
+            if acked is not None and acked >= started:
+                self.histogram.add(max(0.0, acked - started))
+                return
+            if mid in self.pending:
+                # the message id was reused, the old message was never acknowledged
+                self.lost += 1
+            self.pending[mid] = started
+
+    def acked(self, mid: int):
+        '''Records the PUBACK of a message, called from on_publish
+
+        Parameters:
+            mid (int): message id
+
+        Returns:
+            None
+        '''
+        now = self.clock()
+        with self.lock:
+            started = self.pending.pop(mid, None)
+            if started is None:
+                self.prune(now)
+                # moved to the end, so the acknowledgements stay ordered by time
+                self.early.pop(mid, None)
+                self.early[mid] = now
+            else:
+                self.histogram.add(now - started)
+
+    def prune(self, now: float):
+        '''Forgets the acknowledgements that were never matched, e.g. of qos 0 messages, the lock has to be held'''
+        for mid, acked in list(self.early.items()):
+            if acked > now - self.early_age:
+                break
+            del self.early[mid]
+
+    @property
+    def in_flight(self):
+        '''Number of messages that were published but not acknowledged yet'''
+        with self.lock:
+            return len(self.pending)
+
+    def stats(self):
+        '''Returns the current statistics
+
+        Returns:
+            stats (dict): count, in flight, lost messages and the p50, p95 and p99 latency in seconds
+        '''
+        with self.lock:
+            return {
+                'count': self.histogram.count,
+                'in_flight': len(self.pending),
+                'lost': self.lost,
+                'p50': self.histogram.percentile(50),
+                'p95': self.histogram.percentile(95),
+                'p99': self.histogram.percentile(99),
+                'max': self.histogram.maximum,
+            }
+
+    def due(self):
+        '''Checks if the next report is due
+
+        Returns:
+            due (bool): True if the report interval has passed since the last report
+        '''
+        return self.clock() - self.last_report >= self.report_interval
+
+    def report(self):
+        '''Formats the statistics as one line and starts the next report interval
+
+        Returns:
+            report (str): the statistics
+        '''
+        self.last_report = self.clock()
+        stats = self.stats()
+        if stats['count'] == 0:
+            return 'PUBACK latency: no acknowledged messages, {0} in flight'.format(stats['in_flight'])
+        return 'PUBACK latency: p50 {0:.0f} ms, p95 {1:.0f} ms, p99 {2:.0f} ms, max {3:.0f} ms, {4} acknowledged, ' \
+               '{5} in flight, {6} lost'.format(stats['p50'] * 1000, stats['p95'] * 1000, stats['p99'] * 1000,
+                                                stats['max'] * 1000, stats['count'], stats['in_flight'], stats['lost'])
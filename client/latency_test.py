@@ -0,0 +1,85 @@
+import unittest
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from latency import LatencyHistogram, PubackTracker
+    from testing_utils import FakeClock
+except ModuleNotFoundError:
+    from client.latency import LatencyHistogram, PubackTracker
+    from client.testing_utils import FakeClock
+
+
+class LatencyHistogramTest(unittest.TestCase):
+    def test_empty(self):
+        self.assertIsNone(LatencyHistogram().percentile(50))
+
+    def test_percentiles(self):
+        histogram = LatencyHistogram()
+        for _ in range(90):
+            histogram.add(0.010)
+        for _ in range(10):
+            histogram.add(0.500)
+        # a percentile is accurate to the width of its bucket
+        self.assertAlmostEqual(histogram.percentile(50), 0.010, delta=0.002)
+        self.assertAlmostEqual(histogram.percentile(95), 0.500, delta=0.1)
+        self.assertEqual(histogram.percentile(100), 0.500)
+
+    def test_large_values_go_to_last_bucket(self):
+        histogram = LatencyHistogram()
+        histogram.add(3600)
+        self.assertEqual(histogram.counts[-1], 1)
+        self.assertEqual(histogram.percentile(99), 3600)
+
+
+class PubackTrackerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.tracker = PubackTracker(report_interval=60, clock=self.clock)
+
+    def test_latency_is_matched_by_mid(self):
+        self.tracker.sent(1)
+        self.tracker.sent(2)
+        self.assertEqual(self.tracker.in_flight, 2)
+        self.clock.now = 0.2
+        self.tracker.acked(2)
+        self.assertEqual(self.tracker.in_flight, 1)
+        self.assertEqual(self.tracker.stats()['max'], 0.2)
+
+    def test_puback_before_sent(self):
+        self.tracker.acked(5)
+        self.tracker.sent(5, started=-0.05)
+        stats = self.tracker.stats()
+        self.assertEqual(stats['count'], 1)
+        self.assertEqual(stats['in_flight'], 0)
+        self.assertAlmostEqual(stats['max'], 0.05)
+
+    def test_unmatched_acknowledgements_are_forgotten(self):
+        # acknowledgements of qos 0 messages are never matched
+        for mid in range(1000):
+            self.clock.now = mid
+            self.tracker.acked(mid)
+        self.assertLessEqual(len(self.tracker.early), 10)
+        # a stale acknowledgement doesn't count for a new message with the same id
+        self.tracker.sent(999, started=1000)
+        self.assertEqual(self.tracker.stats()['count'], 0)
+        self.assertEqual(self.tracker.in_flight, 1)
+
+    def test_reused_mid_counts_as_lost(self):
+        self.tracker.sent(7)
+        self.tracker.sent(7)
+        self.assertEqual(self.tracker.stats()['lost'], 1)
+        self.assertEqual(self.tracker.in_flight, 1)
+
+    def test_report(self):
+        self.assertFalse(self.tracker.due())
+        self.tracker.sent(1)
+        self.clock.now = 0.03
+        self.tracker.acked(1)
+        self.clock.now = 60
+        self.assertTrue(self.tracker.due())
+        self.assertIn('p50 30 ms', self.tracker.report())
+        self.assertFalse(self.tracker.due())
+
+
+if __name__ == "__main__":
+    unittest.main()
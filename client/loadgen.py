@@ -0,0 +1,182 @@
+import argparse
+import threading
+import time
+import paho.mqtt.client as mqtt
+
+#the try is needed to have both the scripts and tests working
+try:
+    from simulator import EnvironmentModel
+    from payload_codec import get_codec, sensor_topic
+except ModuleNotFoundError:
+    from client.simulator import EnvironmentModel
+    from client.payload_codec import get_codec, sensor_topic
+
+
+class TimerWheel:
+    '''Calls a large number of periodic callbacks with a single thread. The period is divided into slots of one tick
+    each, every callback is placed in one slot and called whenever the wheel passes that slot. The ticks are
+    scheduled on the monotonic clock from the start of the wheel, so the period does not drift.
+    '''
+
+    def __init__(self, period: float, tick: float = 0.01, clock=time.monotonic, sleep=time.sleep):
+        '''
+        Parameters:
+            period (float): seconds between two calls of the same callback
+            tick (float): seconds per slot
+            clock (callable): monotonic clock, can be replaced in tests
+            sleep (callable): sleep function, can be replaced in tests
+        '''
+        self.tick = tick
+        self.slots = [[] for _ in range(max(1, round(period / tick)))]
+        self.clock = clock
+        self.sleep = sleep
+        self.count = 0
+
+    def add(self, callback):
+        '''Adds a callback to the wheel, the callbacks are spread evenly over the slots
+
+        Parameters:
+            callback (callable): function without parameters
+
+        Returns:
+            None
+        '''
+        self.slots[self.count % len(self.slots)].append(callback)
+        self.count += 1
+
+    def run(self, duration: float, stop: threading.Event = None):
+        '''Turns the wheel until the duration has passed or stop is set
+
+        Parameters:
+            duration (float): seconds to run
+            stop (Event): event to stop the wheel early
+
+        Returns:
+            ticks (int): number of ticks that were run
+        '''
+        started = self.clock()
+        ticks = 0
+        while ticks * self.tick < duration and not (stop is not None and stop.is_set()):
+            for callback in self.slots[ticks % len(self.slots)]:
+                callback()
+            ticks += 1
+            self.sleep(max(0, started + ticks * self.tick - self.clock()))
+        return ticks
+
+
+class LoadStats:
+    '''Counts published and acknowledged messages of all connections'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.published = 0
+        self.acknowledged = 0
+        self.failed = 0
+
+    def on_publish(self, client: object, userdata: any, mid: int):
+        '''Callback function on the acknowledgement of a published message of any connection
+
+        Parameters:
+            client (Client): mqtt client object
+            userdata (Any): userdata
+            mid (int): message id
+
+        Returns:
+            None
+        '''
+        with self.lock:
+            self.acknowledged += 1
+
+    def sent(self, rc: int):
+        '''Counts a publish call of any connection
+
+        Parameters:
+            rc (int): return code of the publish call
+
+        Returns:
+            None
+        '''
+        with self.lock:
+            if rc == mqtt.MQTT_ERR_SUCCESS:
+                self.published += 1
+            else:
+                self.failed += 1
+
+
+def virtual_device(client: object, stats: LoadStats, device_id: str, codec: object, qos: int):
+    '''Creates the callback of one virtual device that publishes a sample of its own environment model
+
+    Parameters:
+        client (Client): mqtt client the device publishes with
+        stats (LoadStats): statistics of the load test
+        device_id (str): id of the virtual device
+        codec (object): codec of the payload
+        qos (int): quality of service of the messages
+
+    Returns:
+        callback (callable): function that publishes one sample
+    '''
+    model = EnvironmentModel(seed=device_id)
+    topic = sensor_topic(codec)
+
+    def publish():
+        timestamp = int(time.time())
+        sample = {'device_id': device_id, 'timestamp': timestamp, 'inputName': 'sensorData', 'pressure': 0.0}
+        sample.update(model.sample(timestamp))
+        stats.sent(client.publish(topic, payload=codec.encode(sample), qos=qos).rc)
+
+    return publish
+
+
+def main():
+    '''Runs thousands of virtual devices against a local broker and prints the message rates every second'''
+    parser = argparse.ArgumentParser(description='load generator publishing sensor data of virtual devices')
+    parser.add_argument('--host', default='localhost', help='host of the local mqtt broker')
+    parser.add_argument('--port', type=int, default=1883, help='port of the local mqtt broker')
+    parser.add_argument('--devices', type=int, default=1000, help='number of virtual devices')
+    parser.add_argument('--connections', type=int, default=1, help='number of mqtt connections shared by the devices')
+    parser.add_argument('--interval', type=float, default=5.0, help='seconds between two samples of a device')
+    parser.add_argument('--duration', type=float, default=60.0, help='seconds to run')
+    parser.add_argument('--qos', type=int, default=1, choices=(0, 1), help='quality of service of the messages')
+    parser.add_argument('--codec', default='json', help='codec of the payload, json, bin or cbor')
+    args = parser.parse_args()
+
+    stats = LoadStats()
+    codec = get_codec(args.codec)
+    clients = []
+    for i in range(args.connections):
+        client = mqtt.Client(f'loadgen-{i}')
+        client.on_publish = stats.on_publish
+        client.max_inflight_messages_set(1000)
+        client.connect(args.host, args.port)
+        client.loop_start()
+        clients.append(client)
+
+    wheel = TimerWheel(args.interval)
+    for i in range(args.devices):
+        wheel.add(virtual_device(clients[i % len(clients)], stats, f'sim{i:05d}', codec, args.qos))
+
+    stop = threading.Event()
+    thread = threading.Thread(target=wheel.run, args=(args.duration, stop), daemon=True)
+    thread.start()
+    print(f'{args.devices} devices, {args.devices / args.interval:.0f} messages per second expected')
+    last = (0, 0)
+    try:
+        while thread.is_alive():
+            time.sleep(1)
+            with stats.lock:
+                current = (stats.published, stats.acknowledged)
+                failed = stats.failed
+            print('published {0}/s, acknowledged {1}/s, in flight {2}, failed {3}'.format(
+                current[0] - last[0], current[1] - last[1], current[0] - current[1], failed))
+            last = current
+    except KeyboardInterrupt:
+        stop.set()
+    for client in clients:
+        client.disconnect()
+        client.loop_stop()
+
+
+if __name__ == '__main__':
+    '''Starts the load generator'''
+    main()
@@ -0,0 +1,43 @@
+import unittest
+from unittest.mock import MagicMock
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from loadgen import TimerWheel, LoadStats, virtual_device
+    from payload_codec import get_codec
+    from testing_utils import FakeClock
+except ModuleNotFoundError:
+    from client.loadgen import TimerWheel, LoadStats, virtual_device
+    from client.payload_codec import get_codec
+    from client.testing_utils import FakeClock
+
+
+class TimerWheelTest(unittest.TestCase):
+    def test_callbacks_are_spread_and_called_once_per_period(self):
+        clock = FakeClock()
+        wheel = TimerWheel(period=1.0, tick=0.25, clock=clock, sleep=clock.sleep)
+        calls = []
+        for i in range(8):
+            wheel.add(lambda i=i: calls.append((clock.now, i)))
+
+        ticks = wheel.run(duration=2.0)
+
+        self.assertEqual(ticks, 8)
+        self.assertEqual(len(calls), 16)
+        # two callbacks per slot, every callback once per period
+        self.assertEqual([i for now, i in calls if now == 0.25], [1, 5])
+        self.assertEqual(sorted(i for now, i in calls if now < 1.0), list(range(8)))
+
+    def test_virtual_device_publishes_sample(self):
+        client = MagicMock()
+        client.publish.return_value.rc = 0
+        stats = LoadStats()
+        publish = virtual_device(client, stats, 'sim00001', get_codec('json'), qos=1)
+        publish()
+
+        self.assertEqual(client.publish.call_args.args[0], 'iot/sensor_data')
+        self.assertEqual(stats.published, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,242 @@
+import asyncio
+import itertools
+import socket
+import struct
+import threading
+import zlib
+import paho.mqtt.client as mqtt
+
+#the try is needed to have both the scripts and tests working
+try:
+    from batching import SampleBatcher, decode_batch
+    from payload_codec import SENSOR_TOPIC, decode_message
+except ModuleNotFoundError:
+    from client.batching import SampleBatcher, decode_batch
+    from client.payload_codec import SENSOR_TOPIC, decode_message
+
+
+# a frame on the local link: length of the topic, length of the payload, the topic and the payload
+frame_header = struct.Struct('>HI')
+
+
+def encode_frame(topic: str, payload: bytes):
+    '''Encodes a message for the local link
+
+    Parameters:
+        topic (str): topic the message is published on
+        payload (bytes): payload of the message
+
+    Returns:
+        frame (bytes): the encoded message
+    '''
+    topic = topic.encode()
+    return frame_header.pack(len(topic), len(payload)) + topic + payload
+
+
+async def read_frame(reader: asyncio.StreamReader):
+    '''Reads the next message from the local link
+
+    Parameters:
+        reader (StreamReader): stream of a local publisher
+
+    Returns:
+        message (tuple): topic and payload of the message, or None if the publisher closed the connection
+    '''
+    try:
+        topic_length, payload_length = frame_header.unpack(await reader.readexactly(frame_header.size))
+        topic = await reader.readexactly(topic_length)
+        payload = await reader.readexactly(payload_length)
+    except asyncio.IncompleteReadError:
+        return None
+    return topic.decode(), payload
+
+
+def parse_address(address: str):
+    '''Parses the address of the local link, 'host:port' is a tcp address, anything else the path of a unix socket.
+    Windows has no unix sockets for asyncio, so there the link needs a tcp address like 'localhost:1884'
+
+    Parameters:
+        address (str): the address
+
+    Returns:
+        address (str | tuple): the path of the unix socket or host and port
+    '''
+    host, _, port = address.rpartition(':')
+    if host and port.isdigit():
+        return host, int(port)
+    return address
+
+
+class LinkMessageInfo:
+    '''Result of a publish on the local link, like the MQTTMessageInfo of paho'''
+
+    def __init__(self, mid: int, rc: int):
+        self.mid = mid
+        self.rc = rc
+
+
+class LinkClient:
+    '''Sends the messages of a publisher to a fan-in gateway on the same machine instead of the broker. It has the
+    methods of the paho client the publisher uses, so the publisher works the same with both. A message counts as
+    acknowledged as soon as it was written to the link, the gateway is responsible for the rest.
+    '''
+
+    def __init__(self, address: str):
+        '''
+        Parameters:
+            address (str): path of the unix socket of the gateway or 'host:port'
+        '''
+        self.address = parse_address(address)
+        self.sock = None
+        self.lock = threading.Lock()
+        self.mids = itertools.count(1)
+        self.on_connect = None
+        self.on_publish = None
+
+    def connect(self):
+        '''Connects to the gateway
+
+        Returns:
+            connected (bool): True if the connection was opened
+        '''
+        family = socket.AF_INET if isinstance(self.address, tuple) else socket.AF_UNIX
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        try:
+            sock.connect(self.address)
+        except OSError as e:
+            sock.close()
+            print('Connection to the gateway failed:', e)
+            return False
+        self.sock = sock
+        if self.on_connect is not None:
+            self.on_connect(self, None, {}, 0)
+        return True
+
+    def is_connected(self):
+        '''Checks the connection to the gateway and tries to connect if there is none'''
+        return self.sock is not None or self.connect()
+
+    def publish(self, topic: str, payload: bytes = None, qos: int = 0):
+        '''Sends a message to the gateway
+
+        Parameters:
+            topic (str): topic the message is published on
+            payload (bytes): payload of the message
+            qos (int): ignored, the link is reliable as long as it is connected
+
+        Returns:
+            info (LinkMessageInfo): message id and result of the message
+        '''
+        mid = next(self.mids) % 65536
+        with self.lock:
+            if self.sock is None:
+                # unlike paho the link doesn't keep the message, no_conn would tell the publisher it is queued
+                return LinkMessageInfo(mid, mqtt.MQTT_ERR_CONN_LOST)
+            try:
+                self.sock.sendall(encode_frame(topic, payload or b''))
+            except OSError:
+                self.sock.close()
+                self.sock = None
+                return LinkMessageInfo(mid, mqtt.MQTT_ERR_CONN_LOST)
+        if self.on_publish is not None:
+            self.on_publish(self, None, mid)
+        return LinkMessageInfo(mid, mqtt.MQTT_ERR_SUCCESS)
+
+    def max_inflight_messages_set(self, inflight: int):
+        pass
+
+    def disconnect(self):
+        '''Closes the connection to the gateway'''
+        with self.lock:
+            if self.sock is not None:
+                self.sock.close()
+                self.sock = None
+
+
+class FanIn:
+    '''Receives the sensor data of many local publishers and merges it into batches that are sent over the single
+    connection of the gateway. Sensor messages are decoded, so the samples of different publishers and codecs end
+    up in the same batch, other messages are forwarded as they are. It runs in the event loop of the gateway, so
+    `send` must not block.
+    '''
+
+    def __init__(self, send, batcher: SampleBatcher):
+        '''
+        Parameters:
+            send (callable): function that publishes a topic and payload over the uplink
+            batcher (SampleBatcher): collects the samples of all publishers
+        '''
+        self.send = send
+        self.batcher = batcher
+        self.publishers = 0
+        self.received = 0
+        self.forwarded = 0
+
+    def handle(self, topic: str, payload: bytes):
+        '''Adds the samples of a message to the batch and sends the batch if it is due, replayed and other messages
+        are forwarded as they are
+
+        Parameters:
+            topic (str): topic the message was published on
+            payload (bytes): payload of the message
+
+        Returns:
+            None
+        '''
+        levels = topic.split('/')
+        # replayed samples are old, they stay on their replay topic instead of joining the live batch
+        if not topic.startswith(SENSOR_TOPIC) or 'replay' in levels:
+            self.forwarded += 1
+            self.send(topic, payload)
+            return
+        samples = decode_batch(payload, topic) if 'batch' in levels else [decode_message(topic, payload)]
+        self.received += len(samples)
+        for sample in samples:
+            try:
+                batch = self.batcher.add(sample)
+            except ValueError as e:
+                print('Dropped a sample on {0}: {1}'.format(topic, e))
+                continue
+            if batch is not None:
+                self.send(self.batcher.topic, batch)
+
+    def flush_due(self):
+        '''Sends the batch if its flush interval has passed'''
+        if self.batcher.due():
+            self.send(self.batcher.topic, self.batcher.flush())
+
+    def flush(self):
+        '''Sends the samples that are left, e.g. before the gateway stops'''
+        if self.batcher.samples:
+            self.send(self.batcher.topic, self.batcher.flush())
+
+    async def serve_publisher(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        '''Reads the messages of one local publisher until it disconnects'''
+        self.publishers += 1
+        try:
+            while True:
+                message = await read_frame(reader)
+                if message is None:
+                    break
+                try:
+                    self.handle(*message)
+                except (ValueError, struct.error, zlib.error) as e:
+                    # only the bad frame is lost, the publisher stays connected
+                    print('Dropped a message on {0}: {1}'.format(message[0], e))
+        finally:
+            self.publishers -= 1
+            writer.close()
+
+    async def start(self, address: str):
+        '''Starts listening for local publishers
+
+        Parameters:
+            address (str): path of the unix socket or 'host:port'
+
+        Returns:
+            server (Server): the asyncio server
+        '''
+        address = parse_address(address)
+        if isinstance(address, tuple):
+            return await asyncio.start_server(self.serve_publisher, *address)
+        return await asyncio.start_unix_server(self.serve_publisher, address)
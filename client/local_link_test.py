@@ -0,0 +1,144 @@
+import asyncio
+import os
+import socket
+import tempfile
+import unittest
+from unittest.mock import patch
+import paho.mqtt.client as mqtt
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from local_link import encode_frame, read_frame, parse_address, LinkClient, FanIn
+    from batching import SampleBatcher, decode_batch
+    from payload_codec import get_codec
+    from testing_utils import make_sample
+except ModuleNotFoundError:
+    from client.local_link import encode_frame, read_frame, parse_address, LinkClient, FanIn
+    from client.batching import SampleBatcher, decode_batch
+    from client.payload_codec import get_codec
+    from client.testing_utils import make_sample
+
+
+class FrameTest(unittest.TestCase):
+    def test_round_trip(self):
+        async def read():
+            reader = asyncio.StreamReader()
+            reader.feed_data(encode_frame('iot/sensor_data', b'{}') + encode_frame('iot/error', b''))
+            reader.feed_eof()
+            return [await read_frame(reader) for _ in range(3)]
+
+        self.assertEqual(asyncio.run(read()), [('iot/sensor_data', b'{}'), ('iot/error', b''), None])
+
+    def test_parse_address(self):
+        self.assertEqual(parse_address('localhost:1884'), ('localhost', 1884))
+        self.assertEqual(parse_address('./client/gateway.sock'), './client/gateway.sock')
+
+
+class LinkClientTest(unittest.TestCase):
+    def test_publish(self):
+        link = LinkClient('localhost:1884')
+        link.sock, gateway = socket.socketpair()
+        acked = []
+        link.on_publish = lambda client, userdata, mid: acked.append(mid)
+        info = link.publish('iot/sensor_data', b'{}', qos=1)
+        self.assertEqual(info.rc, mqtt.MQTT_ERR_SUCCESS)
+        self.assertEqual(acked, [info.mid])
+        self.assertEqual(gateway.recv(100), encode_frame('iot/sensor_data', b'{}'))
+        gateway.close()
+        link.disconnect()
+
+    def test_publish_without_gateway(self):
+        link = LinkClient(os.path.join(tempfile.gettempdir(), 'no-gateway.sock'))
+        with patch('builtins.print'):
+            self.assertFalse(link.is_connected())
+        self.assertEqual(link.publish('iot/sensor_data', b'{}').rc, mqtt.MQTT_ERR_CONN_LOST)
+
+
+class FanInTest(unittest.TestCase):
+    def setUp(self):
+        self.sent = []
+        self.codec = get_codec('json')
+        self.fan_in = FanIn(lambda topic, payload: self.sent.append((topic, payload)),
+                            SampleBatcher(3, 60, False, self.codec))
+
+    def test_samples_of_several_publishers_share_a_batch(self):
+        self.fan_in.handle('iot/sensor_data', self.codec.encode(make_sample(1, '002')))
+        self.fan_in.handle('iot/sensor_data/bin', get_codec('bin').encode(make_sample(1, '003')))
+        self.assertEqual(self.sent, [])
+        self.fan_in.handle('iot/sensor_data', self.codec.encode(make_sample(1, '004')))
+        [(topic, payload)] = self.sent
+        self.assertEqual(topic, 'iot/sensor_data/batch')
+        self.assertEqual([sample['device_id'] for sample in decode_batch(payload, topic)], ['002', '003', '004'])
+        self.assertEqual(self.fan_in.received, 3)
+
+    def test_sample_that_can_not_be_encoded_is_dropped(self):
+        fan_in = FanIn(lambda topic, payload: self.sent.append((topic, payload)),
+                       SampleBatcher(2, 60, False, get_codec('bin')))
+        batch = self.codec.encode_many([dict(make_sample(1, '002'), open_windows=True), make_sample(1, '003'),
+                                        make_sample(1, '004')])
+        with patch('builtins.print'):
+            fan_in.handle('iot/sensor_data/batch', batch)
+        [(topic, payload)] = self.sent
+        self.assertEqual([sample['device_id'] for sample in decode_batch(payload, topic)], ['003', '004'])
+
+    def test_replayed_samples_stay_out_of_the_live_batch(self):
+        replayed = self.codec.encode(make_sample(1, '002'))
+        self.fan_in.handle('iot/sensor_data/replay', replayed)
+        self.fan_in.handle('iot/sensor_data', self.codec.encode(make_sample(2, '003')))
+        self.fan_in.flush()
+        [replay, (topic, payload)] = self.sent
+        self.assertEqual(replay, ('iot/sensor_data/replay', replayed))
+        self.assertEqual(topic, 'iot/sensor_data/batch')
+        self.assertEqual([sample['device_id'] for sample in decode_batch(payload, topic)], ['003'])
+
+    def test_other_messages_are_forwarded(self):
+        self.fan_in.handle('iot/error', b'{}')
+        self.assertEqual(self.sent, [('iot/error', b'{}')])
+        self.assertEqual(self.fan_in.forwarded, 1)
+
+    def test_flush(self):
+        self.fan_in.flush()
+        self.assertEqual(self.sent, [])
+        self.fan_in.handle('iot/sensor_data', self.codec.encode(make_sample(1, '002')))
+        self.fan_in.flush()
+        self.assertEqual(len(self.sent), 1)
+
+    def test_serve_publishers(self):
+        async def run(path):
+            server = await self.fan_in.start(path)
+            link = LinkClient(path)
+            await asyncio.get_running_loop().run_in_executor(None, link.connect)
+            for device_id in ('002', '003', '004'):
+                link.publish('iot/sensor_data', self.codec.encode(make_sample(1, device_id)))
+            while not self.sent:
+                await asyncio.sleep(0.01)
+            link.disconnect()
+            server.close()
+            await server.wait_closed()
+
+        with tempfile.TemporaryDirectory() as directory:
+            asyncio.run(asyncio.wait_for(run(os.path.join(directory, 'gateway.sock')), 5))
+        self.assertEqual(len(decode_batch(self.sent[0][1], self.sent[0][0])), 3)
+
+    def test_bad_frames_keep_the_publisher_connected(self):
+        async def run(path):
+            server = await self.fan_in.start(path)
+            link = LinkClient(path)
+            await asyncio.get_running_loop().run_in_executor(None, link.connect)
+            link.publish('iot/sensor_data/bin', b'\x01002')
+            link.publish('iot/sensor_data/batch/zlib', b'not compressed')
+            for device_id in ('002', '003', '004'):
+                link.publish('iot/sensor_data', self.codec.encode(make_sample(1, device_id)))
+            while not self.sent:
+                await asyncio.sleep(0.01)
+            link.disconnect()
+            server.close()
+            await server.wait_closed()
+
+        with tempfile.TemporaryDirectory() as directory, patch('builtins.print'):
+            asyncio.run(asyncio.wait_for(run(os.path.join(directory, 'gateway.sock')), 5))
+        self.assertEqual(len(decode_batch(self.sent[0][1], self.sent[0][0])), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,294 @@
+import json
+import math
+import struct
+
+# cbor is optional, the codec is only available if the cbor2 package is installed
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
+
+SENSOR_TOPIC = 'iot/sensor_data'
+
+# keys that are the same for every sample of a device and are therefore only sent once per batch
+ENVELOPE_KEYS = ('device_id', 'inputName')
+
+def pack_envelope(samples: list):
+    '''Puts several samples into an envelope of the form
+    {"device_id": "002", "inputName": "sensorBatch", "samples": [{"timestamp": ..., "temperature": ...}, ...]}.
+    The device id is only moved to the envelope if all samples are of the same device
+
+    Parameters:
+        samples (list): samples in the format of the publisher data template
+
+    Returns:
+        envelope (dict): the envelope
+    '''
+    envelope = {key: samples[0][key] for key in ENVELOPE_KEYS
+                if key in samples[0] and all(sample.get(key) == samples[0][key] for sample in samples)}
+    envelope['inputName'] = 'sensorBatch'
+    envelope['samples'] = [{key: value for key, value in sample.items() if key not in ENVELOPE_KEYS or
+                            (key not in envelope and key != 'inputName')} for sample in samples]
+    return envelope
+
+def unpack_envelope(envelope: dict):
+    '''Takes the samples out of an envelope
+
+    Parameters:
+        envelope (dict): the envelope
+
+    Returns:
+        samples (list): samples in the format of the publisher data template
+    '''
+    common = {key: envelope[key] for key in ('device_id',) if key in envelope}
+    return [dict(common, inputName='sensorData', **sample) for sample in envelope['samples']]
+
+
+class JsonCodec:
+    '''Encodes samples as json, the default format that is understood by the iot rules and detector models'''
+    name = 'json'
+    suffix = ''
+
+    def encode(self, sample: dict):
+        '''Encodes a single sample
+
+        Parameters:
+            sample (dict): sample in the format of the publisher data template
+
+        Returns:
+            payload (bytes): the encoded sample
+        '''
+        return json.dumps(sample).encode()
+
+    def decode(self, payload: bytes):
+        '''Decodes a single sample
+
+        Parameters:
+            payload (bytes): the encoded sample
+
+        Returns:
+            sample (dict): the decoded sample
+        '''
+        return json.loads(payload)
+
+    def encode_many(self, samples: list):
+        '''Encodes several samples as an envelope
+
+        Parameters:
+            samples (list): samples in the format of the publisher data template
+
+        Returns:
+            payload (bytes): the encoded samples
+        '''
+        return json.dumps(pack_envelope(samples), separators=(',', ':')).encode()
+
+    def decode_many(self, payload: bytes):
+        '''Decodes an envelope of several samples
+
+        Parameters:
+            payload (bytes): the encoded samples
+
+        Returns:
+            samples (list): the decoded samples
+        '''
+        return unpack_envelope(json.loads(payload))
+
+
+class StructCodec:
+    '''Encodes samples in a fixed binary layout of 33 bytes: version, device id as 8 ascii characters, timestamp
+    in seconds and the sensor values as 32 bit floats. Missing values are sent as NaN. Several samples are simply
+    concatenated.
+    '''
+    name = 'bin'
+    suffix = '/bin'
+    version = 1
+    fields = ('pressure', 'temperature', 'humidity', 'light', 'proximity')
+    layout = struct.Struct('<B8sI5f')
+    # longer device ids would be cut off by the layout and mixed up with other devices
+    max_device_id = 8
+
+    def encode(self, sample: dict):
+        '''Encodes a single sample
+
+        Parameters:
+            sample (dict): sample in the format of the publisher data template
+
+        Returns:
+            payload (bytes): the encoded sample
+        '''
+        unknown = set(sample) - set(self.fields) - {'device_id', 'timestamp', 'inputName'}
+        if unknown:
+            raise ValueError(f'the binary layout has no fields for {sorted(unknown)}')
+        device_id = str(sample['device_id']).encode('ascii')
+        if len(device_id) > self.max_device_id:
+            raise ValueError(f'device id {sample["device_id"]} is longer than {self.max_device_id} characters')
+        values = [sample.get(field, math.nan) for field in self.fields]
+        return self.layout.pack(self.version, device_id, int(sample['timestamp']), *values)
+
+    def decode(self, payload: bytes):
+        '''Decodes a single sample
+
+        Parameters:
+            payload (bytes): the encoded sample
+
+        Returns:
+            sample (dict): the decoded sample
+        '''
+        version, device_id, timestamp, *values = self.layout.unpack(payload)
+        if version != self.version:
+            raise ValueError(f'unknown version {version} of the binary layout')
+        sample = {'device_id': device_id.rstrip(b'\0').decode('ascii'), 'timestamp': timestamp,
+                  'inputName': 'sensorData'}
+        for field, value in zip(self.fields, values):
+            if not math.isnan(value):
+                # round away the noise of the 32 bit float
+                sample[field] = round(value, 4)
+        return sample
+
+    def encode_many(self, samples: list):
+        '''Encodes several samples as concatenated frames
+
+        Parameters:
+            samples (list): samples in the format of the publisher data template
+
+        Returns:
+            payload (bytes): the encoded samples
+        '''
+        return b''.join(self.encode(sample) for sample in samples)
+
+    def decode_many(self, payload: bytes):
+        '''Decodes concatenated frames
+
+        Parameters:
+            payload (bytes): the encoded samples
+
+        Returns:
+            samples (list): the decoded samples
+        '''
+        size = self.layout.size
+        return [self.decode(payload[i:i + size]) for i in range(0, len(payload), size)]
+
+
+class CborCodec:
+    '''Encodes samples as cbor with the same structure as the json codec'''
+    name = 'cbor'
+    suffix = '/cbor'
+
+    def encode(self, sample: dict):
+        '''Encodes a single sample
+
+        Parameters:
+            sample (dict): sample in the format of the publisher data template
+
+        Returns:
+            payload (bytes): the encoded sample
+        '''
+        return cbor2.dumps(sample)
+
+    def decode(self, payload: bytes):
+        '''Decodes a single sample
+
+        Parameters:
+            payload (bytes): the encoded sample
+
+        Returns:
+            sample (dict): the decoded sample
+        '''
+        return cbor2.loads(payload)
+
+    def encode_many(self, samples: list):
+        '''Encodes several samples as an envelope
+
+        Parameters:
+            samples (list): samples in the format of the publisher data template
+
+        Returns:
+            payload (bytes): the encoded samples
+        '''
+        return cbor2.dumps(pack_envelope(samples))
+
+    def decode_many(self, payload: bytes):
+        '''Decodes an envelope of several samples
+
+        Parameters:
+            payload (bytes): the encoded samples
+
+        Returns:
+            samples (list): the decoded samples
+        '''
+        return unpack_envelope(cbor2.loads(payload))
+
+
+codecs = {codec.name: codec for codec in (JsonCodec(), StructCodec())}
+if cbor2 is not None:
+    codecs['cbor'] = CborCodec()
+
+def get_codec(name: str):
+    '''Returns the codec with the given name
+
+    Parameters:
+        name (str): name of the codec, 'json', 'bin' or 'cbor'
+
+    Returns:
+        codec (object): the codec
+    '''
+    if name not in codecs:
+        raise ValueError(f'unknown codec {name}, available codecs are {sorted(codecs)}')
+    return codecs[name]
+
+def codec_for_topic(topic: str):
+    '''Returns the codec a message was encoded with, based on the levels of the topic it was published on.
+    Topics without a codec level like iot/actor_data use json.
+
+    Parameters:
+        topic (str): topic of the message
+
+    Returns:
+        codec (object): the codec
+    '''
+    for level in reversed(topic.split('/')):
+        if level in codecs and level != 'json':
+            return codecs[level]
+    return codecs['json']
+
+def sensor_topic(codec: object, batch: bool = False, compressed: bool = False):
+    '''Returns the topic sensor data encoded with a codec has to be published on, e.g. iot/sensor_data/batch/bin/zlib
+
+    Parameters:
+        codec (object): the codec the payload is encoded with
+        batch (bool): True if the payload contains several samples
+        compressed (bool): True if the payload is compressed with zlib
+
+    Returns:
+        topic (str): the topic
+    '''
+    return SENSOR_TOPIC + ('/batch' if batch else '') + codec.suffix + ('/zlib' if compressed else '')
+
+def replay_topic(topic: str):
+    '''Returns the topic a stored message is replayed on, e.g. iot/sensor_data/replay/batch for iot/sensor_data/batch.
+    Replayed sensor data is only stored with the time of its samples by the ingest lambda, it is too old for the 
+    detector models
+
+    Parameters:
+        topic (str): topic the message was first published on
+
+    Returns:
+        topic (str): the topic
+    '''
+    levels = topic.split('/')
+    if levels[:2] != SENSOR_TOPIC.split('/') or 'replay' in levels:
+        return topic
+    return SENSOR_TOPIC + '/replay' + topic[len(SENSOR_TOPIC):]
+
+def decode_message(topic: str, payload: bytes):
+    '''Decodes a single message with the codec of its topic
+
+    Parameters:
+        topic (str): topic of the message
+        payload (bytes): payload of the message
+
+    Returns:
+        message (dict): the decoded message
+    '''
+    return codec_for_topic(topic).decode(payload)
@@ -0,0 +1,78 @@
+import json
+import unittest
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from payload_codec import get_codec, codec_for_topic, decode_message, sensor_topic, replay_topic
+except ModuleNotFoundError:
+    from client.payload_codec import get_codec, codec_for_topic, decode_message, sensor_topic, replay_topic
+
+
+SAMPLE = {
+    "device_id": "002",
+    "timestamp": 1689500000,
+    "inputName": "sensorData",
+    "pressure": 0.0,
+    "temperature": 21.5,
+    "humidity": 40.25,
+    "light": 70.0,
+    "proximity": 3.0
+}
+
+
+class PayloadCodecTest(unittest.TestCase):
+    def test_json_round_trip(self):
+        codec = get_codec("json")
+        self.assertEqual(json.loads(codec.encode(SAMPLE)), SAMPLE)
+        self.assertEqual(codec.decode_many(codec.encode_many([SAMPLE, SAMPLE])), [SAMPLE, SAMPLE])
+
+    def test_envelope_of_several_devices(self):
+        codec = get_codec("json")
+        other = dict(SAMPLE, device_id="003")
+        envelope = json.loads(codec.encode_many([SAMPLE, other]))
+        self.assertNotIn("device_id", envelope)
+        self.assertEqual([sample["device_id"] for sample in envelope["samples"]], ["002", "003"])
+        self.assertEqual(codec.decode_many(codec.encode_many([SAMPLE, other])), [SAMPLE, other])
+
+    def test_binary_round_trip(self):
+        codec = get_codec("bin")
+        payload = codec.encode(SAMPLE)
+        self.assertEqual(len(payload), 33)
+        self.assertLess(len(payload), len(get_codec("json").encode(SAMPLE)))
+        self.assertEqual(codec.decode(payload), SAMPLE)
+
+    def test_binary_missing_values(self):
+        codec = get_codec("bin")
+        sample = dict(SAMPLE)
+        del sample["proximity"]
+        self.assertEqual(codec.decode(codec.encode(sample)), sample)
+
+    def test_binary_unknown_field(self):
+        with self.assertRaises(ValueError):
+            get_codec("bin").encode(dict(SAMPLE, open_windows=True))
+
+    def test_binary_device_id_too_long(self):
+        with self.assertRaises(ValueError):
+            get_codec("bin").encode(dict(SAMPLE, device_id="greenhouse"))
+
+    def test_unknown_codec(self):
+        with self.assertRaises(ValueError):
+            get_codec("xml")
+
+    def test_topics(self):
+        self.assertEqual(sensor_topic(get_codec("json")), "iot/sensor_data")
+        self.assertEqual(sensor_topic(get_codec("bin"), batch=True, compressed=True), "iot/sensor_data/batch/bin/zlib")
+        self.assertEqual(codec_for_topic("iot/sensor_data/batch/bin/zlib").name, "bin")
+        self.assertEqual(codec_for_topic("iot/actor_data").name, "json")
+        self.assertEqual(decode_message("iot/actor_data", b'{"state": "lights_on"}'), {"state": "lights_on"})
+
+    def test_replay_topic(self):
+        self.assertEqual(replay_topic("iot/sensor_data"), "iot/sensor_data/replay")
+        self.assertEqual(replay_topic("iot/sensor_data/batch/bin/zlib"), "iot/sensor_data/replay/batch/bin/zlib")
+        self.assertEqual(codec_for_topic(replay_topic("iot/sensor_data/bin")).name, "bin")
+        self.assertEqual(replay_topic("iot/sensor_data/replay/bin"), "iot/sensor_data/replay/bin")
+        self.assertEqual(replay_topic("iot/actor_data"), "iot/actor_data")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,37 +1,140 @@
-from time import sleep
-import json
+import queue
 import signal
 import sys
 import time
-from utils import connect_to_mqtt, start_iotee
-import ssl
+from functools import partial
+from utils import create_client, read_endpoint, start_iotee
+import threading
 import time
+import paho.mqtt.client as mqtt
 
 #the try is needed to have both the scripts and tests working
 try:
-    from utils import connect_to_mqtt, start_iotee
+    from utils import create_client, read_endpoint, start_iotee
+    from connection import ConnectionManager
+    from batching import SampleBatcher
+    from assembly import SampleAssembler
+    from spool import SampleSpool, replay
+    from payload_codec import get_codec, sensor_topic, replay_topic
+    from deadband import DeadbandFilter
+    from aggregation import WindowAggregator
+    from latency import PubackTracker
+    from flow import PublishWindow, accepted
+    from local_link import LinkClient
+    from sample import SampleBuffer
+    from scheduling import SensorScheduler, AdaptiveSampler
 except ModuleNotFoundError:
-    from client.utils import connect_to_mqtt, start_iotee
+    from client.utils import create_client, read_endpoint, start_iotee
+    from client.connection import ConnectionManager
+    from client.batching import SampleBatcher
+    from client.assembly import SampleAssembler
+    from client.spool import SampleSpool, replay
+    from client.payload_codec import get_codec, sensor_topic, replay_topic
+    from client.deadband import DeadbandFilter
+    from client.aggregation import WindowAggregator
+    from client.latency import PubackTracker
+    from client.flow import PublishWindow, accepted
+    from client.local_link import LinkClient
+    from client.sample import SampleBuffer
+    from client.scheduling import SensorScheduler, AdaptiveSampler
 
 #define your device as you wish, you may enable `BUTTON_MODE` to debug your code
 BUTTON_MODE = True
 COM_PORT = "COM7"
 DEVICE_ID = "002"
 
-def signal_handler(signal: int, frame: object, iotee: object):
-    '''Handler function that stops the iotee thread on ctrl+c
+# all devices connected to this gateway as device id and com port, they share one connection to the broker
+DEVICES = {DEVICE_ID: COM_PORT}
+
+# a sample is requested every `SAMPLE_INTERVAL` seconds and published as soon as all values have arrived, values 
+# that take longer than `SAMPLE_TIMEOUT` seconds are left out of the sample
+SENSOR_FIELDS = ('temperature', 'humidity', 'light', 'proximity')
+SAMPLE_INTERVAL = 5
+SAMPLE_TIMEOUT = 1
+
+# seconds between two requests of a single sensor, sensors that are not listed use `SAMPLE_INTERVAL`, 
+# e.g. {'light': 1, 'temperature': 30}. The requests are aligned to multiples of the interval, sensors that are due 
+# at the same time are sent in one sample
+SAMPLE_INTERVALS = {}
+
+# sensors whose interval adapts to how fast their value changes, as minimum interval, maximum interval and the 
+# change per second above which the value changes fast, e.g. {'light': (1, 60, 0.5)}. A fast change switches to the 
+# minimum interval, every sample without one doubles the interval up to the maximum. Overrides `SAMPLE_INTERVALS`
+ADAPTIVE_INTERVALS = {}
+
+# a sample is only published if a field changed by more than its band since the last published sample, 
+# e.g. {'temperature': 0.2, 'humidity': 1.0, 'light': 2.0}, or if nothing was published for `HEARTBEAT_INTERVAL` 
+# seconds. An empty dictionary publishes every sample
+DEADBANDS = {}
+HEARTBEAT_INTERVAL = 300
+
+# instead of every sample, a summary with min, max, mean, last value and count of each field is published at the end 
+# of every window of `AGGREGATE_WINDOW` seconds, 0 disables the aggregation. Samples with a field outside of its 
+# range in `ANOMALY_BANDS`, e.g. {'temperature': (5.0, 35.0)}, are additionally published as they are. 
+# Summaries need the json or cbor codec
+AGGREGATE_WINDOW = 0
+ANOMALY_BANDS = {}
+
+# collects `BATCH_SIZE` samples or the samples of `BATCH_INTERVAL` seconds into one message, 0 sends every sample 
+# on its own. `BATCH_COMPRESS` additionally compresses the batches with zlib
+BATCH_SIZE = 0
+BATCH_INTERVAL = 60
+BATCH_COMPRESS = False
+
+# format of the sensor data: 'json' is understood by all rules, 'bin' is a fixed binary layout of 33 bytes per sample 
+# and 'cbor' needs the cbor2 package. Other formats than json are published on their own topic, e.g. iot/sensor_data/bin, 
+# and decoded by the ingest lambda
+PAYLOAD_CODEC = 'json'
+
+# messages that can't be sent are stored in the file `SPOOL_PATH` and replayed with at most `SPOOL_REPLAY_RATE` 
+# messages per second after reconnecting. Messages older than `SPOOL_MAX_AGE` seconds are dropped, the default stays 
+# below the memory store retention of the timestream table which rejects older records. The file takes `SPOOL_SIZE` 
+# bytes, when it is full the oldest messages are overwritten. None disables the spool
+SPOOL_PATH = './client/spool.bin'
+SPOOL_SIZE = 16 * 1024 * 1024
+SPOOL_REPLAY_RATE = 10
+SPOOL_MAX_AGE = 23 * 3600
+
+# the time until the broker acknowledges a message is measured and its percentiles are printed every 
+# `LATENCY_REPORT_INTERVAL` seconds, None disables the report
+LATENCY_REPORT_INTERVAL = 60
+
+# at most `MAX_IN_FLIGHT` messages are sent without being acknowledged by the broker. If more are sent, 
+# `IN_FLIGHT_POLICY` decides: 'block' waits up to `IN_FLIGHT_TIMEOUT` seconds for an acknowledgement, 'drop' refuses 
+# the message and 'downgrade' sends it with qos 0. Refused messages are stored in the spool
+MAX_IN_FLIGHT = 20
+IN_FLIGHT_POLICY = 'block'
+IN_FLIGHT_TIMEOUT = 5
+
+# instead of connecting to the broker, the samples can be sent to a fan-in gateway on the same machine that 
+# batches the samples of many publishers over one connection, e.g. './client/gateway.sock' or 'localhost:1884'. 
+# It has to be the `LINK_ADDRESS` of the gateway, None connects to the broker directly
+UPLINK = None
+
+# on ctrl+c the publisher sends the samples it still holds and waits up to `DRAIN_TIMEOUT` seconds for the 
+# acknowledgements of the messages in flight, the ones that are still missing are stored in the spool
+DRAIN_TIMEOUT = 10
+
+# set on ctrl+c, the main loop stops sampling and shuts down
+stopping = threading.Event()
+
+def signal_handler(signal: int, frame: object):
+    '''Handler function that stops the main loop on ctrl+c, which then drains the messages and stops the iotee 
+    threads. A second ctrl+c exits right away
     
     Parameters:
         signal (int): signal number
         frame (frame): current stack frame
-        iothee (Iotee): iotee object
         
     Returns:
         None
     '''
+    if stopping.is_set():
+        sys.exit(1)
     print('Shutting down')
-    iotee.stop()
-    sys.exit(0)
+    stopping.set()
+    # wakes up the main loop if it waits for a button press
+    events.put(None)
 
 # callback functions for mqtt
 def on_connect(client: object, userdata: any, flags: dict, response_code: int):
@@ -48,12 +151,13 @@ def on_connect(client: object, userdata: any, flags: dict, response_code: int):
     '''
     if response_code == 0:
         print('Connected with status: {0}'.format(response_code))
+        start_replay(client)
     else:
         print('Connection failed with status: {0}'.format(response_code))
 
 def on_publish(client: object, userdata: any, mid: int):
-    '''Callback function on publishing a message, 
-    prints the message id
+    '''Callback function on the acknowledgement of a published message, 
+    records the latency of the message
     
     Parameters:
         client (Client): mqtt client object
@@ -63,122 +167,487 @@ def on_publish(client: object, userdata: any, mid: int):
     Returns:
         None
     '''
-    print('message number:', mid)
+    latency.acked(mid)
+    if window is not None:
+        window.acked(mid)
 
 
-# message template
-data = {
-    "device_id" : DEVICE_ID,
-    "timestamp": 0.0,
-    "inputName": "sensorData",
-    "pressure": 0.0,
-    "temperature": 0.0,
-    "humidity": 0.0,
-    "light": 0.0,
-    "proximity": 0.0
-}
+codec = get_codec(PAYLOAD_CODEC)
+latency = PubackTracker(LATENCY_REPORT_INTERVAL or 60)
+window = None
+
+def new_data(device_id: str):
+    '''Creates the message template of a device
+    
+    Parameters:
+        device_id (str): id of the device
+        
+    Returns:
+        data (dict): message template with the latest values of the device
+    '''
+    return {
+        "device_id" : device_id,
+        "timestamp": 0.0,
+        "inputName": "sensorData",
+        "pressure": 0.0,
+        "temperature": 0.0,
+        "humidity": 0.0,
+        "light": 0.0,
+        "proximity": 0.0
+    }
+
+
+class SensorDevice:
+    '''State of one iotee device: its latest values, the sample of the current request cycle and the deadband filter 
+    and batch of the device'''
+
+    def __init__(self, device_id: str, com_port: str):
+        '''
+        Parameters:
+            device_id (str): id of the device that is sent with every sample
+            com_port (str): com port the iotee device is connected to
+        '''
+        self.device_id = device_id
+        self.com_port = com_port
+        self.iotee = None
+        # written by the iotee thread and read by the thread that publishes
+        self.data = SampleBuffer(new_data(device_id))
+        self.assembler = SampleAssembler()
+        self.deadband = DeadbandFilter(DEADBANDS, HEARTBEAT_INTERVAL) if DEADBANDS else None
+        self.batcher = SampleBatcher(BATCH_SIZE, BATCH_INTERVAL, BATCH_COMPRESS, codec) if BATCH_SIZE > 0 else None
+        self.aggregator = WindowAggregator(AGGREGATE_WINDOW, SENSOR_FIELDS, ANOMALY_BANDS) if AGGREGATE_WINDOW > 0 else None
 
 
 # callback functions for iotee
-def on_temperature(value):
+def on_temperature(device: SensorDevice, value):
     '''Callback function on receiving a temperature value, 
-    reads the value and stores it in a global dictionary called data
+    reads the value and stores it in the latest values of the device and in the sample of the current cycle
     
     Parameters:
+        device (SensorDevice): the device the value was received from
         value (float): temperature value
         
     Returns:
         None
     '''
-    data['temperature'] = value
-    print('temperature: {:.2f}'.format(value))
+    device.data['temperature'] = value
+    device.assembler.put('temperature', value)
+    print('{0} temperature: {1:.2f}'.format(device.device_id, value))
 
-def on_humidity(value):
+def on_humidity(device: SensorDevice, value):
     '''Callback function on receiving a humidity value, 
-    reads the value and stores it in a global dictionary called data
+    reads the value and stores it in the latest values of the device and in the sample of the current cycle
     
     Parameters:
+        device (SensorDevice): the device the value was received from
         value (float): humidity value
         
     Returns:
         None
     '''
-    data['humidity'] = value
-    print('humidity: {:.2f}'.format(value))
+    device.data['humidity'] = value
+    device.assembler.put('humidity', value)
+    print('{0} humidity: {1:.2f}'.format(device.device_id, value))
 
-def on_light(value):
+def on_light(device: SensorDevice, value):
     '''Callback function on receiving a light value, 
-    reads the value and stores it in a global dictionary called data
+    reads the value and stores it in the latest values of the device and in the sample of the current cycle
     
     Parameters:
+        device (SensorDevice): the device the value was received from
         value (float): light value
         
     Returns:
         None
     '''
-    data['light'] = value
-    print('light: {:.2f}'.format(value))
+    device.data['light'] = value
+    device.assembler.put('light', value)
+    print('{0} light: {1:.2f}'.format(device.device_id, value))
 
-def on_proximity(value):
+def on_proximity(device: SensorDevice, value):
     '''Callback function on receiving a proximity value, 
-    reads the value and stores it in a global dictionary called data
+    reads the value and stores it in the latest values of the device and in the sample of the current cycle
     
     Parameters:
+        device (SensorDevice): the device the value was received from
         value (float): proximity value
         
     Returns:
         None
     '''
-    data['proximity'] = value
-    print('proximity: {:.2f}'.format(value))
+    device.data['proximity'] = value
+    device.assembler.put('proximity', value)
+    print('{0} proximity: {1:.2f}'.format(device.device_id, value))
 
-def on_button_pressed(button):
-    '''
+def on_button_pressed(device: SensorDevice, button):
+    '''Callback function on pressing a button, sets prepared values that trigger the detector models
     
     Parameters:
+        device (SensorDevice): the device the button was pressed on
         button (str): button on the iotee device that was pressed. Can be 'A', 'B', 'X', 'Y'
         
     Returns:
         None
     '''
-    global ran
+    # the press time is the timestamp of the sample, so the delay until the detector models react can be measured
+    timestamp = int(time.time())
     if button == 'A':
-        data['temperature'] = 30.0  # >25
+        device.data.update({'temperature': 30.0, 'timestamp': timestamp})  # >25
     elif button == 'B':
-        data['temperature'] = 20.0  # <=25
+        device.data.update({'temperature': 20.0, 'timestamp': timestamp})  # <=25
     elif button == 'X':
-        data['humidity'] = 10.0  # < 20
+        device.data.update({'humidity': 10.0, 'timestamp': timestamp})  # < 20
     elif button == 'Y':
-        data['humidity'] = 30.0  # >= 20
-    print(f'Button press data for Button {button}: {data}' )
-    ran = True
+        device.data.update({'humidity': 30.0, 'timestamp': timestamp})  # >= 20
+    sample = device.data.snapshot()
+    print(f'Button press data for Button {button}: {sample}' )
+    events.put((device, sample))
 
 
-# gets the sensor data from the connected devive on COM_port through callback functions
-def request_sensor_data(iotee):
-    '''Requests sensor data from the iotee device and adds a timestamp to a global dictionary called data. 
-    Each request stores the value of the sensor in a global dictionary called data. 
+# gets the sensor data from the connected devive through callback functions
+def request_sensor_data(device: SensorDevice, fields: tuple = SENSOR_FIELDS, timestamp: int = None):
+    '''Requests sensor data from the iotee device and adds a timestamp to the latest values of the device. 
+    Each request stores the value of the sensor in the latest values of the device and starts a new cycle of the 
+    sample assembler. Values that are still overdue from the previous cycle are not requested again.
     
     Parameters:
-        iotee (Iotee): iotee object
+        device (SensorDevice): the device to request the data from
+        fields (tuple): names of the sensors to request
+        timestamp (int): timestamp of the sample, the current time if None
         
     Returns:
         None 
     '''
-    timestamp = int(time.time())
+    if timestamp is None:
+        timestamp = int(time.time())
     print('\n')
     print('time of getting data:', timestamp)
-    data['timestamp'] = timestamp
-    iotee.request_temperature()
-    iotee.request_humidity()
-    iotee.request_light()
-    iotee.request_proximity()
+    device.data['timestamp'] = timestamp
+    for field in device.assembler.begin(timestamp, fields):
+        getattr(device.iotee, f'request_{field}')()
+
+def assemble_sample(device: SensorDevice, timeout: float):
+    '''Waits until all values of the current cycle have arrived and builds a sample from them. 
+    Values that did not arrive in time are left out, so a sample never mixes values from different cycles.
+    
+    Parameters:
+        device (SensorDevice): the device the sample is assembled for
+        timeout (float): maximum number of seconds to wait for the values
+        
+    Returns:
+        sample (dict): sample in the format of the message template
+    '''
+    values, missing = device.assembler.wait(timeout)
+    if missing:
+        print('Sensor values of device {0} missing in sample: {1}'.format(device.device_id, missing))
+    sample = {key: device.data[key] for key in ('device_id', 'inputName', 'pressure')}
+    sample.update(values)
+    return sample
+
+
+def publish_sample(client: object, device: SensorDevice, sample: dict):
+    '''Publishes a sample encoded with the configured codec on its sensor topic, or adds it to the current batch of 
+    the device if batching is enabled and publishes the batch once it is due
+    
+    Parameters:
+        client (Client): mqtt client object
+        device (SensorDevice): the device the sample belongs to
+        sample (dict): sample in the format of the message template
+        
+    Returns:
+        None
+    '''
+    if device.batcher is None:
+        send_message(client, sensor_topic(codec), codec.encode(sample))
+        return
+    payload = device.batcher.add(sample)
+    if payload is not None:
+        send_message(client, device.batcher.topic, payload)
+
+def process_sample(client: object, device: SensorDevice, sample: dict):
+    '''Runs a sample through the aggregation or the deadband filter of the device and publishes what is left
+    
+    Parameters:
+        client (Client): mqtt client object
+        device (SensorDevice): the device the sample belongs to
+        sample (dict): sample in the format of the message template
+        
+    Returns:
+        None
+    '''
+    if device.aggregator is not None:
+        for summary in device.aggregator.add(sample):
+            publish_sample(client, device, summary)
+        if device.aggregator.is_anomaly(sample):
+            publish_sample(client, device, sample)
+        return
+    if device.deadband is None or device.deadband.check(sample):
+        publish_sample(client, device, sample)
+
+def flush_due(client: object, device: SensorDevice):
+    '''Publishes the summary of a device whose window has ended and the batch whose flush interval has passed, 
+    even if no new sample was added
+    
+    Parameters:
+        client (Client): mqtt client object
+        device (SensorDevice): the device
+        
+    Returns:
+        None
+    '''
+    if device.aggregator is not None and device.aggregator.due(time.time()):
+        publish_sample(client, device, device.aggregator.close())
+    if device.batcher is not None and device.batcher.due():
+        send_message(client, device.batcher.topic, device.batcher.flush())
+
+spool = None
+replay_thread = None
+
+def send_message(client: object, topic: str, payload: bytes, timeout: float = None):
+    '''Publishes a message, or stores it in the spool if the client is not connected to the broker
+    
+    Parameters:
+        client (Client): mqtt client object
+        topic (str): topic the message is published on
+        payload (bytes): payload of the message
+        timeout (float): maximum seconds to wait for room in the publish window, `IN_FLIGHT_TIMEOUT` if None
+        
+    Returns:
+        None
+    '''
+    if spool is not None and not client.is_connected():
+        spool.append(topic, payload)
+        return
+    info = publish(client, topic, payload, timeout)
+    # a message paho queued until it is connected again is sent by paho, it must not be replayed as well
+    if (info is None or not accepted(info)) and spool is not None:
+        spool.append(topic, payload)
+
+def publish(client: object, topic: str, payload: bytes, timeout: float = None):
+    '''Publishes a message with qos 1 through the publish window and records the time for the latency of its 
+    acknowledgement
+    
+    Parameters:
+        client (Client): mqtt client object
+        topic (str): topic the message is published on
+        payload (bytes): payload of the message
+        timeout (float): maximum seconds to wait for room in the publish window, `IN_FLIGHT_TIMEOUT` if None
+        
+    Returns:
+        info (MQTTMessageInfo): info of the published message, or None if the window refused it
+    '''
+    if window is not None:
+        return window.publish(topic, payload, timeout)
+    started = latency.clock()
+    info = client.publish(topic, payload=payload, qos=1)
+    if accepted(info):
+        latency.sent(info.mid, started)
+    return info
+
+def start_replay(client: object):
+    '''Starts a thread that replays the messages of the spool, if there are any and no replay is running yet
+    
+    Parameters:
+        client (Client): mqtt client object
+        
+    Returns:
+        None
+    '''
+    global replay_thread
+    if spool is None or len(spool) == 0 or (replay_thread is not None and replay_thread.is_alive()):
+        return
+    if stopping.is_set():
+        return
+
+    def send(topic, payload):
+        if not client.is_connected():
+            return False
+        # the samples are old, they go to the ingest lambda which stores them with their own time
+        info = publish(client, replay_topic(topic), payload)
+        return info is not None and accepted(info)
+
+    def run():
+        print('Replaying {0} stored messages'.format(len(spool)))
+        # the replay stops with the publisher, the messages that are left stay in the spool
+        sent = replay(spool, send, SPOOL_REPLAY_RATE, lambda: client.is_connected() and not stopping.is_set())
+        print('Replayed {0} stored messages, {1} left'.format(sent, len(spool)))
+
+    replay_thread = threading.Thread(target=run, daemon=True)
+    replay_thread.start()
+
+
+# samples of discrete device events like button presses, the iotee threads put them in the queue and the main loop 
+# publishes them as soon as they arrive
+events = queue.Queue()
+
+def publish_events(client: object, timeout: float):
+    '''Waits for device events and publishes their samples right away, together with all other events that are 
+    already queued
+    
+    Parameters:
+        client (Client): mqtt client object
+        timeout (float): maximum seconds to wait for the first event
+        
+    Returns:
+        published (int): number of published samples
+    '''
+    published = 0
+    try:
+        event = events.get(timeout=timeout)
+        while True:
+            if event is not None:
+                # a press is sent on its own even if batching is enabled, it mustn't wait for the batch to fill up
+                _, sample = event
+                send_message(client, sensor_topic(codec), codec.encode(sample))
+                published += 1
+            event = events.get_nowait()
+    except queue.Empty:
+        return published
+
+def start_device(device_id: str, com_port: str, iotee: object = None, button_mode: bool = False):
+    '''Starts the iotee thread of a device and registers the callbacks for its state
+    
+    Parameters:
+        device_id (str): id of the device
+        com_port (str): com port the iotee device is connected to
+        iotee (Iotee): iotee object that is already started, e.g. when the gateway shares it with the receiver
+        button_mode (bool): registers the button callback, the presses are only published by the button mode of 
+                            the main loop
+        
+    Returns:
+        device (SensorDevice): the started device
+    '''
+    device = SensorDevice(device_id, com_port)
+    device.iotee = iotee if iotee is not None else start_iotee(com_port)
+    device.iotee.on_temperature = partial(on_temperature, device)
+    device.iotee.on_humidity = partial(on_humidity, device)
+    device.iotee.on_light = partial(on_light, device)
+    device.iotee.on_proximity = partial(on_proximity, device)
+    if button_mode:
+        # nothing else reads the queue of the presses, it would only grow
+        device.iotee.on_button_pressed = partial(on_button_pressed, device)
+    return device
+
+def sample_devices(client: object, devices: list, fields: tuple = SENSOR_FIELDS, timestamp: int = None):
+    '''Requests a sample from all devices at once and publishes each sample as soon as it is complete
+    
+    Parameters:
+        client (Client): mqtt client object
+        devices (list): list of SensorDevice objects
+        fields (tuple): names of the sensors to request
+        timestamp (int): timestamp of the samples, the current time if None
+        
+    Returns:
+        samples (list): the sample of each device
+    '''
+    for device in devices:
+        request_sensor_data(device, fields, timestamp)
+    deadline = time.monotonic() + SAMPLE_TIMEOUT
+    samples = []
+    for device in devices:
+        sample = assemble_sample(device, max(0, deadline - time.monotonic()))
+        process_sample(client, device, sample)
+        samples.append(sample)
+    return samples
+
+def create_scheduler():
+    '''Creates the scheduler of the sensor requests from `SAMPLE_INTERVAL` and `SAMPLE_INTERVALS`, and the adaptive 
+    sampler that changes the intervals of the sensors in `ADAPTIVE_INTERVALS`
+    
+    Returns:
+        scheduler (SensorScheduler): decides which sensors are requested when
+        adaptive (AdaptiveSampler): adapts the intervals to the samples passed to its observe method
+    '''
+    scheduler = SensorScheduler({field: SAMPLE_INTERVALS.get(field, SAMPLE_INTERVAL) for field in SENSOR_FIELDS})
+    return scheduler, AdaptiveSampler(scheduler, ADAPTIVE_INTERVALS)
+
+def prepare(client: object):
+    '''Checks the configuration, opens the spool and sets up the publish window of the client
+    
+    Parameters:
+        client (Client): mqtt client object
+        
+    Returns:
+        None
+    '''
+    global spool, window
+    if AGGREGATE_WINDOW > 0 and PAYLOAD_CODEC == 'bin':
+        raise ValueError('summaries of the aggregation can not be encoded in the binary layout')
+    if PAYLOAD_CODEC == 'bin':
+        for device_id in DEVICES:
+            if len(str(device_id)) > codec.max_device_id or not str(device_id).isascii():
+                raise ValueError(f'the binary layout only holds device ids of up to {codec.max_device_id} ascii '
+                                 f'characters, not {device_id}')
+    if SPOOL_PATH is not None:
+        spool = SampleSpool(SPOOL_PATH, SPOOL_SIZE, max_age=SPOOL_MAX_AGE)
+    client.on_publish = on_publish
+    window = PublishWindow(client, MAX_IN_FLIGHT, IN_FLIGHT_POLICY, IN_FLIGHT_TIMEOUT, tracker=latency)
+
+def drain(client: object, devices: list, timeout: float = DRAIN_TIMEOUT):
+    '''Stops the replay, publishes the open summaries and batches of the devices and the queued button presses and 
+    waits for the acknowledgements of the messages in flight. Messages that can't be published or are not 
+    acknowledged within the timeout are stored in the spool, so they are sent again after the next start
+    
+    Parameters:
+        client (Client): mqtt client object
+        devices (list): list of SensorDevice objects
+        timeout (float): maximum seconds for publishing and waiting for the acknowledgements
+        
+    Returns:
+        left (int): number of messages that were not acknowledged
+    '''
+    deadline = time.monotonic() + timeout
+    # the gateway drains without the main loop of the publisher, the replay has to be stopped here as well
+    stopping.set()
+    if replay_thread is not None:
+        replay_thread.join(max(0, deadline - time.monotonic()))
+
+    messages = []
+    for device in devices:
+        if device.aggregator is not None and device.aggregator.start is not None:
+            summary = device.aggregator.close()
+            if device.batcher is None:
+                messages.append((sensor_topic(codec), codec.encode(summary)))
+            else:
+                payload = device.batcher.add(summary)
+                if payload is not None:
+                    messages.append((device.batcher.topic, payload))
+        if device.batcher is not None and device.batcher.samples:
+            messages.append((device.batcher.topic, device.batcher.flush()))
+    while True:
+        try:
+            event = events.get_nowait()
+        except queue.Empty:
+            break
+        if event is not None:
+            messages.append((sensor_topic(codec), codec.encode(event[1])))
+    for topic, payload in messages:
+        remaining = deadline - time.monotonic()
+        if remaining > 0:
+            send_message(client, topic, payload, remaining)
+        elif spool is not None:
+            spool.append(topic, payload)
+
+    left = []
+    if window is not None and not window.drain(max(0, deadline - time.monotonic())):
+        left = window.unacked()
+    if spool is not None:
+        for topic, payload in left:
+            spool.append(topic, payload)
+        spool.flush()
+    return len(left)
+
+def report_due():
+    '''Prints the latency of the acknowledgements and the state of the publish window if the report is due'''
+    if LATENCY_REPORT_INTERVAL is not None and latency.due():
+        print(latency.report())
+        if window is not None:
+            print(window.report())
 
 
-ran = False
 # main loop for sending data
 def main(button_mode):
-    '''Main loop that starts the iotee thread, connects to the mqtt broker and sends data on a specific topic
+    '''Main loop that starts the iotee threads, connects to the mqtt broker and sends data on a specific topic
     
     Parameters:
         button_mode (bool): a boolean that indicates it the main loop should listen to button presses or send actual 
@@ -187,38 +656,53 @@ def main(button_mode):
     Returns:
         None
     '''
-    global ran
-    iotee = start_iotee(COM_PORT) # manually change the COM Port if you have multiple devices
-    signal.signal(signal.SIGINT, lambda signal, frame: signal_handler(signal, frame, iotee))
-
-    iotee.on_temperature = on_temperature
-    iotee.on_humidity = on_humidity
-    iotee.on_light = on_light
-    iotee.on_proximity = on_proximity
-    iotee.on_button_pressed = on_button_pressed
-
-    client = connect_to_mqtt()
+    client = create_client() if UPLINK is None else LinkClient(UPLINK)
     client.on_connect = on_connect
-    client.on_publish = on_publish
+    prepare(client)
+    devices = [start_device(device_id, com_port, button_mode=button_mode) for device_id, com_port in DEVICES.items()]
+    signal.signal(signal.SIGINT, signal_handler)
 
-    while True:
+    connection = None
+    if UPLINK is None:
+        # the network loop runs in its own thread and reconnects with backoff after the connection was lost
+        connection = ConnectionManager(client, read_endpoint())
+        print ('Connecting to AWS IoT Broker...')
+        connection.start()
+    else:
+        print ('Connecting to the gateway...')
+        client.connect()
+
+    scheduler, adaptive = create_scheduler()
+    while not stopping.is_set():
         try:
+            report_due()
             if button_mode == False:
-                request_sensor_data(iotee)
-                sleep(1)
-                client.publish('iot/sensor_data', payload=json.dumps(data), qos=1)
-                sleep(4)
+                timestamp, fields = scheduler.due()
+                if fields:
+                    for sample in sample_devices(client, devices, fields, timestamp):
+                        adaptive.observe(sample)
+                for device in devices:
+                    flush_due(client, device)
+                stopping.wait(scheduler.wait_time())
             else:
-                if ran == True:
-                    client.publish('iot/sensor_data', payload=json.dumps(data), qos=1)
-                    ran = False
-                sleep(1)
-        except ssl.SSLEOFError as e:
-            print('SSL error occurred:', e)
-            print('Attempting to reconnect')
-            client.reconnect()
+                # returns right after a button press, at the latest after a second for the batches that are due
+                publish_events(client, 1)
+                for device in devices:
+                    flush_due(client, device)
         except Exception as e:
             print('An error occurred:', e)
+            # don't retry the failed step right away
+            stopping.wait(1)
+
+    left = drain(client, devices)
+    if left:
+        print('{0} messages were not acknowledged and are stored in the spool'.format(left))
+    if connection is not None:
+        connection.stop()
+    else:
+        client.disconnect()
+    for device in devices:
+        device.iotee.stop()
 
 
 if __name__ == '__main__':
@@ -1,3 +1,5 @@
+import threading
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 
@@ -16,13 +18,50 @@ class PublisherTest(unittest.TestCase):
             "X": ("humidity", 10),
             "Y": ("humidity", 30),
         }
+        self.device = publisher.SensorDevice("002", "COM7")
+        self.device.iotee = MagicMock()
 
     def test_on_button_pressed(self):
         with patch("builtins.print"):
             for button, (attribute, expected_value) in self.button_press_tests.items():
                 with self.subTest(button=button):
-                    publisher.on_button_pressed(button)
-                    self.assertEqual(publisher.data[attribute], expected_value)
+                    publisher.on_button_pressed(self.device, button)
+                    self.assertEqual(self.device.data[attribute], expected_value)
+                    device, sample = publisher.events.get_nowait()
+                    self.assertIs(device, self.device)
+                    self.assertEqual(sample[attribute], expected_value)
+
+    def test_button_callback_only_in_button_mode(self):
+        for button_mode in (False, True):
+            with self.subTest(button_mode=button_mode):
+                iotee = MagicMock(spec=["stop"])
+                publisher.start_device("002", "SIM", iotee, button_mode=button_mode)
+                self.assertEqual(hasattr(iotee, "on_button_pressed"), button_mode)
+
+    def test_button_presses_are_published_right_away(self):
+        client = MagicMock()
+        client.is_connected.return_value = True
+        client.publish.return_value.rc = 0
+        published = []
+
+        def wait_for_press():
+            published.append(publisher.publish_events(client, 5))
+
+        # the press bypasses the batch of the device
+        self.device.batcher = publisher.SampleBatcher(10, 60, False, publisher.codec)
+        with patch("builtins.print"), patch.object(publisher, "window", None):
+            thread = threading.Thread(target=wait_for_press)
+            thread.start()
+            started = time.monotonic()
+            publisher.on_button_pressed(self.device, "A")
+            thread.join(5)
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(published, [1])
+        self.assertEqual(client.publish.call_args.args[0], "iot/sensor_data")
+        self.assertIn(b'"temperature": 30.0', client.publish.call_args.kwargs["payload"])
+        self.assertEqual(self.device.batcher.samples, [])
+        with patch("builtins.print"):
+            self.assertEqual(publisher.publish_events(client, 0.01), 0)
 
     def test_sensor_callbacks(self):
         callback_tests = {
@@ -31,21 +70,154 @@ class PublisherTest(unittest.TestCase):
             "on_light": (1000, "light"),
             "on_proximity": (5, "proximity"),
         }
-        for method, (value, attribute) in callback_tests.items():
-            with self.subTest(method=method):
-                getattr(publisher, method)(value)
-                self.assertEqual(publisher.data[attribute], value)
+        with patch("builtins.print"):
+            for method, (value, attribute) in callback_tests.items():
+                with self.subTest(method=method):
+                    getattr(publisher, method)(self.device, value)
+                    self.assertEqual(self.device.data[attribute], value)
 
 
     def test_request_sensor_data(self):
-        iotee = MagicMock()
-        with patch("time.time", return_value=12345):
-            publisher.request_sensor_data(iotee)
-        self.assertEqual(publisher.data["timestamp"], 12345)
-        iotee.request_temperature.assert_called_once()
-        iotee.request_humidity.assert_called_once()
-        iotee.request_light.assert_called_once()
-        iotee.request_proximity.assert_called_once()
+        with patch("time.time", return_value=12345), patch("builtins.print"):
+            publisher.request_sensor_data(self.device)
+        self.assertEqual(self.device.data["timestamp"], 12345)
+        self.device.iotee.request_temperature.assert_called_once()
+        self.device.iotee.request_humidity.assert_called_once()
+        self.device.iotee.request_light.assert_called_once()
+        self.device.iotee.request_proximity.assert_called_once()
+
+    def test_assemble_sample(self):
+        with patch("builtins.print"):
+            publisher.request_sensor_data(self.device)
+            publisher.on_temperature(self.device, 21.0)
+            publisher.on_humidity(self.device, 40.0)
+            publisher.on_light(self.device, 70.0)
+            sample = publisher.assemble_sample(self.device, 0)
+
+        self.assertEqual(sample["temperature"], 21.0)
+        self.assertEqual(sample["device_id"], "002")
+        self.assertNotIn("proximity", sample)
+
+    def test_devices_have_separate_state(self):
+        other = publisher.SensorDevice("003", "COM8")
+        with patch("builtins.print"):
+            publisher.on_temperature(self.device, 21.0)
+            publisher.on_temperature(other, 28.0)
+        self.assertEqual(self.device.data["temperature"], 21.0)
+        self.assertEqual(other.data["temperature"], 28.0)
+        self.assertEqual(other.data["device_id"], "003")
+
+    def test_sample_devices_shares_one_client(self):
+        client = MagicMock()
+        client.is_connected.return_value = True
+        devices = [publisher.SensorDevice(device_id, "COM") for device_id in ("002", "003")]
+        for device in devices:
+            device.iotee = MagicMock()
+            for field in publisher.SENSOR_FIELDS:
+                # answer every request right away like the device thread would
+                getattr(device.iotee, f"request_{field}").side_effect = (
+                    lambda device=device, field=field: getattr(publisher, f"on_{field}")(device, 1.0))
+
+        with patch("builtins.print"):
+            publisher.sample_devices(client, devices)
+
+        topics = [call.args[0] for call in client.publish.call_args_list]
+        self.assertEqual(topics, ["iot/sensor_data", "iot/sensor_data"])
+
+    def test_process_sample_publishes_summaries_and_anomalies(self):
+        client = MagicMock()
+        client.is_connected.return_value = True
+        self.device.aggregator = publisher.WindowAggregator(60, publisher.SENSOR_FIELDS, {"temperature": (5.0, 35.0)})
+        sample = {"device_id": "002", "inputName": "sensorData", "pressure": 0.0}
+
+        publisher.process_sample(client, self.device, dict(sample, timestamp=1000, temperature=20.0))
+        client.publish.assert_not_called()
+        publisher.process_sample(client, self.device, dict(sample, timestamp=1030, temperature=40.0))
+        self.assertIn(b'"temperature": 40.0', client.publish.call_args.kwargs["payload"])
+        publisher.process_sample(client, self.device, dict(sample, timestamp=1090, temperature=20.0))
+        self.assertIn(b'"temperature_max": 40.0', client.publish.call_args.kwargs["payload"])
+
+    def test_send_message_tracks_puback_latency(self):
+        client = MagicMock()
+        client.is_connected.return_value = True
+        client.publish.return_value.rc = 0
+        client.publish.return_value.mid = 42
+        with patch.object(publisher, "latency", publisher.PubackTracker()) as latency:
+            publisher.send_message(client, "iot/sensor_data", b"{}")
+            self.assertEqual(latency.in_flight, 1)
+            publisher.on_publish(client, None, 42)
+            self.assertEqual(latency.in_flight, 0)
+            self.assertEqual(latency.stats()["count"], 1)
+
+    def test_refused_message_is_spooled(self):
+        client = MagicMock()
+        client.is_connected.return_value = True
+        window = MagicMock()
+        window.publish.return_value = None
+        spool = MagicMock()
+        with patch.object(publisher, "window", window), patch.object(publisher, "spool", spool):
+            publisher.send_message(client, "iot/sensor_data", b"{}")
+        spool.append.assert_called_once_with("iot/sensor_data", b"{}")
+
+    def test_message_queued_by_paho_is_not_spooled(self):
+        client = MagicMock()
+        client.is_connected.return_value = True
+        client.publish.return_value.rc = publisher.mqtt.MQTT_ERR_NO_CONN
+        client.publish.return_value.mid = 1
+        window = publisher.PublishWindow(client, 2)
+        spool = MagicMock()
+        with patch.object(publisher, "window", window), patch.object(publisher, "spool", spool):
+            publisher.send_message(client, "iot/sensor_data", b"{}")
+        spool.append.assert_not_called()
+        self.assertEqual(window.unacked(), [("iot/sensor_data", b"{}")])
+
+    def test_drain_flushes_batch_and_spools_unacknowledged(self):
+        client = MagicMock()
+        client.is_connected.return_value = True
+        client.publish.return_value.rc = 0
+        client.publish.return_value.mid = 7
+        self.device.batcher = publisher.SampleBatcher(10, 60, False, publisher.codec)
+        self.device.batcher.add({"device_id": "002", "timestamp": 1000, "inputName": "sensorData", "pressure": 0.0})
+        window = publisher.PublishWindow(client, 5)
+        spool = MagicMock()
+        with patch.object(publisher, "window", window), patch.object(publisher, "spool", spool), \
+                patch.object(publisher, "stopping", threading.Event()):
+            self.assertEqual(publisher.drain(client, [self.device], timeout=0.01), 1)
+        self.assertEqual(client.publish.call_args.args[0], "iot/sensor_data/batch")
+        self.assertEqual(self.device.batcher.samples, [])
+        spool.append.assert_called_once_with("iot/sensor_data/batch", client.publish.call_args.kwargs["payload"])
+        spool.flush.assert_called_once()
+
+    def test_prepare_rejects_long_device_ids_for_binary_layout(self):
+        with patch.object(publisher, "PAYLOAD_CODEC", "bin"), patch.object(publisher, "codec", publisher.get_codec("bin")), \
+                patch.object(publisher, "DEVICES", {"greenhouse": "COM1"}):
+            with self.assertRaises(ValueError):
+                publisher.prepare(MagicMock())
+
+    def test_drain_spools_what_it_can_not_publish_in_time(self):
+        client = MagicMock()
+        client.is_connected.return_value = True
+        self.device.batcher = publisher.SampleBatcher(10, 60, False, publisher.codec)
+        self.device.batcher.add({"device_id": "002", "timestamp": 1000, "inputName": "sensorData", "pressure": 0.0})
+        events = publisher.queue.Queue()
+        events.put((self.device, {"device_id": "002", "timestamp": 1001, "inputName": "sensorData", "temperature": 30}))
+        spool = MagicMock()
+        with patch.object(publisher, "window", publisher.PublishWindow(client, 5)), \
+                patch.object(publisher, "spool", spool), patch.object(publisher, "events", events), \
+                patch.object(publisher, "stopping", threading.Event()):
+            self.assertEqual(publisher.drain(client, [self.device], timeout=0), 0)
+        client.publish.assert_not_called()
+        self.assertEqual([call.args[0] for call in spool.append.call_args_list],
+                         ["iot/sensor_data/batch", "iot/sensor_data"])
+        self.assertTrue(events.empty())
+
+    def test_drain_without_messages_in_flight(self):
+        client = MagicMock()
+        window = publisher.PublishWindow(client, 5)
+        with patch.object(publisher, "window", window), patch.object(publisher, "spool", None), \
+                patch.object(publisher, "stopping", threading.Event()):
+            self.assertEqual(publisher.drain(client, [self.device], timeout=0), 0)
+        client.publish.assert_not_called()
 
 
 if __name__ == "__main__":
@@ -1,31 +1,81 @@
-import json
-import sys
+import os
 import signal
 from functools import partial
 
 #the try is needed to have both the scripts and tests working
 try:
-    from utils import connect_to_mqtt, subscribe_to, start_iotee
+    from utils import create_client, read_endpoint, subscribe_to, start_iotee
+    from connection import ConnectionManager, STOPPED
+    from actuation import ActuationWorker, ActuatorCache, load_actions
+    from routing import TopicTrie, route_message
+    from payload_codec import decode_message
+    from journal import StateJournal
 except ModuleNotFoundError:
-    from client.utils import connect_to_mqtt, subscribe_to, start_iotee
+    from client.utils import create_client, read_endpoint, subscribe_to, start_iotee
+    from client.connection import ConnectionManager, STOPPED
+    from client.actuation import ActuationWorker, ActuatorCache, load_actions
+    from client.routing import TopicTrie, route_message
+    from client.payload_codec import decode_message
+    from client.journal import StateJournal
 
 
 COM_PORT = "COM3"
+DEVICE_ID = "002"
 
-def signal_handler(signal:int, frame: object, iotee: object):
-    '''Handler function that stops the iotee thread on ctrl+c
+# all devices driven by this receiver as device id and com port. Commands on `ACTOR_TOPIC` go to all devices, 
+# commands on `ACTOR_TOPIC`/<device_id> only to that device. `DEVICE_TOPICS` adds further topic filters of a device, 
+# wildcards included, e.g. {"002": ["iot/actor_data/row1/+"]}
+DEVICES = {DEVICE_ID: COM_PORT}
+DEVICE_TOPICS = {}
+ACTOR_TOPIC = 'iot/actor_data'
+ERROR_TOPIC = 'iot/error'
+
+# with a `CLIENT_ID` the session of the receiver is persistent, the broker keeps the commands published while the 
+# receiver is disconnected and delivers them when it reconnects. The id has to be unique per receiver, None uses a 
+# clean session
+CLIENT_ID = None
+
+# the last state of each device is kept in the file `JOURNAL_PATH` and applied again when the receiver starts, 
+# None disables it
+JOURNAL_PATH = './client/receiver_state.json'
+
+# what the device does in each state of the detector models, see load_actions for the format
+ACTIONS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'actuators.json')
+actions = load_actions(ACTIONS_PATH)
+
+class ActorDevice:
+    '''State of one iotee device driven by the receiver'''
+
+    def __init__(self, device_id: str, com_port: str):
+        '''
+        Parameters:
+            device_id (str): id of the device
+            com_port (str): com port the iotee device is connected to
+        '''
+        self.device_id = device_id
+        self.com_port = com_port
+        self.iotee = None
+        self.actuators = None
+        self.texts = []
+
+    def topics(self):
+        '''Returns the topic filters of the commands for this device'''
+        return [ACTOR_TOPIC, f'{ACTOR_TOPIC}/{self.device_id}'] + list(DEVICE_TOPICS.get(self.device_id, []))
+
+def signal_handler(signal:int, frame: object, connection: ConnectionManager):
+    '''Handler function that stops the network loop on ctrl+c, main then disconnects and stops the iotee threads.
+    The handler may interrupt the network loop while paho holds one of its locks, so it doesn't disconnect itself
     
     Parameters:
         signal (int): signal number
         frame (frame): current stack frame
-        iothee (Iotee): iotee object
+        connection (ConnectionManager): connection to the broker
         
     Returns:
         None
     '''
     print('Shutting down')
-    iotee.stop()
-    sys.exit(0)
+    connection.set_state(STOPPED)
 
 # callback functions for mqtt
 def on_connect(client: object, userdata: any, flags: dict, response_code: int):
@@ -42,110 +92,212 @@ def on_connect(client: object, userdata: any, flags: dict, response_code: int):
     '''
     if response_code == 0:
         print('Connected with status: {0}'.format(response_code))
+        if flags.get('session present'):
+            print('Resumed the persistent session')
+        # subscriptions of a clean session are lost with the connection, so they are made again on every connect
+        subscribe_to(client, [ERROR_TOPIC] + routes.filters(), 1)
     else:
         print('Connection failed with status: {0}'.format(response_code))
 
-def on_message(iotee: object, client: object, userdata: any, message: object):
+def on_message(iotee: object, client: object, userdata: any, message: object, texts: list = None, 
+               device_id: str = None):
     '''Callback function on receiving a message, 
-    parses the message in a json format, and then determines based on the value of state 
-    what message to display on the iotee device
+    decodes the message with the codec of its topic (json unless the topic says otherwise), and then applies the action 
+    of its state to the iotee device. A qos 1 message the broker delivers again, because its acknowledgement got lost, 
+    is skipped if its state is the last state of the device
     
     Parameters:
-        iotee (Iotee): iotee object
+        iotee (Iotee | ActuationWorker): iotee object, or the worker that applies the commands to it
         client (Client): mqtt client object
         userdata (Any): userdata
         message (Message): MQTTMessage object, containing payload, topic, qos, retain
+        texts (list): texts on the display of the device, old_texts if None
+        device_id (str): id of the device, its state is stored in the journal
+    
+    Returns: 
+        None
+    '''
+    duplicate = message.dup
+    try:
+        command = decode_message(message.topic, message.payload)
+    except ValueError:
+        command = None
+    if not isinstance(command, dict):
+        # an exception would leave the network loop before the message is acknowledged, the broker would deliver 
+        # it again on every reconnect
+        print('Malformed message on {0}: {1}'.format(message.topic, message.payload))
+        return
+    state = command.get('state')
+    action = actions.get(state)
+    if action is None:
+        print('Unknown state: {0}'.format(state))
+        return
+    entry = journal.get(device_id) if journal is not None and device_id is not None else None
+    if duplicate and entry is not None and entry['state'] == state:
+        return
+    apply_action(iotee, action, texts)
+    if journal is not None and device_id is not None:
+        journal.record(device_id, state, texts if texts is not None else old_texts)
+    print(action.message)
+
+def apply_action(iotee: object, action: object, texts: list = None):
+    '''Applies the steps of an action to the iotee device and shows its text on the display
+    
+    Parameters:
+        iotee (Iotee | ActuationWorker): iotee object, or the worker that applies the commands to it
+        action (Action): the action of a state
+        texts (list): texts on the display of the device, old_texts if None
     
     Returns: 
         None
     '''
-    message = json.loads(message.payload.decode())
-    if message['state'] == 'sprinklers_on':
-        iotee.set_led(255, 0, 0) #red
-        text = 'Sprinklers \nare on'
-        display_text(iotee, text)
-        print('Sprinklers are on')
-
-    elif message['state'] == 'sprinklers_off':
-        iotee.set_led(0, 255, 0) #green
-        text = 'Sprinklers \nare off'
-        display_text(iotee, text)
-        print('Sprinklers are off')
-
-    elif message['state'] == 'windows_closed':
-        iotee.set_led(0, 0, 255) #blue
-        text = 'Windows \nare closed'
-        display_text(iotee, text)
-        print('Windows are closed')
-
-    elif message['state'] == 'windows_open':
-        iotee.set_led(255, 255, 0) #yellow
-        text = 'Windows \nare open'
-        display_text(iotee, text)
-        print('Windows are open')
-
-    elif message['state'] == 'lights_on':
-        iotee.set_led(0, 255, 255) #cyan
-        text = 'Lights \nare on'
-        display_text(iotee, text)
-        print('Lights are on')
-
-    elif message['state'] == 'lights_off':
-        iotee.set_led(255, 0, 255) #purple
-        text = 'Lights \nare off'
-        display_text(iotee, text)
-        print('Lights are off')
-
-
-def process_text(text: str):
+    for method, args in action.steps:
+        getattr(iotee, method)(*args)
+    if action.text is not None:
+        display_text(iotee, action.text, texts)
+
+def on_error(client: object, userdata: any, message: object):
+    '''Callback function on receiving a message on the error topic, prints the rule and the reason why it failed
+    
+    Parameters:
+        client (Client): mqtt client object
+        userdata (Any): userdata
+        message (Message): MQTTMessage object, containing payload, topic, qos, retain
+    
+    Returns: 
+        None
+    '''
+    try:
+        error = decode_message(message.topic, message.payload)
+    except ValueError:
+        error = None
+    if not isinstance(error, dict):
+        print('Error: {0}'.format(message.payload))
+        return
+    failures = ['{0} {1}: {2}'.format(failure.get('failedAction'), failure.get('failedResource'), 
+                                      failure.get('errorMessage')) for failure in error.get('failures', [])]
+    print('Error in rule {0}: {1}'.format(error.get('ruleName'), '; '.join(failures) or error))
+
+
+def process_text(text: str, texts: list = None):
     '''Appends a new string to a string list called old_texts, and returns a new string of the 3 newest appended 
-    elements
+    elements. A string equal to the newest element isn't appended again, so a repeated state doesn't scroll the 
+    display
     
     Parameters:
         text (str): a text to be appended to old_texts
+        texts (list): texts on the display of a device, old_texts if None
     
     Returns:
         new_text (str): a text seperated by \n of the 3 newest appended texts to old_texts
     '''
-    global old_texts
-    old_texts.append(text)
+    if texts is None:
+        texts = old_texts
+    if not texts or texts[-1] != text:
+        texts.append(text)
     # only keep the 3 newest appended texts if bigger than 3
-    if len(old_texts) > 3:
-        old_texts = old_texts[-3:]
-    # create a new text of 3 elements from old_texts, separated by \n
+    if len(texts) > 3:
+        del texts[:-3]
+    # create a new text of 3 elements from texts, separated by \n
     new_text = ''
-    for old_text in reversed(old_texts):
+    for old_text in reversed(texts):
         new_text += f'{old_text}\n'
     return new_text
 
-def display_text(iotee: object, text: str):
+def display_text(iotee: object, text: str, texts: list = None):
     '''Displays a formatted version of the text on the iotee device
     
     Parameters:
         iotee (Iotee): iotee object
         text (str): text to be displayed on the iotee device
+        texts (list): texts on the display of the device, old_texts if None
     
     Returns:
         None
     '''
-    text = process_text(text)
+    text = process_text(text, texts)
     iotee.set_display(text)
 
 old_texts = []
 
+# the handlers of the devices for their topic filters
+routes = TopicTrie()
+
+# the last states of the devices, opened by open_journal
+journal = None
+
+def open_journal():
+    '''Opens the journal of the device states if `JOURNAL_PATH` is set, has to be called before the devices are started'''
+    global journal
+    journal = StateJournal(JOURNAL_PATH) if JOURNAL_PATH is not None else None
+
+def restore_device(device: ActorDevice):
+    '''Applies the last state of the device from the journal again, together with the texts that were on its display
+    
+    Parameters:
+        device (ActorDevice): the started device
+        
+    Returns:
+        restored (bool): True if the device had a known state in the journal
+    '''
+    entry = journal.get(device.device_id) if journal is not None else None
+    action = actions.get(entry['state']) if entry is not None else None
+    if action is None:
+        return False
+    device.texts[:] = entry['texts']
+    apply_action(device.actuators, action._replace(text=None), device.texts)
+    if device.texts:
+        # the newest text is already in the list, so it isn't appended again
+        display_text(device.actuators, device.texts[-1], device.texts)
+    print('Restored state {0} of device {1}'.format(entry['state'], device.device_id))
+    return True
+
+def start_device(device_id: str, com_port: str, iotee: object = None):
+    '''Starts the iotee thread and the actuation worker of a device and adds it to the routes
+    
+    Parameters:
+        device_id (str): id of the device
+        com_port (str): com port the iotee device is connected to
+        iotee (Iotee): iotee object that is already started, e.g. when the gateway shares it with the publisher
+        
+    Returns:
+        device (ActorDevice): the started device
+    '''
+    device = ActorDevice(device_id, com_port)
+    device.iotee = iotee if iotee is not None else start_iotee(com_port)
+    # the serial writes happen on their own thread, so the network thread is never blocked by the device, 
+    # and only if the state of the led or display changes
+    device.actuators = ActuationWorker(ActuatorCache(device.iotee))
+    device.actuators.start()
+    restore_device(device)
+    handler = partial(on_message, device.actuators, texts=device.texts, device_id=device_id)
+    for topic in device.topics():
+        routes.add(topic, handler)
+    return device
+
 #main loop for receiving data
 def main():
-    '''Main loop that starts the iotee thread, connects to the mqtt broker, and subscribes to the topics'''
-    iotee = start_iotee(COM_PORT)
-    signal.signal(signal.SIGINT, lambda signal, frame: signal_handler(signal, frame, iotee))
+    '''Main loop that starts the iotee threads, connects to the mqtt broker, and subscribes to the topics'''
+    open_journal()
+    devices = [start_device(device_id, com_port) for device_id, com_port in DEVICES.items()]
 
-    client = connect_to_mqtt()
+    client = create_client(CLIENT_ID)
     
     client.on_connect = on_connect
-    client.on_message = partial(on_message, iotee)
+    client.on_message = partial(route_message, routes)
+    client.message_callback_add(ERROR_TOPIC, on_error)
+
+    connection = ConnectionManager(client, read_endpoint())
+    signal.signal(signal.SIGINT, lambda signal, frame: signal_handler(signal, frame, connection))
+    print ('Connecting to AWS IoT Broker...')
+    connection.run()
 
-    subscribe_to(client, ['iot/error', 'iot/actor_data'], 1)
-    client.loop_forever()
+    # the disconnect packet ends the session right away instead of after the keepalive, the pending commands of the 
+    # devices are applied before their iotee is stopped
+    client.disconnect()
+    for device in devices:
+        device.actuators.stop()
+        device.iotee.stop()
     
     
 if __name__ == '__main__':
@@ -1,4 +1,6 @@
 import json
+import os
+import tempfile
 import unittest
 from unittest.mock import Mock, patch
 
@@ -16,6 +18,7 @@ class TestOnMessage(unittest.TestCase):
         self.client_mock = Mock()
         self.userdata_mock = Mock()
         self.msg_mock = Mock()
+        self.msg_mock.topic = "iot/actor_data"
 
     def message_test_helper(self, state, led_args):
         self.msg_mock.payload = json.dumps({"state": state}).encode()
@@ -52,6 +55,115 @@ class TestOnMessage(unittest.TestCase):
     def test_lights_off(self):
         self.message_test_helper("lights_off", (255, 0, 255))
 
+    def test_unknown_state_is_ignored(self):
+        self.msg_mock.payload = json.dumps({"state": "doors_open"}).encode()
+        with patch("builtins.print") as print_mock:
+            receiver.on_message(self.iotee_mock, self.client_mock, self.userdata_mock, self.msg_mock)
+        self.iotee_mock.set_led.assert_not_called()
+        print_mock.assert_called_once_with("Unknown state: doors_open")
+
+    def test_error_payload(self):
+        self.msg_mock.topic = "iot/error"
+        self.msg_mock.payload = json.dumps({"ruleName": "iot_rule", "failures": [
+            {"failedAction": "IotEventsAction", "failedResource": "window_input", "errorMessage": "throttled"}]}).encode()
+        with patch("builtins.print") as print_mock:
+            receiver.on_error(self.client_mock, self.userdata_mock, self.msg_mock)
+            receiver.on_message(self.iotee_mock, self.client_mock, self.userdata_mock, self.msg_mock)
+        print_mock.assert_any_call("Error in rule iot_rule: IotEventsAction window_input: throttled")
+        self.iotee_mock.set_led.assert_not_called()
+
+    def test_malformed_payload(self):
+        self.msg_mock.topic = "iot/actor_data"
+        for payload in (b"not json", b"[1,2]", b'"lights_on"'):
+            with self.subTest(payload=payload):
+                self.msg_mock.payload = payload
+                with patch("builtins.print") as print_mock:
+                    receiver.on_message(self.iotee_mock, self.client_mock, self.userdata_mock, self.msg_mock)
+                    receiver.on_error(self.client_mock, self.userdata_mock, self.msg_mock)
+                print_mock.assert_any_call("Malformed message on iot/actor_data: {0}".format(payload))
+                print_mock.assert_any_call("Error: {0}".format(payload))
+                self.iotee_mock.set_led.assert_not_called()
+
+
+class TestRouting(unittest.TestCase):
+    def setUp(self):
+        self.routes = receiver.TopicTrie()
+        self.iotees = {}
+
+    def start(self, device_id):
+        iotee = Mock()
+        self.iotees[device_id] = iotee
+        with patch.object(receiver, "start_iotee", return_value=iotee), patch.object(receiver, "routes", self.routes):
+            return receiver.start_device(device_id, "SIM")
+
+    def test_commands_reach_their_device(self):
+        devices = [self.start("002"), self.start("003")]
+        message = Mock(topic="iot/actor_data/003", payload=json.dumps({"state": "lights_on"}).encode())
+        with patch("builtins.print"):
+            receiver.route_message(self.routes, Mock(), None, message)
+            message.topic = "iot/actor_data"
+            message.payload = json.dumps({"state": "windows_open"}).encode()
+            receiver.route_message(self.routes, Mock(), None, message)
+        for device in devices:
+            device.actuators.stop()
+        self.iotees["002"].set_led.assert_called_once_with(255, 255, 0)
+        # the worker may have coalesced the two commands of 003
+        self.iotees["003"].set_led.assert_called_with(255, 255, 0)
+        # each device has its own display
+        self.iotees["002"].set_display.assert_called_once_with("Windows \nare open\n")
+        self.assertEqual(self.routes.filters(),
+                         ["iot/actor_data", "iot/actor_data/002", "iot/actor_data/003"])
+
+
+class TestJournal(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.journal = receiver.StateJournal(os.path.join(self.directory.name, "state.json"))
+        self.iotee = Mock()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def message(self, state, dup=False):
+        return Mock(topic="iot/actor_data", payload=json.dumps({"state": state}).encode(), dup=dup)
+
+    def test_applied_state_is_recorded(self):
+        texts = []
+        with patch.object(receiver, "journal", self.journal), patch("builtins.print"):
+            receiver.on_message(self.iotee, Mock(), None, self.message("lights_on"), texts=texts, device_id="002")
+        self.assertEqual(self.journal.get("002"), {"state": "lights_on", "texts": ["Lights \nare on"]})
+
+    def test_redelivered_state_is_skipped(self):
+        self.journal.record("002", "lights_on", ["Lights \nare on"])
+        with patch.object(receiver, "journal", self.journal), patch("builtins.print"):
+            receiver.on_message(self.iotee, Mock(), None, self.message("lights_on", dup=True), texts=[],
+                                device_id="002")
+            self.iotee.set_led.assert_not_called()
+            receiver.on_message(self.iotee, Mock(), None, self.message("windows_open", dup=True), texts=[],
+                                device_id="002")
+        self.iotee.set_led.assert_called_once_with(255, 255, 0)
+
+    def test_state_is_restored_on_start(self):
+        self.journal.record("002", "windows_open", ["Lights \nare on", "Windows \nare open"])
+        routes = receiver.TopicTrie()
+        with patch.object(receiver, "journal", self.journal), patch.object(receiver, "routes", routes), \
+                patch.object(receiver, "start_iotee", return_value=self.iotee), patch("builtins.print"):
+            device = receiver.start_device("002", "SIM")
+        device.actuators.stop()
+        self.iotee.set_led.assert_called_once_with(255, 255, 0)
+        self.iotee.set_display.assert_called_once_with("Windows \nare open\nLights \nare on\n")
+        self.assertEqual(device.texts, ["Lights \nare on", "Windows \nare open"])
+
+
+class TestProcessText(unittest.TestCase):
+    def setUp(self):
+        receiver.old_texts = []
+
+    def test_repeated_text_does_not_scroll(self):
+        receiver.process_text("Windows \nare open")
+        receiver.process_text("Lights \nare on")
+        self.assertEqual(receiver.process_text("Lights \nare on"), "Lights \nare on\nWindows \nare open\n")
+
 
 if __name__ == "__main__":
     unittest.main()
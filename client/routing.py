@@ -0,0 +1,94 @@
+class TopicTrie:
+    '''Maps mqtt topic filters to values, e.g. the handlers of the devices of a gateway. The levels of the filters
+    are stored as a tree, so finding the values for the topic of a message only follows the levels of the topic
+    instead of comparing it with every filter. Filters may contain the wildcards `+` for one level and `#` for all
+    remaining levels, like in subscriptions.
+    '''
+
+    def __init__(self):
+        self.root = ({}, [])
+
+    def add(self, topic_filter: str, value: object):
+        '''Adds a value for a topic filter
+
+        Parameters:
+            topic_filter (str): topic filter, e.g. 'iot/actor_data/002' or 'iot/actor_data/+'
+            value (object): value that is returned for matching topics
+
+        Returns:
+            None
+        '''
+        levels = topic_filter.split('/')
+        if '#' in levels[:-1]:
+            raise ValueError(f'# has to be the last level of {topic_filter}')
+        node = self.root
+        for level in levels:
+            node = node[0].setdefault(level, ({}, []))
+        node[1].append(value)
+
+    def match(self, topic: str):
+        '''Returns the values of all filters that match a topic
+
+        Parameters:
+            topic (str): topic of a message
+
+        Returns:
+            values (list): values of the matching filters
+        '''
+        levels = topic.split('/')
+        values = []
+        nodes = [self.root]
+        for i, level in enumerate(levels):
+            next_nodes = []
+            for children, _ in nodes:
+                # wildcards don't match topics starting with $, e.g. $aws/things
+                wildcards = not (i == 0 and level.startswith('$'))
+                if wildcards and '#' in children:
+                    values.extend(children['#'][1])
+                if level in children:
+                    next_nodes.append(children[level])
+                if wildcards and '+' in children:
+                    next_nodes.append(children['+'])
+            nodes = next_nodes
+        for children, node_values in nodes:
+            values.extend(node_values)
+            # a/# also matches a
+            if '#' in children:
+                values.extend(children['#'][1])
+        return values
+
+    def filters(self):
+        '''Returns all topic filters that have values, e.g. to subscribe to them
+
+        Returns:
+            filters (list): topic filters
+        '''
+        filters = []
+        stack = [([], self.root)]
+        while stack:
+            levels, (children, values) = stack.pop()
+            if values:
+                filters.append('/'.join(levels))
+            for level, child in children.items():
+                stack.append((levels + [level], child))
+        return sorted(filters)
+
+
+def route_message(routes: TopicTrie, client: object, userdata: any, message: object):
+    '''Callback function on receiving a message, passes the message to the handlers of all matching topic filters
+
+    Parameters:
+        routes (TopicTrie): the handlers of the topic filters
+        client (Client): mqtt client object
+        userdata (Any): userdata
+        message (Message): MQTTMessage object, containing payload, topic, qos, retain
+
+    Returns:
+        handled (int): number of handlers the message was passed to
+    '''
+    handlers = routes.match(message.topic)
+    if not handlers:
+        print('No device for topic {0}'.format(message.topic))
+    for handler in handlers:
+        handler(client, userdata, message)
+    return len(handlers)
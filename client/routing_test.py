@@ -0,0 +1,76 @@
+import unittest
+from unittest.mock import Mock, patch
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from routing import TopicTrie, route_message
+except ModuleNotFoundError:
+    from client.routing import TopicTrie, route_message
+
+
+class TopicTrieTest(unittest.TestCase):
+    def setUp(self):
+        self.trie = TopicTrie()
+
+    def test_exact_match(self):
+        self.trie.add('iot/actor_data/002', 'a')
+        self.trie.add('iot/actor_data/003', 'b')
+        self.assertEqual(self.trie.match('iot/actor_data/002'), ['a'])
+        self.assertEqual(self.trie.match('iot/actor_data'), [])
+        self.assertEqual(self.trie.match('iot/actor_data/002/led'), [])
+
+    def test_single_level_wildcard(self):
+        self.trie.add('iot/actor_data/+', 'a')
+        self.trie.add('iot/+/row1', 'b')
+        self.assertEqual(self.trie.match('iot/actor_data/002'), ['a'])
+        self.assertEqual(self.trie.match('iot/actor_data/row1'), ['a', 'b'])
+        self.assertEqual(self.trie.match('iot/actor_data'), [])
+
+    def test_multi_level_wildcard(self):
+        self.trie.add('iot/actor_data/row1/#', 'a')
+        self.assertEqual(self.trie.match('iot/actor_data/row1/002/led'), ['a'])
+        self.assertEqual(self.trie.match('iot/actor_data/row1'), ['a'])
+        self.assertEqual(self.trie.match('iot/actor_data/row2/002'), [])
+
+    def test_wildcards_do_not_match_system_topics(self):
+        self.trie.add('#', 'a')
+        self.trie.add('+/things', 'b')
+        self.assertEqual(self.trie.match('$aws/things'), [])
+        self.assertEqual(self.trie.match('iot/things'), ['a', 'b'])
+
+    def test_several_values(self):
+        self.trie.add('iot/actor_data', 'a')
+        self.trie.add('iot/actor_data', 'b')
+        self.assertEqual(self.trie.match('iot/actor_data'), ['a', 'b'])
+
+    def test_invalid_filter(self):
+        with self.assertRaises(ValueError):
+            self.trie.add('iot/#/002', 'a')
+
+    def test_filters(self):
+        self.trie.add('iot/actor_data', 'a')
+        self.trie.add('iot/actor_data/002', 'a')
+        self.trie.add('iot/actor_data/+', 'b')
+        self.assertEqual(self.trie.filters(), ['iot/actor_data', 'iot/actor_data/+', 'iot/actor_data/002'])
+
+
+class RouteMessageTest(unittest.TestCase):
+    def test_message_is_passed_to_matching_handlers(self):
+        trie = TopicTrie()
+        first, second, other = Mock(), Mock(), Mock()
+        trie.add('iot/actor_data', first)
+        trie.add('iot/actor_data', second)
+        trie.add('iot/actor_data/003', other)
+        message = Mock(topic='iot/actor_data')
+        self.assertEqual(route_message(trie, 'client', None, message), 2)
+        first.assert_called_once_with('client', None, message)
+        second.assert_called_once_with('client', None, message)
+        other.assert_not_called()
+
+    def test_unrouted_message(self):
+        with patch('builtins.print'):
+            self.assertEqual(route_message(TopicTrie(), 'client', None, Mock(topic='iot/actor_data/004')), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
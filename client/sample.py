@@ -0,0 +1,53 @@
+import threading
+
+
+# the fields of the message template of the publisher
+FIELDS = ('device_id', 'timestamp', 'inputName', 'pressure', 'temperature', 'humidity', 'light', 'proximity')
+
+
+class SampleBuffer:
+    '''The latest values of a device with the fixed fields of the message template. The iotee callbacks write single
+    values, a snapshot copies all of them at once under the same lock, so a published sample never mixes values from
+    before and after a write. The lock is only held for the writes and the single copy of the snapshot.
+    '''
+
+    def __init__(self, values: dict):
+        '''
+        Parameters:
+            values (dict): the initial values, with all fields of the message template
+        '''
+        self.values = {field: values[field] for field in FIELDS}
+        self.lock = threading.Lock()
+
+    def __getitem__(self, field: str):
+        return self.values[field]
+
+    def __setitem__(self, field: str, value):
+        if field not in FIELDS:
+            raise KeyError(field)
+        with self.lock:
+            self.values[field] = value
+
+    def update(self, values: dict):
+        '''Writes several values at once, a snapshot sees either none or all of them
+
+        Parameters:
+            values (dict): field names and their new values
+
+        Returns:
+            None
+        '''
+        for field in values:
+            if field not in FIELDS:
+                raise KeyError(field)
+        with self.lock:
+            self.values.update(values)
+
+    def snapshot(self):
+        '''Returns a copy of the latest values
+
+        Returns:
+            values (dict): the latest values in the format of the message template
+        '''
+        with self.lock:
+            return dict(self.values)
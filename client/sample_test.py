@@ -0,0 +1,68 @@
+import threading
+import unittest
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from sample import SampleBuffer
+except ModuleNotFoundError:
+    from client.sample import SampleBuffer
+
+
+VALUES = {
+    "device_id": "002",
+    "timestamp": 0.0,
+    "inputName": "sensorData",
+    "pressure": 0.0,
+    "temperature": 0.0,
+    "humidity": 0.0,
+    "light": 0.0,
+    "proximity": 0.0
+}
+
+
+class SampleBufferTest(unittest.TestCase):
+    def setUp(self):
+        self.buffer = SampleBuffer(VALUES)
+
+    def test_snapshot_keeps_latest_values(self):
+        self.buffer["temperature"] = 21.5
+        self.assertEqual(self.buffer.snapshot(), dict(VALUES, temperature=21.5))
+        self.buffer["humidity"] = 40.0
+        self.assertEqual(self.buffer.snapshot(), dict(VALUES, temperature=21.5, humidity=40.0))
+        self.assertEqual(self.buffer["temperature"], 21.5)
+
+    def test_snapshot_is_not_changed_by_later_writes(self):
+        snapshot = self.buffer.snapshot()
+        self.buffer["temperature"] = 21.5
+        self.assertEqual(snapshot["temperature"], 0.0)
+
+    def test_unknown_field(self):
+        with self.assertRaises(KeyError):
+            self.buffer["open_windows"] = True
+        with self.assertRaises(KeyError):
+            self.buffer.update({"temperature": 21.5, "open_windows": True})
+        self.assertEqual(self.buffer["temperature"], 0.0)
+
+    def test_updates_are_not_torn(self):
+        stop = threading.Event()
+
+        def write():
+            value = 0
+            while not stop.is_set():
+                value += 1
+                self.buffer.update({"temperature": value, "humidity": value, "timestamp": value})
+
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            for _ in range(2000):
+                snapshot = self.buffer.snapshot()
+                self.assertEqual(snapshot["temperature"], snapshot["humidity"])
+                self.assertEqual(snapshot["temperature"], snapshot["timestamp"])
+        finally:
+            stop.set()
+            writer.join()
+
+
+if __name__ == "__main__":
+    unittest.main()
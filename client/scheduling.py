@@ -0,0 +1,133 @@
+import math
+import time
+
+
+class SensorScheduler:
+    '''Decides when each sensor is requested. Every sensor has its own interval and is requested on a grid of
+    multiples of its interval in unix time, so the timestamps of the samples are aligned, e.g. 12:00:00, 12:00:30 for
+    an interval of 30 seconds. The deadlines come from the grid instead of adding the interval to the time of the
+    last request, so the time needed to publish a sample doesn't add up to a drift. Sensors that are due on the same
+    tick are requested together.
+
+    Waiting uses the monotonic clock, a change of the system time doesn't make the scheduler skip or repeat samples.
+    '''
+
+    def __init__(self, intervals: dict, clock=time.monotonic, wall=time.time):
+        '''
+        Parameters:
+            intervals (dict): seconds between two requests of each sensor, e.g. {'light': 1, 'temperature': 30}
+            clock (callable): monotonic clock, can be replaced in tests
+            wall (callable): wall clock, only read once to place the grid in unix time
+        '''
+        for field, interval in intervals.items():
+            if interval <= 0:
+                raise ValueError(f'interval of {field} has to be positive')
+        self.intervals = dict(intervals)
+        self.clock = clock
+        self.offset = wall() - clock()
+        now = self.now()
+        self.next = {field: self.tick_after(now, interval) for field, interval in self.intervals.items()}
+        self.missed = 0
+
+    def now(self):
+        '''Returns the current unix time measured with the monotonic clock'''
+        return self.clock() + self.offset
+
+    @staticmethod
+    def tick_after(now: float, interval: float):
+        '''Returns the first point of the grid of the interval after now'''
+        return (math.floor(now / interval) + 1) * interval
+
+    def due(self):
+        '''Returns the sensors whose tick has come and moves them to their next tick. Ticks that were missed, e.g.
+        because publishing blocked, are skipped instead of being requested all at once
+
+        Returns:
+            timestamp (int): the tick of the sensors, aligned to the grid
+            fields (list): names of the sensors that have to be requested, empty if none is due
+        '''
+        now = self.now()
+        fields = [field for field, tick in self.next.items() if tick <= now]
+        if not fields:
+            return None, []
+        timestamp = max(math.floor(now / self.intervals[field]) * self.intervals[field] for field in fields)
+        for field in fields:
+            following = self.tick_after(now, self.intervals[field])
+            self.missed += max(0, round((following - self.next[field]) / self.intervals[field]) - 1)
+            self.next[field] = following
+        return int(timestamp), fields
+
+    def set_interval(self, field: str, interval: float):
+        '''Changes the interval of a sensor. A shorter interval takes effect right away, a longer one after the tick 
+        that is already planned
+
+        Parameters:
+            field (str): name of the sensor
+            interval (float): seconds between two requests
+
+        Returns:
+            None
+        '''
+        if interval <= 0:
+            raise ValueError(f'interval of {field} has to be positive')
+        if self.intervals.get(field) == interval:
+            return
+        self.intervals[field] = interval
+        following = self.tick_after(self.now(), interval)
+        self.next[field] = min(self.next.get(field, following), following)
+
+    def wait_time(self):
+        '''Returns the seconds until the next sensor is due
+
+        Returns:
+            seconds (float): time to wait, 0 if a sensor is already due
+        '''
+        return max(0.0, min(self.next.values()) - self.now())
+
+
+class AdaptiveSampler:
+    '''Adapts the intervals of a scheduler to how fast the values of the sensors change. A value that changes faster
+    than the configured rate switches its sensor to the minimum interval, so e.g. a passing cloud is sampled in
+    detail. Every sample without a fast change doubles the interval again, up to the maximum, so a flat signal
+    costs only few samples. With several devices a sensor is requested at the shortest interval any of them needs.
+    '''
+
+    def __init__(self, scheduler: SensorScheduler, bounds: dict):
+        '''
+        Parameters:
+            scheduler (SensorScheduler): the scheduler whose intervals are adapted
+            bounds (dict): minimum interval, maximum interval and change per second above which the value counts
+                           as changing fast for each adaptive sensor, e.g. {'light': (1, 60, 0.5)}
+        '''
+        for field, (minimum, maximum, rate) in bounds.items():
+            if not 0 < minimum <= maximum:
+                raise ValueError(f'bounds of {field} have to be 0 < minimum <= maximum')
+        self.scheduler = scheduler
+        self.bounds = dict(bounds)
+        self.intervals = {}
+        self.last = {}
+        for field, (minimum, maximum, rate) in self.bounds.items():
+            scheduler.set_interval(field, minimum)
+
+    def observe(self, sample: dict):
+        '''Adapts the intervals of the sensors in a sample
+
+        Parameters:
+            sample (dict): sample in the format of the publisher data template
+
+        Returns:
+            None
+        '''
+        for field, (minimum, maximum, rate) in self.bounds.items():
+            if field not in sample:
+                continue
+            key = (sample.get('device_id'), field)
+            previous = self.last.get(key)
+            self.last[key] = (sample['timestamp'], sample[field])
+            interval = self.intervals.get(key, minimum)
+            if previous is not None and sample['timestamp'] > previous[0]:
+                change = abs(sample[field] - previous[1]) / (sample['timestamp'] - previous[0])
+                interval = minimum if change > rate else min(maximum, interval * 2)
+            self.intervals[key] = interval
+            shortest = min(value for (device_id, other), value in self.intervals.items() if other == field)
+            self.scheduler.set_interval(field, shortest)
@@ -0,0 +1,96 @@
+import unittest
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from scheduling import SensorScheduler, AdaptiveSampler
+    from testing_utils import FakeClock
+except ModuleNotFoundError:
+    from client.scheduling import SensorScheduler, AdaptiveSampler
+    from client.testing_utils import FakeClock
+
+
+class SensorSchedulerTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(100.0)
+        # unix time 1000.5 when the monotonic clock is at 100
+        self.scheduler = SensorScheduler({'light': 1, 'temperature': 30}, clock=self.clock, wall=lambda: 1000.5)
+
+    def advance_to(self, unix_time):
+        self.clock.now = unix_time - 900.5
+
+    def test_ticks_are_aligned_to_the_grid(self):
+        self.assertEqual(self.scheduler.due(), (None, []))
+        self.assertAlmostEqual(self.scheduler.wait_time(), 0.5)
+        self.advance_to(1001.0)
+        self.assertEqual(self.scheduler.due(), (1001, ['light']))
+        self.advance_to(1020.0)
+        self.assertEqual(self.scheduler.due(), (1020, ['light', 'temperature']))
+
+    def test_slow_publishing_does_not_drift(self):
+        for second in range(1001, 1011):
+            # every request finishes a bit later than the tick
+            self.advance_to(second + 0.25)
+            self.assertEqual(self.scheduler.due(), (second, ['light']))
+            self.assertAlmostEqual(self.scheduler.wait_time(), 0.75)
+
+    def test_missed_ticks_are_skipped(self):
+        self.advance_to(1005.5)
+        self.assertEqual(self.scheduler.due(), (1005, ['light']))
+        self.assertEqual(self.scheduler.missed, 4)
+        self.assertEqual(self.scheduler.due(), (None, []))
+
+    def test_invalid_interval(self):
+        with self.assertRaises(ValueError):
+            SensorScheduler({'light': 0})
+
+    def test_shorter_interval_takes_effect_right_away(self):
+        self.scheduler.set_interval('temperature', 2)
+        self.advance_to(1002.0)
+        self.assertEqual(self.scheduler.due(), (1002, ['light', 'temperature']))
+        self.scheduler.set_interval('temperature', 30)
+        self.advance_to(1004.0)
+        self.assertEqual(self.scheduler.due(), (1004, ['light', 'temperature']))
+        self.advance_to(1006.0)
+        self.assertEqual(self.scheduler.due(), (1006, ['light']))
+
+
+class AdaptiveSamplerTest(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = SensorScheduler({'light': 30, 'temperature': 30}, clock=FakeClock(100.0), wall=lambda: 1000.5)
+        self.adaptive = AdaptiveSampler(self.scheduler, {'light': (1, 16, 0.5)})
+
+    def observe(self, timestamp, light, device_id='002'):
+        self.adaptive.observe({'device_id': device_id, 'timestamp': timestamp, 'light': light})
+        return self.scheduler.intervals['light']
+
+    def test_flat_signal_decays_to_maximum(self):
+        self.assertEqual(self.scheduler.intervals['light'], 1)
+        self.assertEqual(self.observe(1001, 50.0), 1)
+        intervals = [self.observe(timestamp, 50.0) for timestamp in (1002, 1004, 1008, 1016, 1032, 1048)]
+        self.assertEqual(intervals, [2, 4, 8, 16, 16, 16])
+        self.assertEqual(self.scheduler.intervals['temperature'], 30)
+
+    def test_fast_change_switches_to_minimum(self):
+        self.observe(1000, 50.0)
+        self.observe(1016, 50.0)
+        self.observe(1032, 50.0)
+        self.assertEqual(self.scheduler.intervals['light'], 4)
+        # 10 per 16 seconds is faster than 0.5 per second
+        self.assertEqual(self.observe(1048, 40.0), 1)
+
+    def test_shortest_interval_of_all_devices(self):
+        self.observe(1000, 50.0, '002')
+        self.observe(1001, 50.0, '002')
+        self.observe(1002, 50.0, '002')
+        self.observe(1000, 50.0, '003')
+        self.assertEqual(self.scheduler.intervals['light'], 1)
+        self.observe(1001, 50.0, '003')
+        self.assertEqual(self.scheduler.intervals['light'], 2)
+
+    def test_invalid_bounds(self):
+        with self.assertRaises(ValueError):
+            AdaptiveSampler(self.scheduler, {'light': (10, 5, 0.5)})
+
+
+if __name__ == "__main__":
+    unittest.main()
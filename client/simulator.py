@@ -0,0 +1,203 @@
+import math
+import queue
+import random
+import threading
+import time
+
+
+class EnvironmentModel:
+    '''Generates realistic sensor values of a greenhouse over the course of a day: light follows the sun between
+    6 and 20 o'clock with passing clouds, the temperature peaks in the afternoon and the humidity falls when the
+    temperature rises. Every model gets small random offsets, so a fleet of devices does not move in lockstep.
+    '''
+
+    def __init__(self, seed: int = None):
+        '''
+        Parameters:
+            seed (int | str): seed of the random generator, a random seed is used if None
+        '''
+        self.random = random.Random(seed)
+        self.temperature_offset = self.random.uniform(-1.5, 1.5)
+        self.humidity_offset = self.random.uniform(-5, 5)
+        self.light_peak = self.random.uniform(100, 140)
+        self.cloud = 1.0
+
+    def hour_of_day(self, timestamp: float):
+        '''Returns the local hour of the day as float
+
+        Parameters:
+            timestamp (float): unix timestamp
+
+        Returns:
+            hour (float): hour of the day between 0 and 24
+        '''
+        local = time.localtime(timestamp)
+        return local.tm_hour + local.tm_min / 60 + local.tm_sec / 3600
+
+    def temperature(self, timestamp: float):
+        '''Temperature in °C, between about 14 and 26 with the maximum at 15 o'clock'''
+        hour = self.hour_of_day(timestamp)
+        return 20 + self.temperature_offset + 6 * math.sin(2 * math.pi * (hour - 9) / 24) + self.random.gauss(0, 0.1)
+
+    def humidity(self, timestamp: float):
+        '''Relative humidity in %, lowest when the temperature is highest'''
+        hour = self.hour_of_day(timestamp)
+        value = 45 + self.humidity_offset - 20 * math.sin(2 * math.pi * (hour - 9) / 24) + self.random.gauss(0, 0.5)
+        return min(100.0, max(0.0, value))
+
+    def light(self, timestamp: float):
+        '''Light level, 0 at night and up to about 140 at noon, clouds dim it for a while'''
+        hour = self.hour_of_day(timestamp)
+        if not 6 <= hour <= 20:
+            return 0.0
+        # clouds come and go as a random walk between full sun and heavy overcast
+        self.cloud = min(1.0, max(0.3, self.cloud + self.random.gauss(0, 0.05)))
+        return max(0.0, self.light_peak * math.sin(math.pi * (hour - 6) / 14) * self.cloud + self.random.gauss(0, 1))
+
+    def proximity(self, timestamp: float):
+        '''Proximity, mostly 0 with someone passing by now and then'''
+        return float(self.random.randint(50, 255)) if self.random.random() < 0.02 else 0.0
+
+    def sample(self, timestamp: float):
+        '''Returns all sensor values at a point in time
+
+        Parameters:
+            timestamp (float): unix timestamp
+
+        Returns:
+            values (dict): values of temperature, humidity, light and proximity
+        '''
+        return {field: getattr(self, field)(timestamp) for field in ('temperature', 'humidity', 'light', 'proximity')}
+
+
+# options that can be appended to the name of a simulated port, e.g. 'SIM1:latency=0.05:jitter=0.01'
+PORT_OPTIONS = ('latency', 'jitter', 'loss')
+
+
+def parse_port(com_port: str):
+    '''Splits the name of a simulated port into its name and the options of the simulated device
+
+    Parameters:
+        com_port (str): name of the port with options separated by ':', e.g. 'SIM1:latency=0.05:loss=0.1'
+
+    Returns:
+        name (str): name of the port without the options
+        options (dict): the options as keyword arguments of SimulatedIotee
+    '''
+    name, *parts = com_port.split(':')
+    options = {}
+    for part in parts:
+        option, _, value = part.partition('=')
+        if option not in PORT_OPTIONS:
+            raise ValueError('Unknown option {0} of the simulated port {1}'.format(option, com_port))
+        options[option] = float(value)
+    return name, options
+
+
+class SimulatedIotee:
+    '''Drop-in stand-in for the Iotee class that answers requests with values of an EnvironmentModel.
+    Requests are answered one after the other by a worker thread after the serial latency plus a random jitter,
+    like the real device does over its serial port. With `loss` a share of the answers is dropped.
+    '''
+
+    def __init__(self, com_port: str = 'SIM', latency: float = 0.02, jitter: float = 0.01, loss: float = 0.0,
+                 seed: int = None, clock=time.time):
+        '''
+        Parameters:
+            com_port (str): name of the simulated port, only used for printing
+            latency (float): mean time in seconds it takes to answer a request
+            jitter (float): maximum random deviation of the latency in seconds
+            loss (float): probability between 0 and 1 that an answer gets lost
+            seed (int | str): seed of the random generator, a random seed is used if None
+            clock (callable): wall clock of the simulated environment
+        '''
+        self.com_port = com_port
+        self.latency = latency
+        self.jitter = jitter
+        self.loss = loss
+        self.clock = clock
+        self.model = EnvironmentModel(seed)
+        self.random = random.Random(seed)
+        self.requests = queue.Queue()
+        self.thread = None
+        self.led = (0, 0, 0)
+        self.display = ''
+        self.on_temperature = lambda value: None
+        self.on_humidity = lambda value: None
+        self.on_light = lambda value: None
+        self.on_proximity = lambda value: None
+        self.on_button_pressed = lambda button: None
+
+    def start(self):
+        '''Starts the worker thread that answers the requests'''
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        '''Stops the worker thread after the pending requests'''
+        self.requests.put(None)
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self):
+        '''Answers the requests in the order they were made'''
+        while True:
+            field = self.requests.get()
+            if field is None:
+                return
+            time.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+            if self.random.random() < self.loss:
+                continue
+            value = getattr(self.model, field)(self.clock())
+            getattr(self, f'on_{field}')(value)
+
+    def request_temperature(self):
+        '''Requests the temperature, on_temperature is called with the answer'''
+        self.requests.put('temperature')
+
+    def request_humidity(self):
+        '''Requests the humidity, on_humidity is called with the answer'''
+        self.requests.put('humidity')
+
+    def request_light(self):
+        '''Requests the light level, on_light is called with the answer'''
+        self.requests.put('light')
+
+    def request_proximity(self):
+        '''Requests the proximity, on_proximity is called with the answer'''
+        self.requests.put('proximity')
+
+    def set_led(self, red: int, green: int, blue: int):
+        '''Sets the color of the led, it is kept in `led`
+
+        Parameters:
+            red (int): red between 0 and 255
+            green (int): green between 0 and 255
+            blue (int): blue between 0 and 255
+
+        Returns:
+            None
+        '''
+        self.led = (red, green, blue)
+
+    def set_display(self, text: str):
+        '''Shows a text on the display, it is kept in `display`
+
+        Parameters:
+            text (str): the text, lines are separated by newlines
+
+        Returns:
+            None
+        '''
+        self.display = text
+
+    def press_button(self, button: str):
+        '''Simulates pressing a button of the device
+
+        Parameters:
+            button (str): 'A', 'B', 'X' or 'Y'
+
+        Returns:
+            None
+        '''
+        self.on_button_pressed(button)
@@ -0,0 +1,88 @@
+import threading
+import time
+import unittest
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from simulator import EnvironmentModel, SimulatedIotee, parse_port
+    from utils import start_iotee
+except ModuleNotFoundError:
+    from client.simulator import EnvironmentModel, SimulatedIotee, parse_port
+    from client.utils import start_iotee
+
+
+def local_timestamp(hour):
+    return time.mktime((2023, 7, 16, hour, 0, 0, 0, 0, -1))
+
+
+class EnvironmentModelTest(unittest.TestCase):
+    def test_diurnal_curves(self):
+        model = EnvironmentModel(seed=1)
+        self.assertEqual(model.light(local_timestamp(2)), 0.0)
+        self.assertGreater(model.light(local_timestamp(13)), 20.0)
+        self.assertGreater(model.temperature(local_timestamp(15)), model.temperature(local_timestamp(3)))
+        self.assertLess(model.humidity(local_timestamp(15)), model.humidity(local_timestamp(3)))
+
+    def test_seed_is_reproducible(self):
+        timestamp = local_timestamp(12)
+        self.assertEqual(EnvironmentModel(seed="sim1").sample(timestamp), EnvironmentModel(seed="sim1").sample(timestamp))
+
+
+class SimulatedIoteeTest(unittest.TestCase):
+    def test_requests_are_answered_in_order(self):
+        iotee = SimulatedIotee(latency=0.001, jitter=0.001, seed=1)
+        answers = []
+        done = threading.Event()
+        iotee.on_temperature = lambda value: answers.append('temperature')
+        iotee.on_humidity = lambda value: answers.append('humidity')
+        iotee.on_light = lambda value: (answers.append('light'), done.set())
+        iotee.start()
+        iotee.request_temperature()
+        iotee.request_humidity()
+        iotee.request_light()
+        self.assertTrue(done.wait(1))
+        iotee.stop()
+        self.assertEqual(answers, ['temperature', 'humidity', 'light'])
+
+    def test_loss_drops_answers(self):
+        iotee = SimulatedIotee(latency=0, jitter=0, loss=1.0)
+        answers = []
+        iotee.on_light = answers.append
+        iotee.start()
+        iotee.request_light()
+        iotee.stop()
+        self.assertEqual(answers, [])
+
+    def test_actuators_and_buttons(self):
+        iotee = SimulatedIotee()
+        pressed = []
+        iotee.on_button_pressed = pressed.append
+        iotee.set_led(255, 0, 0)
+        iotee.set_display('Sprinklers \nare on')
+        iotee.press_button('A')
+        self.assertEqual(iotee.led, (255, 0, 0))
+        self.assertEqual(iotee.display, 'Sprinklers \nare on')
+        self.assertEqual(pressed, ['A'])
+
+    def test_start_iotee_returns_simulator(self):
+        iotee = start_iotee('SIM1')
+        self.assertIsInstance(iotee, SimulatedIotee)
+        iotee.stop()
+
+    def test_start_iotee_with_port_options(self):
+        iotee = start_iotee('SIM1:latency=0.05:jitter=0.01:loss=0.1')
+        iotee.stop()
+        self.assertEqual(iotee.com_port, 'SIM1')
+        self.assertEqual((iotee.latency, iotee.jitter, iotee.loss), (0.05, 0.01, 0.1))
+
+    def test_parse_port(self):
+        self.assertEqual(parse_port('SIM2'), ('SIM2', {}))
+        self.assertEqual(parse_port('SIM2:jitter=0'), ('SIM2', {'jitter': 0.0}))
+        with self.assertRaises(ValueError):
+            parse_port('SIM2:speed=3')
+        with self.assertRaises(ValueError):
+            parse_port('SIM2:latency=fast')
+
+
+if __name__ == "__main__":
+    unittest.main()
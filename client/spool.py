@@ -0,0 +1,237 @@
+import mmap
+import os
+import struct
+import threading
+import time
+
+
+# file header: magic, version, size of the data area, offset of the oldest record, offset of the end of the newest
+# record, number of records
+HEADER = struct.Struct('<4sHxxIIII')
+HEADER_SIZE = 32
+MAGIC = b'GHSP'
+VERSION = 2
+
+# record header: time the message was stored, topic length, payload length
+RECORD = struct.Struct('<dHI')
+
+# topic length of the record header that marks the rest of the data area as unused, the next record is at its start
+WRAP = 0xFFFF
+
+
+class SampleSpool:
+    '''Persistent ring buffer for messages that could not be sent to the broker.
+
+    The messages are stored one after the other in the data area of a memory mapped file, so they survive a restart
+    of the publisher. Each record takes only as many bytes as its message, a batch of hundreds of samples fits as
+    well as a single sample. A record that doesn't fit before the end of the data area starts at its beginning
+    again. Writes go to the page cache of the os and are only lost on a power failure, `flush` forces them to disk.
+    When the spool is full the oldest messages are overwritten.
+    '''
+
+    def __init__(self, path: str, size: int = 16 * 1024 * 1024, max_age: float = 82800, clock=time.time):
+        '''Opens the spool file or creates it if it does not exist yet. An existing file keeps its own size.
+
+        Parameters:
+            path (str): path of the spool file
+            size (int): size of the data area in bytes, the largest message that can be stored
+            max_age (float): seconds after which a stored message expires
+            clock (callable): wall clock, can be replaced in tests
+        '''
+        self.path = path
+        self.max_age = max_age
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.dropped = 0
+        # number of records removed since the spool was opened, the index of the oldest record
+        self.first = 0
+
+        header = None
+        if os.path.exists(path) and os.path.getsize(path) >= HEADER_SIZE:
+            with open(path, 'rb') as f:
+                header = HEADER.unpack(f.read(HEADER.size))
+            if header[0] != MAGIC or header[1] != VERSION:
+                header = None
+        if header is None:
+            header = (MAGIC, VERSION, size, 0, 0, 0)
+        _, _, self.size, self.head, self.tail, self.count = header
+
+        length = HEADER_SIZE + self.size
+        mode = 'r+b' if os.path.exists(path) else 'w+b'
+        self.file = open(path, mode)
+        if os.path.getsize(path) < length:
+            self.file.truncate(length)
+        self.map = mmap.mmap(self.file.fileno(), length)
+        self.write_header()
+
+    def __len__(self):
+        return self.count
+
+    def write_header(self):
+        '''Writes the current offsets and count to the file header'''
+        self.map[:HEADER.size] = HEADER.pack(MAGIC, VERSION, self.size, self.head, self.tail, self.count)
+
+    def record_at(self, offset: int):
+        '''Returns the offset and header of the record at an offset of the data area, following a wrap marker or
+        an end of the data area too short for a record header to its start'''
+        if offset + RECORD.size > self.size:
+            offset = 0
+        stored_at, topic_length, payload_length = RECORD.unpack_from(self.map, HEADER_SIZE + offset)
+        if topic_length == WRAP:
+            offset = 0
+            stored_at, topic_length, payload_length = RECORD.unpack_from(self.map, HEADER_SIZE)
+        return offset, stored_at, topic_length, payload_length
+
+    def place(self, length: int):
+        '''Returns the offset a record of `length` bytes can be written to without overwriting other records, or
+        None if there is not enough free space'''
+        if self.count == 0:
+            return 0
+        if self.tail > self.head:
+            if self.tail + length <= self.size:
+                return self.tail
+            return 0 if length <= self.head else None
+        return self.tail if self.tail + length <= self.head else None
+
+    def remove_oldest(self):
+        '''Removes the oldest record, the lock has to be held'''
+        offset, _, topic_length, payload_length = self.record_at(self.head)
+        self.count -= 1
+        self.first += 1
+        self.head = offset + RECORD.size + topic_length + payload_length
+        if self.count == 0:
+            self.head = self.tail = 0
+        else:
+            self.head = self.record_at(self.head)[0]
+
+    def append(self, topic: str, payload: bytes):
+        '''Stores a message at the end of the spool, overwrites the oldest messages if the spool is full. A message
+        larger than the whole spool is dropped, storing a message never raises on the way of a failed publish
+
+        Parameters:
+            topic (str): topic the message has to be published on
+            payload (bytes): payload of the message
+
+        Returns:
+            stored (bool): True if the message was stored
+        '''
+        topic = topic.encode()
+        if isinstance(payload, str):
+            payload = payload.encode()
+        length = RECORD.size + len(topic) + len(payload)
+        if length > self.size or len(topic) >= WRAP:
+            with self.lock:
+                self.dropped += 1
+            print('Dropped a message of {0} bytes on {1}, it is larger than the spool'.format(length, topic.decode()))
+            return False
+        with self.lock:
+            start = self.place(length)
+            while start is None:
+                self.remove_oldest()
+                self.dropped += 1
+                start = self.place(length)
+            if start == 0 and self.count > 0 and self.tail + RECORD.size <= self.size:
+                # the rest of the data area is skipped, readers jump to its start
+                RECORD.pack_into(self.map, HEADER_SIZE + self.tail, 0, WRAP, 0)
+            start += HEADER_SIZE
+            self.map[start:start + length] = RECORD.pack(self.clock(), len(topic), len(payload)) + topic + payload
+            self.tail = start - HEADER_SIZE + length
+            self.count += 1
+            self.write_header()
+            return True
+
+    def oldest(self):
+        '''Returns the oldest message without removing it, together with its index
+
+        Returns:
+            message (tuple): index, topic, payload and time the message was stored, or None if the spool is empty
+        '''
+        with self.lock:
+            if self.count == 0:
+                return None
+            offset, stored_at, topic_length, payload_length = self.record_at(self.head)
+            start = HEADER_SIZE + offset + RECORD.size
+            topic = self.map[start:start + topic_length].decode()
+            payload = self.map[start + topic_length:start + topic_length + payload_length]
+            return self.first, topic, payload, stored_at
+
+    def peek(self):
+        '''Returns the oldest message without removing it
+
+        Returns:
+            message (tuple): topic, payload and time the message was stored, or None if the spool is empty
+        '''
+        message = self.oldest()
+        return None if message is None else message[1:]
+
+    def pop(self, index: int = None):
+        '''Removes the oldest message. With an index it is only removed if it is still the message returned by 
+        `oldest`, an append to a full spool may have overwritten that one in the meantime
+
+        Parameters:
+            index (int): index of the message to be removed, None removes the oldest one
+
+        Returns:
+            removed (bool): True if a message was removed
+        '''
+        with self.lock:
+            if self.count == 0 or (index is not None and index != self.first):
+                return False
+            self.remove_oldest()
+            self.write_header()
+            return True
+
+    def expire(self):
+        '''Removes all messages from the start of the spool that are older than `max_age`
+
+        Returns:
+            expired (int): number of removed messages
+        '''
+        expired = 0
+        while True:
+            message = self.oldest()
+            if message is None or self.clock() - message[3] < self.max_age:
+                return expired
+            expired += self.pop(message[0])
+
+    def flush(self):
+        '''Forces the spool to be written to disk'''
+        self.map.flush()
+
+    def close(self):
+        '''Writes the spool to disk and closes the file'''
+        self.flush()
+        self.map.close()
+        self.file.close()
+
+
+def replay(spool: SampleSpool, send, rate: float, keep_running=lambda: True):
+    '''Sends the messages of the spool from the oldest to the newest with at most `rate` messages per second.
+    Expired messages are dropped, replaying stops when the spool is empty, a message could not be sent or
+    `keep_running` returns False.
+
+    Parameters:
+        spool (SampleSpool): spool with the messages to be sent
+        send (callable): function taking topic and payload, returns True if the message was sent
+        rate (float): maximum number of messages per second
+        keep_running (callable): returns False if replaying should stop
+
+    Returns:
+        sent (int): number of sent messages
+    '''
+    sent = 0
+    interval = 1 / rate
+    next_send = time.monotonic()
+    while keep_running():
+        spool.expire()
+        message = spool.oldest()
+        if message is None:
+            break
+        index, topic, payload, _ = message
+        if not send(topic, payload):
+            break
+        spool.pop(index)
+        sent += 1
+        next_send += interval
+        time.sleep(max(0, next_send - time.monotonic()))
+    return sent
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import unittest
+
+#the try is needed to have the tests work locally and in the pipeline
+try:
+    from spool import SampleSpool, replay
+    from testing_utils import FakeClock
+except ModuleNotFoundError:
+    from client.spool import SampleSpool, replay
+    from client.testing_utils import FakeClock
+
+
+class SampleSpoolTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'spool.bin')
+        self.clock = FakeClock(1000.0)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def open_spool(self, size=120, max_age=60):
+        # a record of a one byte payload on iot/sensor_data takes 30 bytes, the default size holds 4 of them
+        return SampleSpool(self.path, size, max_age=max_age, clock=self.clock)
+
+    def test_fifo_order(self):
+        spool = self.open_spool()
+        spool.append('iot/sensor_data', b'1')
+        spool.append('iot/sensor_data/batch', b'2')
+
+        self.assertEqual(len(spool), 2)
+        self.assertEqual(spool.peek(), ('iot/sensor_data', b'1', 1000.0))
+        spool.pop()
+        self.assertEqual(spool.peek()[:2], ('iot/sensor_data/batch', b'2'))
+        spool.pop()
+        self.assertIsNone(spool.peek())
+        spool.close()
+
+    def test_survives_restart(self):
+        spool = self.open_spool()
+        for i in range(3):
+            spool.append('iot/sensor_data', str(i).encode())
+        spool.pop()
+        spool.close()
+
+        spool = self.open_spool(size=1000)
+        self.assertEqual(spool.size, 120)
+        self.assertEqual(len(spool), 2)
+        self.assertEqual(spool.peek()[1], b'1')
+        spool.close()
+
+    def test_overwrites_oldest_when_full(self):
+        spool = self.open_spool()
+        for i in range(6):
+            spool.append('iot/sensor_data', str(i).encode())
+
+        self.assertEqual(len(spool), 4)
+        self.assertEqual(spool.dropped, 2)
+        self.assertEqual(spool.peek()[1], b'2')
+        spool.close()
+
+    def test_stores_messages_of_any_size(self):
+        spool = self.open_spool(size=1000)
+        spool.append('iot/sensor_data', b'1')
+        spool.append('iot/sensor_data/batch', b'x' * 900)
+
+        self.assertEqual(len(spool), 2)
+        spool.pop()
+        self.assertEqual(spool.peek()[1], b'x' * 900)
+        spool.close()
+
+    def test_wraps_around(self):
+        spool = self.open_spool(size=100)
+        for payload in (b'a' * 30, b'b' * 10, b'c' * 20, b'd' * 5):
+            spool.append('t', payload)
+
+        # c doesn't fit behind b and overwrites a at the start, d overwrites b and follows c
+        self.assertEqual(spool.dropped, 2)
+        payloads = []
+        while spool.peek() is not None:
+            payloads.append(spool.peek()[1][:1])
+            spool.pop()
+        self.assertEqual(payloads, [b'c', b'd'])
+        spool.close()
+
+    def test_message_too_big(self):
+        spool = self.open_spool()
+        spool.append('iot/sensor_data', b'1')
+
+        self.assertFalse(spool.append('iot/sensor_data', b'x' * 128))
+        self.assertEqual(spool.dropped, 1)
+        self.assertEqual(len(spool), 1)
+        spool.close()
+
+    def test_expire(self):
+        spool = self.open_spool(max_age=60)
+        spool.append('iot/sensor_data', b'old')
+        self.clock.now += 30
+        spool.append('iot/sensor_data', b'new')
+        self.clock.now += 40
+
+        self.assertEqual(spool.expire(), 1)
+        self.assertEqual(spool.peek()[1], b'new')
+        spool.close()
+
+    def test_replay_stops_when_sending_fails(self):
+        spool = self.open_spool()
+        for i in range(3):
+            spool.append('iot/sensor_data', str(i).encode())
+        sent = []
+
+        def send(topic, payload):
+            if len(sent) == 2:
+                return False
+            sent.append(payload)
+            return True
+
+        self.assertEqual(replay(spool, send, rate=1000), 2)
+        self.assertEqual(sent, [b'0', b'1'])
+        self.assertEqual(len(spool), 1)
+        spool.close()
+
+    def test_replay_keeps_message_appended_while_sending(self):
+        spool = self.open_spool()
+        for i in range(4):
+            spool.append('iot/sensor_data', str(i).encode())
+        sent = []
+
+        def send(topic, payload):
+            sent.append(payload)
+            if payload == b'0':
+                # the spool is full, the append overwrites the message that is being sent
+                spool.append('iot/sensor_data', b'4')
+            return len(sent) < 2
+
+        replay(spool, send, rate=1000)
+        self.assertEqual(sent, [b'0', b'1'])
+        self.assertEqual(spool.peek()[1], b'1')
+        self.assertEqual(len(spool), 4)
+        spool.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
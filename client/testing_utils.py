@@ -0,0 +1,44 @@
+'''Helpers shared by the tests of the client'''
+
+
+class FakeClock:
+    '''Clock for the tests that only moves when the test sets `now` or sleeps'''
+
+    def __init__(self, now: float = 0.0):
+        '''
+        Parameters:
+            now (float): the time the clock starts at
+        '''
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds: float):
+        '''Moves the clock forward instead of sleeping'''
+        self.now += seconds
+
+
+def make_sample(timestamp: float, device_id: str = "002", **values):
+    '''Returns a sample in the format of the message template
+
+    Parameters:
+        timestamp (float): timestamp of the sample
+        device_id (str): id of the device
+        values (float): sensor values that replace the defaults, e.g. temperature=20.0
+
+    Returns:
+        sample (dict): the sample
+    '''
+    sample = {
+        "device_id": device_id,
+        "timestamp": timestamp,
+        "inputName": "sensorData",
+        "pressure": 0.0,
+        "temperature": 21.5,
+        "humidity": 40.0,
+        "light": 70.0,
+        "proximity": 0.0
+    }
+    sample.update(values)
+    return sample
@@ -1,23 +1,71 @@
 import paho.mqtt.client as mqtt
-import ssl
-from iotee import Iotee
+from functools import lru_cache
 
+#the try is needed to have both the scripts and tests working
+try:
+    from simulator import SimulatedIotee, parse_port
+    from connection import create_tls_context
+except ModuleNotFoundError:
+    from client.simulator import SimulatedIotee, parse_port
+    from client.connection import create_tls_context
 
-def connect_to_mqtt():
-    '''Connects to a mqtt broker with tls encryption 
+
+@lru_cache(maxsize=None)
+def read_endpoint():
+    '''Reads the endpoint of the broker, the file is only read once per process
     
     Parameters: 
         None
         
     Returns: 
-        client: mqtt client object
+        endpoint (str): host name of the broker
     '''
     with open('./client/certs/endpoint.txt', 'r') as f:
-        mqtt_url = f.read()
-    client = mqtt.Client()
+        return f.read().strip()
+
+@lru_cache(maxsize=None)
+def tls_context():
+    '''Loads the certificates into a tls context, the context is created once and shared by all clients, 
+    so it also keeps the tls session for the next connection
+    
+    Parameters: 
+        None
+        
+    Returns: 
+        context (ResumingContext): the tls context
+    '''
+    root_ca = 'client/certs/root-CA.crt'
+    public_crt = 'client/certs/certificate.pem'
+    private_key = 'client/certs/private.key'
+    return create_tls_context(root_ca, public_crt, private_key)
+
+def create_client(client_id: str = None):
+    '''Creates a mqtt client with tls encryption without connecting it, the connection is made by a 
+    ConnectionManager. With a client id the session is persistent: the broker keeps the subscriptions and the 
+    qos 1 messages for the client while it is disconnected and delivers them when it reconnects
+    
+    Parameters: 
+        client_id (str): stable id of the client, None for a clean session with a random id
+        
+    Returns: 
+        client: mqtt client object
+    '''
+    client = mqtt.Client(client_id=client_id or '', clean_session=client_id is None)
     set_tls(client)
+    return client
+
+def connect_to_mqtt(client_id: str = None):
+    '''Connects to a mqtt broker with tls encryption 
+    
+    Parameters: 
+        client_id (str): stable id of the client for a persistent session, None for a clean session
+        
+    Returns: 
+        client: mqtt client object
+    '''
+    client = create_client(client_id)
     print ('Connecting to AWS IoT Broker...')
-    client.connect(mqtt_url, port = 8883, keepalive=120)
+    client.connect(read_endpoint(), port = 8883, keepalive=120)
     return client
 
 def set_tls(client: mqtt.Client):
@@ -29,15 +77,7 @@ def set_tls(client: mqtt.Client):
     Returns: 
         None
     '''
-    root_ca = 'client/certs/root-CA.crt'
-    public_crt = 'client/certs/certificate.pem'
-    private_key = 'client/certs/private.key'
-    client.tls_set( root_ca,
-                    certfile = public_crt,
-                    keyfile = private_key,
-                    cert_reqs = ssl.CERT_REQUIRED,
-                    tls_version = ssl.PROTOCOL_TLSv1_2,
-                    ciphers = None)
+    client.tls_set_context(tls_context())
     
 
 def subscribe_to(client: mqtt.Client, topics: list, qos: int):
@@ -56,14 +96,22 @@ def subscribe_to(client: mqtt.Client, topics: list, qos: int):
 
 
 def start_iotee(com_port: str):
-    '''Starts a thread for the iotee device 
+    '''Starts a thread for the iotee device. Ports starting with 'SIM' start a simulated device instead, 
+    so the pipeline can be run without the hardware. The latency, jitter and loss of the simulated device can be 
+    appended to the port, e.g. 'SIM1:latency=0.05:jitter=0.01'
     
     Parameters: 
-        com_port (str): com port where the iotee device is connected to
+        com_port (str): com port where the iotee device is connected to, e.g. 'COM7' or 'SIM1'
         
     Returns: 
         iotee: iotee object
     '''
-    iotee = Iotee(com_port)
+    if com_port.upper().startswith('SIM'):
+        name, options = parse_port(com_port)
+        iotee = SimulatedIotee(name, **options)
+    else:
+        # only needed for real devices, so the simulator also works without the iotee package
+        from iotee import Iotee
+        iotee = Iotee(com_port)
     iotee.start()
     return iotee
\ No newline at end of file
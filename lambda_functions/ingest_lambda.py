@@ -0,0 +1,178 @@
+import base64
+import json
+import zlib
+import boto3
+
+# the codecs of the publisher, the module is packed into the deployment package by terraform. cbor payloads can only
+# be ingested if the cbor2 package is added to the deployment package as well
+#the try is needed to have both the scripts and tests working
+try:
+    from payload_codec import codecs, codec_for_topic
+except ModuleNotFoundError:
+    from client.payload_codec import codecs, codec_for_topic
+
+write_client = boto3.client('timestream-write', region_name='eu-central-1')
+events_client = boto3.client('iotevents-data', region_name='eu-central-1')
+
+database_name = 'sensor_data_db'
+table_name = 'sensor_data_table'
+
+# the inputs of the detector models that get every sample, the same as the iot_events actions of the iot_rule
+input_names = ['window_input', 'light_input', 'sprinkler_input']
+
+# maximum number of entries per request allowed by the aws apis
+max_records = 100
+max_messages = 10
+
+def decode_event(event: dict):
+    '''Decodes the event of the ingest rule into single samples. The rule passes the raw payload base64 encoded
+    together with the topic it was published on. The levels of the topic tell how the payload is encoded, e.g. 
+    iot/sensor_data/batch/bin/zlib is a compressed batch of samples in the binary layout
+
+    Parameters:
+        event (dict): a dictionary containing the base64 encoded payload and the topic
+
+    Returns:
+        samples (list): a list of sample dictionaries in the format of the publisher data template
+    '''
+    payload = base64.b64decode(event['payload'])
+    levels = event['topic'].split('/')
+    if levels[-1] == 'zlib':
+        payload = zlib.decompress(payload)
+    if 'cbor' in levels and 'cbor' not in codecs:
+        raise ValueError('cbor2 is not part of the deployment package')
+    codec = codec_for_topic(event['topic'])
+    # binary samples are simply concatenated, a single message may hold several of them as well
+    if 'batch' in levels or codec.name == 'bin':
+        return codec.decode_many(payload)
+    return [codec.decode(payload)]
+
+def is_replay(event: dict):
+    '''Tells if the samples of an event were replayed from the spool of a publisher, e.g. on 
+    iot/sensor_data/replay/batch. They are too old to be forwarded to the detector models
+
+    Parameters:
+        event (dict): a dictionary containing the base64 encoded payload and the topic
+
+    Returns:
+        replay (bool): True if the samples were replayed
+    '''
+    return 'replay' in event['topic'].split('/')
+
+def to_records(samples: list):
+    '''Converts samples into timestream records. Each attribute of a sample becomes its own measure at the time
+    of the sample, the same way the timestream_routing rule stores single messages, so the queries of the other
+    lambdas work on batched data as well. Summaries of the aggregation get the length of their window as an
+    additional dimension
+
+    Parameters:
+        samples (list): a list of sample dictionaries
+
+    Returns:
+        records (list): a list of timestream records
+    '''
+    records = []
+    for sample in samples:
+        timestamp = str(int(sample['timestamp']))
+        dimensions = [{'Name': 'device_id', 'Value': str(sample.get('device_id', 'unknown'))}]
+        if 'window' in sample:
+            # a summary has the same measure names as the samples, one at the same time as an anomaly sample of the
+            # device would be a duplicate record with another value, which timestream rejects
+            dimensions.append({'Name': 'window', 'Value': str(sample['window'])})
+        for key, value in sample.items():
+            if isinstance(value, bool):
+                value_type = 'BOOLEAN'
+            elif isinstance(value, (int, float)):
+                value_type = 'DOUBLE'
+            else:
+                value_type = 'VARCHAR'
+            records.append({
+                'Dimensions': dimensions,
+                'MeasureName': key,
+                'MeasureValue': str(value).lower() if value_type == 'BOOLEAN' else str(value),
+                'MeasureValueType': value_type,
+                'Time': timestamp,
+                'TimeUnit': 'SECONDS'
+            })
+    return records
+
+def chunks(items: list, size: int):
+    '''Splits a list into chunks of a maximum size
+
+    Parameters:
+        items (list): the list to be split
+        size (int): maximum size of a chunk
+
+    Returns:
+        chunks (generator): a generator of lists
+    '''
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def write_samples(samples: list):
+    '''Writes the samples to the timestream table with as few requests as possible. Records timestream rejects,
+    e.g. because they are older than the memory store retention, are logged and don't stop the other requests
+
+    Parameters:
+        samples (list): a list of sample dictionaries
+
+    Returns:
+        rejected (int): number of rejected records
+    '''
+    rejected = 0
+    for records in chunks(to_records(samples), max_records):
+        try:
+            write_client.write_records(DatabaseName=database_name, TableName=table_name, Records=records)
+        except write_client.exceptions.RejectedRecordsException as e:
+            for entry in e.response.get('RejectedRecords', []):
+                record = records[entry['RecordIndex']]
+                print('Rejected record {0} of {1} at {2}: {3}'.format(record['MeasureName'],
+                      record['Dimensions'][0]['Value'], record['Time'], entry.get('Reason')))
+            rejected += len(e.response.get('RejectedRecords', []))
+    return rejected
+
+def forward_samples(samples: list):
+    '''Sends the samples in order to the inputs of the detector models with as few requests as possible. Messages
+    the detector models didn't accept are logged
+
+    Parameters:
+        samples (list): a list of sample dictionaries
+
+    Returns:
+        failed (int): number of messages that were not accepted
+    '''
+    messages = []
+    for i, sample in enumerate(samples):
+        payload = json.dumps(sample).encode()
+        for input_name in input_names:
+            messages.append({'messageId': f'{sample.get("device_id")}-{sample["timestamp"]}-{i}-{input_name}',
+                             'inputName': input_name,
+                             'payload': payload})
+    failed = 0
+    for batch in chunks(messages, max_messages):
+        response = events_client.batch_put_message(messages=batch)
+        for entry in response.get('BatchPutMessageErrorEntries', []):
+            print('Message {0} was not accepted: {1} {2}'.format(entry.get('messageId'), entry.get('errorCode'),
+                                                                  entry.get('errorMessage')))
+            failed += 1
+    return failed
+
+def ingest_handler(event, context):
+    '''Unpacks batched or binary encoded samples published by the publisher, stores them in timestream at the time
+    of each sample and forwards them to the detector models. Replayed samples are only stored
+
+    Parameters:
+        event (dict): a dictionary containing the base64 encoded payload and the topic
+        context (dict): a dictionary containing the context of the lambda function
+
+    Returns:
+        text (str): a string containing the number of ingested samples
+    '''
+    samples = decode_event(event)
+    rejected = write_samples(samples)
+    if rejected:
+        print(f'{rejected} records of {len(samples)} samples were rejected')
+    if is_replay(event):
+        return f'ingested {len(samples)} replayed samples'
+    forward_samples(samples)
+    return f'ingested {len(samples)} samples'
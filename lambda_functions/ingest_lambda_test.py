@@ -0,0 +1,135 @@
+import base64
+import json
+import struct
+import unittest
+import zlib
+from unittest.mock import patch
+
+#the try is needed to have both the scripts and tests working
+try:
+    import ingest_lambda
+except ModuleNotFoundError:
+    from lambda_functions import ingest_lambda
+try:
+    from payload_codec import get_codec
+except ModuleNotFoundError:
+    from client.payload_codec import get_codec
+
+
+def make_event(samples, compress=False):
+    payload = json.dumps({"device_id": "002", "inputName": "sensorBatch", "samples": samples}).encode()
+    topic = "iot/sensor_data/batch"
+    if compress:
+        payload = zlib.compress(payload)
+        topic += "/zlib"
+    return {"payload": base64.b64encode(payload).decode(), "topic": topic}
+
+
+class TestIngestLambda(unittest.TestCase):
+    def setUp(self):
+        self.samples = [
+            {"timestamp": 1000 + i, "temperature": 20.0 + i, "humidity": 30.0, "light": 70.0}
+            for i in range(4)
+        ]
+
+    def test_decode_event(self):
+        for compress in (False, True):
+            with self.subTest(compress=compress):
+                samples = ingest_lambda.decode_event(make_event(self.samples, compress))
+                self.assertEqual(len(samples), 4)
+                self.assertEqual(samples[0]["device_id"], "002")
+                self.assertEqual(samples[0]["inputName"], "sensorData")
+                self.assertEqual(samples[3]["temperature"], 23.0)
+
+    def test_decode_binary_event(self):
+        frame = struct.pack('<B8sI5f', 1, b'002', 1000, 0.0, 21.5, 40.0, 70.0, float('nan'))
+        for topic, payload in (("iot/sensor_data/bin", frame), ("iot/sensor_data/batch/bin/zlib", zlib.compress(frame * 2))):
+            with self.subTest(topic=topic):
+                event = {"payload": base64.b64encode(payload).decode(), "topic": topic}
+                samples = ingest_lambda.decode_event(event)
+                self.assertEqual(samples[0], {"device_id": "002", "timestamp": 1000, "inputName": "sensorData",
+                                              "pressure": 0.0, "temperature": 21.5, "humidity": 40.0, "light": 70.0})
+
+    def test_decode_publisher_encoding(self):
+        sample = {"device_id": "002", "timestamp": 1000, "inputName": "sensorData", "temperature": 21.5, "light": 70.0}
+        codec = get_codec("bin")
+        for topic, payload in (("iot/sensor_data/bin", codec.encode(sample)),
+                               ("iot/sensor_data/batch/bin", codec.encode_many([sample, sample])),
+                               ("iot/sensor_data/batch", get_codec("json").encode_many([sample, sample]))):
+            with self.subTest(topic=topic):
+                event = {"payload": base64.b64encode(payload).decode(), "topic": topic}
+                for decoded in ingest_lambda.decode_event(event):
+                    self.assertEqual(decoded, sample)
+
+    def test_to_records(self):
+        records = ingest_lambda.to_records([{"device_id": "002", "timestamp": 1000, "temperature": 21.5}])
+        by_name = {record["MeasureName"]: record for record in records}
+
+        self.assertEqual(by_name["temperature"]["MeasureValue"], "21.5")
+        self.assertEqual(by_name["temperature"]["MeasureValueType"], "DOUBLE")
+        self.assertEqual(by_name["device_id"]["MeasureValueType"], "VARCHAR")
+        self.assertEqual(by_name["temperature"]["Time"], "1000")
+        self.assertEqual(by_name["temperature"]["Dimensions"], [{"Name": "device_id", "Value": "002"}])
+
+    def test_summary_and_anomaly_at_the_same_time(self):
+        anomaly = {"device_id": "002", "timestamp": 1020, "inputName": "sensorData", "temperature": 45.0}
+        summary = {"device_id": "002", "timestamp": 1020, "inputName": "sensorSummary", "window": 60,
+                   "temperature": 21.5, "temperature_max": 45.0}
+        records = ingest_lambda.to_records([anomaly, summary])
+        keys = [(json.dumps(record["Dimensions"]), record["MeasureName"], record["Time"]) for record in records]
+
+        self.assertEqual(len(keys), len(set(keys)))
+        self.assertEqual(records[-1]["Dimensions"][1], {"Name": "window", "Value": "60"})
+
+    @patch("ingest_lambda.events_client.batch_put_message")
+    @patch("ingest_lambda.write_client.write_records")
+    def test_ingest_handler(self, mock_write_records, mock_batch_put_message):
+        samples = [dict(sample, timestamp=1000 + i) for i in range(10) for sample in self.samples[:1]]
+        response = ingest_lambda.ingest_handler(make_event(samples), {})
+
+        self.assertEqual(response, "ingested 10 samples")
+        # 10 samples with 6 attributes each fit into one write request
+        self.assertEqual(mock_write_records.call_count, 1)
+        # 10 samples for 3 inputs need 3 requests of at most 10 messages
+        self.assertEqual(mock_batch_put_message.call_count, 3)
+        first_messages = mock_batch_put_message.call_args_list[0].kwargs["messages"]
+        self.assertEqual(first_messages[0]["inputName"], "window_input")
+        self.assertEqual(json.loads(first_messages[0]["payload"])["timestamp"], 1000)
+
+    @patch("ingest_lambda.events_client.batch_put_message")
+    @patch("ingest_lambda.write_client.write_records")
+    def test_replay_is_not_forwarded(self, mock_write_records, mock_batch_put_message):
+        payload = json.dumps(dict(self.samples[0], device_id="002")).encode()
+        event = {"payload": base64.b64encode(payload).decode(), "topic": "iot/sensor_data/replay"}
+        response = ingest_lambda.ingest_handler(event, {})
+
+        self.assertEqual(response, "ingested 1 replayed samples")
+        records = mock_write_records.call_args.kwargs["Records"]
+        self.assertEqual({record["Time"] for record in records}, {"1000"})
+        mock_batch_put_message.assert_not_called()
+
+    @patch("ingest_lambda.events_client.batch_put_message")
+    @patch("ingest_lambda.write_client.write_records")
+    def test_rejected_records_are_logged_and_forwarded(self, mock_write_records, mock_batch_put_message):
+        rejected = ingest_lambda.write_client.exceptions.RejectedRecordsException(
+            {"Error": {"Code": "RejectedRecordsException", "Message": "rejected"},
+             "RejectedRecords": [{"RecordIndex": 1, "Reason": "The record timestamp is outside the time range"}]},
+            "WriteRecords")
+        mock_write_records.side_effect = [rejected, {}]
+        mock_batch_put_message.return_value = {"BatchPutMessageErrorEntries": [
+            {"messageId": "002-1000-0-window_input", "errorCode": "ResourceNotFoundException", "errorMessage": ""}]}
+        samples = [dict(self.samples[0], timestamp=1000 + i) for i in range(20)]
+        with patch("builtins.print") as mock_print:
+            response = ingest_lambda.ingest_handler(make_event(samples), {})
+
+        self.assertEqual(response, "ingested 20 samples")
+        # the chunk after the rejected one is written as well
+        self.assertEqual(mock_write_records.call_count, 2)
+        self.assertEqual(mock_batch_put_message.call_count, 6)
+        printed = " ".join(str(call.args[0]) for call in mock_print.call_args_list)
+        self.assertIn("outside the time range", printed)
+        self.assertIn("ResourceNotFoundException", printed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,6 +3,12 @@ import boto3
 from datetime import datetime, time
 from zoneinfo import ZoneInfo
 
+#the try is needed to have both the scripts and tests working
+try:
+    from timestream_query import query_database
+except ModuleNotFoundError:
+    from lambda_functions.timestream_query import query_database
+
 client = boto3.client('iot-data', region_name='eu-central-1')
 
 light_query = """WITH light_above_threshold AS (
@@ -21,18 +27,6 @@ light_query = """WITH light_above_threshold AS (
         FROM all_rows
         WHERE measure_value::double > 60"""
 
-def query_database(query: str):
-    '''Sends a query to the timestream database
-    
-    Parameters: 
-        query (str): a string containing the query to be sent to the timestream database
-    
-    Returns:
-        response (dict): a dictionary containing the response from the timestream query
-    '''
-    timestream_client = boto3.client('timestream-query', region_name='eu-central-1')
-    response = timestream_client.query(QueryString=query)
-    return response
 
 def get_sunlight_duration(response: dict):
     '''Iterates the response dictionary and adds the duration between a row which is over the threshold of light 
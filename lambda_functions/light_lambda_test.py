@@ -7,8 +7,10 @@ from unittest.mock import patch, MagicMock, Mock
 #the try is needed to have both the scripts and tests working
 try:
     import light_lambda 
+    import timestream_query
 except ModuleNotFoundError:
     from lambda_functions import light_lambda
+    from lambda_functions import timestream_query
     
 class TestLambdaFunctions(unittest.TestCase):
     @patch("boto3.client")
@@ -18,12 +20,14 @@ class TestLambdaFunctions(unittest.TestCase):
         query = """
            asfdgasdf
         """
-        mock_timestream.query.return_value = "mocked response"
+        mock_timestream.query.return_value = {"Rows": ["mocked row"]}
 
-        actual_response = light_lambda.query_database(query)
+        # the client is cached between invocations
+        with patch.object(timestream_query, "timestream_client", None), patch("builtins.print"):
+            actual_response = light_lambda.query_database(query)
 
         mock_timestream.query.assert_called_once_with(QueryString=query)
-        self.assertEqual(actual_response, "mocked response")
+        self.assertEqual(actual_response, {"Rows": ["mocked row"]})
 
     @patch("boto3.client")
     def test_query_database_not_equals(self, mock_client):
@@ -32,12 +36,14 @@ class TestLambdaFunctions(unittest.TestCase):
         query = """
            asfdgasdf
         """
-        mock_timestream.query.return_value = "mocked response"
+        mock_timestream.query.return_value = {"Rows": ["mocked row"]}
 
-        actual_response = light_lambda.query_database(query)
+        # the client is cached between invocations
+        with patch.object(timestream_query, "timestream_client", None), patch("builtins.print"):
+            actual_response = light_lambda.query_database(query)
 
         mock_timestream.query.assert_called_once_with(QueryString=query)
-        self.assertNotEqual(actual_response, "something else")
+        self.assertNotEqual(actual_response, {"Rows": []})
     
     @patch("light_lambda.query_database")
     def test_get_sunlight_duration_7200(self, mock_query):
@@ -1,6 +1,12 @@
 import json
 import boto3
 
+#the try is needed to have both the scripts and tests working
+try:
+    from timestream_query import query_database, run_queries
+except ModuleNotFoundError:
+    from lambda_functions.timestream_query import query_database, run_queries
+
 client = boto3.client('iot-data', region_name='eu-central-1')
 
 device_query = """SELECT DISTINCT measure_value::varchar 
@@ -21,18 +27,6 @@ temperature_query = """SELECT t1.measure_name, t1.time, t1.measure_value::double
             WHERE measure_name = 'device_id'
         ) AS t2 ON t1.time = t2.time"""
 
-def query_database(query):
-    '''Sends a query to the timestream database.
-
-    Parameters: 
-        query (str): The query to be sent to the timestream database.
-    
-    Returns:
-        response (dict): A dictionary containing the response from the timestream query.
-    '''
-    timestream_client = boto3.client('timestream-query', region_name='eu-central-1')
-    response = timestream_client.query(QueryString=query)
-    return response
     
 def format_temperature_data(temperature_response):
     '''Formats the temperature data retrieved from the query response passed into a dictionary.
@@ -108,11 +102,11 @@ def temperature_handler(event, context):
     Returns:
         str: A string indicating whether windows should be opened or not.
     '''
-    device_response = query_database(device_query)
-    temperature_response = query_database(temperature_query)
+    # both queries are independent, so they run at the same time
+    responses = run_queries({'devices': device_query, 'temperature': temperature_query}, query_database)
 
-    device_ids = get_device_ids(device_response)
-    temperature_data = format_temperature_data(temperature_response)
+    device_ids = get_device_ids(responses['devices'])
+    temperature_data = format_temperature_data(responses['temperature'])
     if all_present_and_hot(temperature_data, device_ids):
         data = {"open_windows": True}
         response = client.publish(
@@ -3,8 +3,10 @@ from unittest.mock import patch, MagicMock
 
 try:
     from temperature_lambda import query_database, format_temperature_data, get_device_ids, all_present_and_hot, temperature_handler
+    import timestream_query
 except ModuleNotFoundError:
     from lambda_functions.temperature_lambda import query_database, format_temperature_data, get_device_ids, all_present_and_hot, temperature_handler
+    from lambda_functions import timestream_query
 
 class TestMyModule(unittest.TestCase):
     @patch("boto3.client")
@@ -14,12 +16,14 @@ class TestMyModule(unittest.TestCase):
         query = """
            asfdgasdf
         """
-        mock_timestream.query.return_value = "mocked response"
+        mock_timestream.query.return_value = {"Rows": ["mocked row"]}
 
-        actual_response = query_database(query)
+        # the client is cached between invocations
+        with patch.object(timestream_query, "timestream_client", None), patch("builtins.print"):
+            actual_response = query_database(query)
 
         mock_timestream.query.assert_called_once_with(QueryString=query)
-        self.assertEqual(actual_response, "mocked response")
+        self.assertEqual(actual_response, {"Rows": ["mocked row"]})
 
     @patch("boto3.client")
     def test_query_database_not_equals(self, mock_client):
@@ -28,12 +32,14 @@ class TestMyModule(unittest.TestCase):
         query = """
            asfdgasdf
         """
-        mock_timestream.query.return_value = "mocked response"
+        mock_timestream.query.return_value = {"Rows": ["mocked row"]}
 
-        actual_response = query_database(query)
+        # the client is cached between invocations
+        with patch.object(timestream_query, "timestream_client", None), patch("builtins.print"):
+            actual_response = query_database(query)
 
         mock_timestream.query.assert_called_once_with(QueryString=query)
-        self.assertNotEqual(actual_response, "something else")
+        self.assertNotEqual(actual_response, {"Rows": []})
     
     
     def test_format_temperature_data(self):
@@ -118,7 +124,8 @@ class TestMyModule(unittest.TestCase):
         temperature_data = "temperature_data"
         
         # Mock data that is being tested
-        mock_query_database.side_effect = [device_response, temperature_response]
+        # the queries run concurrently, so the responses are picked by query and not by order
+        mock_query_database.side_effect = {device_query: device_response, temperature_query: temperature_response}.get
         mock_get_device_ids.return_value = device_ids
         mock_format_temperature_data.return_value = temperature_data
         mock_all_present_and_hot.return_value = True
@@ -131,7 +138,7 @@ class TestMyModule(unittest.TestCase):
         mock_query_database.assert_has_calls([
             unittest.mock.call(device_query),
             unittest.mock.call(temperature_query)
-        ])
+        ], any_order=True)
         mock_get_device_ids.assert_called_once_with(device_response)
         mock_format_temperature_data.assert_called_once_with(temperature_response)
         mock_all_present_and_hot.assert_called_once_with(temperature_data, device_ids)
@@ -171,7 +178,8 @@ class TestMyModule(unittest.TestCase):
         temperature_data = "temperature_data"
         
         # Mock data that is being tested
-        mock_query_database.side_effect = [device_response, temperature_response]
+        # the queries run concurrently, so the responses are picked by query and not by order
+        mock_query_database.side_effect = {device_query: device_response, temperature_query: temperature_response}.get
         mock_get_device_ids.return_value = device_ids
         mock_format_temperature_data.return_value = temperature_data
         mock_all_present_and_hot.return_value = False
@@ -184,7 +192,7 @@ class TestMyModule(unittest.TestCase):
         mock_query_database.assert_has_calls([
             unittest.mock.call(device_query),
             unittest.mock.call(temperature_query)
-        ])
+        ], any_order=True)
         mock_get_device_ids.assert_called_once_with(device_response)
         mock_format_temperature_data.assert_called_once_with(temperature_response)
         mock_all_present_and_hot.assert_called_once_with(temperature_data, device_ids)
@@ -0,0 +1,143 @@
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import boto3
+from botocore.exceptions import ClientError
+
+region_name = 'eu-central-1'
+
+# errors of the timestream query api that go away if the query is sent again a bit later
+retryable_errors = ('ThrottlingException', 'InternalServerException')
+max_attempts = 5
+base_delay = 0.1
+max_delay = 2.0
+
+# what the query cost, summed up over all pages: timestream bills the metered bytes
+QueryStatus = namedtuple('QueryStatus', ('pages', 'bytes_scanned', 'bytes_metered'))
+
+# created on the first query and reused by the following invocations of a warm lambda
+timestream_client = None
+executor = None
+
+# queries that run at the same time, most of the time of a query is spent waiting for timestream
+max_workers = 4
+
+def get_client():
+    '''Returns the timestream query client, it is only created once per lambda container
+
+    Parameters:
+        None
+
+    Returns:
+        client: timestream query client
+    '''
+    global timestream_client
+    if timestream_client is None:
+        timestream_client = boto3.client('timestream-query', region_name=region_name)
+    return timestream_client
+
+def call_with_retries(function, attempts: int = max_attempts, sleep=time.sleep, **kwargs):
+    '''Calls an api function and calls it again with an exponential backoff while it is throttled
+
+    Parameters:
+        function (callable): the api function
+        attempts (int): maximum number of calls
+        sleep (callable): function that waits, can be replaced in tests
+        kwargs: the arguments of the api function
+
+    Returns:
+        response (dict): the response of the api function
+    '''
+    for attempt in range(attempts):
+        try:
+            return function(**kwargs)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') not in retryable_errors or attempt == attempts - 1:
+                raise
+            # full jitter, so several throttled lambdas don't retry at the same moment
+            sleep(random.uniform(0, min(max_delay, base_delay * 2 ** attempt)))
+
+def query_pages(query: str, client=None, sleep=time.sleep):
+    '''Sends a query to the timestream database and yields the pages of the result. Timestream returns at most
+    one page per call, the next page is requested with the NextToken of the previous one
+
+    Parameters:
+        query (str): the query to be sent to the timestream database
+        client: timestream query client, the shared client if None
+        sleep (callable): function that waits between retries, can be replaced in tests
+
+    Returns:
+        pages (generator): the responses of the single calls
+    '''
+    client = client or get_client()
+    kwargs = {'QueryString': query}
+    while True:
+        page = call_with_retries(client.query, sleep=sleep, **kwargs)
+        yield page
+        if not page.get('NextToken'):
+            return
+        kwargs['NextToken'] = page['NextToken']
+
+def query_status(pages: list):
+    '''Sums up the cost of a query
+
+    Parameters:
+        pages (list): the responses of the single calls of the query
+
+    Returns:
+        status (QueryStatus): number of pages, scanned and metered bytes
+    '''
+    # the status of a page holds the cumulative bytes of the query so far
+    status = pages[-1].get('QueryStatus', {}) if pages else {}
+    return QueryStatus(len(pages), status.get('CumulativeBytesScanned', 0), status.get('CumulativeBytesMetered', 0))
+
+def query_database(query: str):
+    '''Sends a query to the timestream database and merges the rows of all pages into one response
+
+    Parameters:
+        query (str): the query to be sent to the timestream database
+
+    Returns:
+        response (dict): the response of the last page with the rows of all pages
+    '''
+    pages = list(query_pages(query))
+    response = dict(pages[-1])
+    response.pop('NextToken', None)
+    response['Rows'] = [row for page in pages for row in page.get('Rows', [])]
+    status = query_status(pages)
+    print('Query returned {0} rows in {1} pages, scanned {2} bytes, metered {3} bytes'.format(
+        len(response['Rows']), status.pages, status.bytes_scanned, status.bytes_metered))
+    return response
+
+def get_executor():
+    '''Returns the thread pool for concurrent queries, it is only created once per lambda container
+
+    Parameters:
+        None
+
+    Returns:
+        executor (ThreadPoolExecutor): the thread pool
+    '''
+    global executor
+    if executor is None:
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+    return executor
+
+def run_queries(queries: dict, query=None):
+    '''Sends several independent queries at the same time and waits for all of them, so the time of the
+    slowest query is spent instead of the sum of all
+
+    Parameters:
+        queries (dict): names and query strings, e.g. {'devices': device_query}
+        query (callable): function that sends one query and returns its response, query_database if None
+
+    Returns:
+        responses (dict): the response of each query under its name
+    '''
+    query = query or query_database
+    if query is query_database:
+        # the client is created before the threads start, so they all share one
+        get_client()
+    futures = {name: get_executor().submit(query, query_string) for name, query_string in queries.items()}
+    return {name: future.result() for name, future in futures.items()}
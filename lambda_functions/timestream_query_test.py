@@ -0,0 +1,108 @@
+import threading
+import unittest
+from unittest.mock import patch, MagicMock
+from botocore.exceptions import ClientError
+
+#the try is needed to have both the scripts and tests working
+try:
+    import timestream_query
+except ModuleNotFoundError:
+    from lambda_functions import timestream_query
+
+
+def throttled():
+    return ClientError({'Error': {'Code': 'ThrottlingException', 'Message': 'Rate exceeded'}}, 'Query')
+
+
+class TestTimestreamQuery(unittest.TestCase):
+    def setUp(self):
+        self.client = MagicMock()
+        self.sleep = MagicMock()
+
+    @patch("boto3.client")
+    def test_client_is_reused(self, mock_client):
+        with patch.object(timestream_query, "timestream_client", None):
+            first = timestream_query.get_client()
+            second = timestream_query.get_client()
+        self.assertIs(first, second)
+        mock_client.assert_called_once_with('timestream-query', region_name='eu-central-1')
+
+    def test_query_pages_follows_next_token(self):
+        self.client.query.side_effect = [
+            {'Rows': [1, 2], 'NextToken': 'a'},
+            {'Rows': [], 'NextToken': 'b'},
+            {'Rows': [3]}
+        ]
+        pages = list(timestream_query.query_pages('query', self.client))
+        self.assertEqual([page['Rows'] for page in pages], [[1, 2], [], [3]])
+        self.assertEqual(self.client.query.call_args_list[1].kwargs, {'QueryString': 'query', 'NextToken': 'a'})
+        self.assertEqual(self.client.query.call_args_list[2].kwargs, {'QueryString': 'query', 'NextToken': 'b'})
+
+    def test_throttled_query_is_retried(self):
+        self.client.query.side_effect = [throttled(), throttled(), {'Rows': [1]}]
+        pages = list(timestream_query.query_pages('query', self.client, sleep=self.sleep))
+        self.assertEqual(pages, [{'Rows': [1]}])
+        self.assertEqual(self.sleep.call_count, 2)
+        # the second wait may be up to twice as long as the first
+        self.assertLessEqual(self.sleep.call_args_list[0].args[0], timestream_query.base_delay)
+        self.assertLessEqual(self.sleep.call_args_list[1].args[0], 2 * timestream_query.base_delay)
+
+    def test_retries_give_up(self):
+        self.client.query.side_effect = throttled()
+        with self.assertRaises(ClientError):
+            list(timestream_query.query_pages('query', self.client, sleep=self.sleep))
+        self.assertEqual(self.client.query.call_count, timestream_query.max_attempts)
+
+    def test_other_errors_are_not_retried(self):
+        self.client.query.side_effect = ClientError({'Error': {'Code': 'ValidationException'}}, 'Query')
+        with self.assertRaises(ClientError):
+            list(timestream_query.query_pages('query', self.client, sleep=self.sleep))
+        self.assertEqual(self.client.query.call_count, 1)
+
+    def test_query_database_merges_pages(self):
+        self.client.query.side_effect = [
+            {'Rows': [1, 2], 'NextToken': 'a', 'ColumnInfo': ['c'],
+             'QueryStatus': {'CumulativeBytesScanned': 100, 'CumulativeBytesMetered': 10000000}},
+            {'Rows': [3], 'ColumnInfo': ['c'],
+             'QueryStatus': {'CumulativeBytesScanned': 150, 'CumulativeBytesMetered': 10000000}}
+        ]
+        with patch.object(timestream_query, "timestream_client", self.client), patch("builtins.print") as mock_print:
+            response = timestream_query.query_database('query')
+        self.assertEqual(response['Rows'], [1, 2, 3])
+        self.assertNotIn('NextToken', response)
+        self.assertEqual(response['ColumnInfo'], ['c'])
+        mock_print.assert_called_once_with('Query returned 3 rows in 2 pages, scanned 150 bytes, metered 10000000 bytes')
+
+    def test_query_status(self):
+        self.assertEqual(timestream_query.query_status([]), timestream_query.QueryStatus(0, 0, 0))
+        status = timestream_query.query_status([{'QueryStatus': {'CumulativeBytesScanned': 5,
+                                                                 'CumulativeBytesMetered': 7}}])
+        self.assertEqual(status, timestream_query.QueryStatus(1, 5, 7))
+
+    def test_run_queries_concurrently(self):
+        started = []
+        both_started = threading.Event()
+
+        def query(query_string):
+            started.append(query_string)
+            if len(started) == 2:
+                both_started.set()
+            # each query only finishes once the other one has started
+            self.assertTrue(both_started.wait(5))
+            return {'Rows': [query_string]}
+
+        responses = timestream_query.run_queries({'devices': 'SELECT devices', 'temperature': 'SELECT temperature'},
+                                                 query)
+        self.assertEqual(responses, {'devices': {'Rows': ['SELECT devices']},
+                                     'temperature': {'Rows': ['SELECT temperature']}})
+
+    def test_run_queries_raises_errors(self):
+        def query(query_string):
+            raise throttled()
+
+        with self.assertRaises(ClientError):
+            timestream_query.run_queries({'devices': 'SELECT devices'}, query)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,17 @@
 data "archive_file" "light_lambda_file" {
   type        = "zip"
-  source_file = "../lambda_functions/light_lambda.py"
   output_path = "light_function_payload.zip"
+
+  source {
+    content  = file("../lambda_functions/light_lambda.py")
+    filename = "light_lambda.py"
+  }
+
+  # shared query module
+  source {
+    content  = file("../lambda_functions/timestream_query.py")
+    filename = "timestream_query.py"
+  }
 }
 
 resource "aws_lambda_function" "light_lambda" {
@@ -15,8 +25,18 @@ resource "aws_lambda_function" "light_lambda" {
 
 data "archive_file" "temperature_lambda_file" {
   type        = "zip"
-  source_file = "../lambda_functions/temperature_lambda.py"
   output_path = "temperature_function_payload.zip"
+
+  source {
+    content  = file("../lambda_functions/temperature_lambda.py")
+    filename = "temperature_lambda.py"
+  }
+
+  # shared query module
+  source {
+    content  = file("../lambda_functions/timestream_query.py")
+    filename = "timestream_query.py"
+  }
 }
 
 resource "aws_lambda_function" "temperature_lambda" {
@@ -24,6 +44,39 @@ resource "aws_lambda_function" "temperature_lambda" {
   filename         = "temperature_function_payload.zip"
   handler          = "temperature_lambda.temperature_handler"
   role             = aws_iam_role.core_role.arn
-  source_code_hash = data.archive_file.light_lambda_file.output_base64sha256
+  source_code_hash = data.archive_file.temperature_lambda_file.output_base64sha256
+  runtime          = "python3.9"
+}
+
+data "archive_file" "ingest_lambda_file" {
+  type        = "zip"
+  output_path = "ingest_function_payload.zip"
+
+  source {
+    content  = file("../lambda_functions/ingest_lambda.py")
+    filename = "ingest_lambda.py"
+  }
+
+  # codecs of the publisher, shared so both sides use the same formats
+  source {
+    content  = file("../client/payload_codec.py")
+    filename = "payload_codec.py"
+  }
+}
+
+resource "aws_lambda_function" "ingest_lambda" {
+  function_name    = "ingest_lambda"
+  filename         = "ingest_function_payload.zip"
+  handler          = "ingest_lambda.ingest_handler"
+  role             = aws_iam_role.core_role.arn
+  source_code_hash = data.archive_file.ingest_lambda_file.output_base64sha256
   runtime          = "python3.9"
 }
+
+resource "aws_lambda_permission" "ingest_lambda_permission" {
+  statement_id  = "AllowExecutionFromIotRule"
+  action        = "lambda:InvokeFunction"
+  function_name = aws_lambda_function.ingest_lambda.function_name
+  principal     = "iot.amazonaws.com"
+  source_arn    = aws_iot_topic_rule.batch_routing.arn
+}
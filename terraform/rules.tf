@@ -39,4 +39,20 @@ resource "aws_iot_topic_rule" "timestream_routing" {
     }
     role_arn = aws_iam_role.core_role.arn
   }
-}
\ No newline at end of file
+}
+resource "aws_iot_topic_rule" "batch_routing" {
+  name        = "batch_routing"
+  description = "rule to route batched, binary and replayed sensor data to the ingest lambda, created with terraform"
+  enabled     = true
+  sql_version = "2016-03-23"
+  sql         = "SELECT encode(*, 'base64') AS payload, topic() AS topic FROM 'iot/sensor_data/+/#'"
+  lambda {
+    function_arn = aws_lambda_function.ingest_lambda.arn
+  }
+  error_action {
+    republish {
+      role_arn = aws_iam_role.core_role.arn
+      topic    = "iot/error"
+    }
+  }
+}